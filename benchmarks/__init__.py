@@ -0,0 +1 @@
+"""性能基准：合成站点目录、抓取周期与 API 的可重复基准测试"""
@@ -0,0 +1,384 @@
+"""
+API 负载与延迟回归基准
+
+在临时目录中按固定种子预置 SQLite（stations / latest / 可选 usage 历史）与共享状态表，
+然后以闭环并发的方式压测各端点：
+
+- asgi：httpx.ASGITransport 进程内调用 server.api:app，只计 API 本身的开销；
+- uvicorn：启动本地 uvicorn 子进程，经真实 socket 调用，包含 HTTP 解析与网络栈。
+
+场景覆盖 /api/status 的常见过滤（全部、provider、hash_id、devid）以及 /api/stations、
+/api/providers。每个场景报告 RPS 与 p50 / p95 / p99，超出延迟预算或出现错误响应时
+以退出码 1 结束。
+
+    python -m benchmarks.api_load --stations 5000 --concurrency 32
+    python -m benchmarks.api_load --transports asgi --budget status_all.p95_ms=30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from benchmarks.common import (
+    PROJECT_ROOT,
+    RESULT_FORMAT_VERSION,
+    compare_results,
+    default_results_dir,
+    free_port,
+    isolated_env,
+    percentile,
+    run_metadata,
+    write_results,
+)
+
+DEFAULT_BUDGETS_PATH = Path(__file__).parent / "api_budgets.json"
+DEFAULT_PROVIDERS = "neptune,dlmm,else,neptune_junior"
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms")
+HIGHER_IS_BETTER = ("rps",)
+
+
+class Fixture:
+    """预置数据中可用于构造请求参数的站点、设备与服务商"""
+
+    def __init__(self, stations: Sequence[Any]) -> None:
+        self.hash_ids = [station.hash_id for station in stations]
+        # devid 查询必须同时带 provider
+        self.devices = [
+            (station.provider, device) for station in stations for device in station.device_ids
+        ]
+        self.providers = sorted({station.provider for station in stations})
+
+
+PathBuilder = Callable[[random.Random, Fixture], str]
+
+SCENARIOS: Dict[str, PathBuilder] = {
+    "status_all": lambda rng, fx: "/api/status",
+    "status_provider": lambda rng, fx: f"/api/status?provider={rng.choice(fx.providers)}",
+    "status_hash_id": lambda rng, fx: f"/api/status?hash_id={rng.choice(fx.hash_ids)}",
+    "status_devid": lambda rng, fx: "/api/status?provider={}&devid={}".format(
+        *rng.choice(fx.devices)
+    ),
+    "stations": lambda rng, fx: "/api/stations",
+    "providers": lambda rng, fx: "/api/providers",
+}
+
+
+def seed_database(args: argparse.Namespace) -> Fixture:
+    """按隔离后的环境变量写入 stations、latest（及 usage 历史）与共享状态表"""
+    from benchmarks.synthetic import generate_stations, synthetic_snapshot
+    from db import batch_upsert_stations, initialize_db_config, record_usage_data
+    from fetcher.status_table import StationCatalog, StatusTable
+    from server.config import Config
+    from server.shared_status import SharedStatusWriter
+
+    providers = [item.strip() for item in args.providers.split(",") if item.strip()]
+    stations = generate_stations(args.stations, args.seed, providers)
+    initialize_db_config(Config.SQLITE_DB_PATH)
+    batch_upsert_stations(stations)
+    snapshot: Dict[str, Any] = {}
+    for cycle in range(args.history_cycles + 1):
+        snapshot = synthetic_snapshot(stations, args.seed, cycle)
+        record_usage_data(
+            snapshot,
+            history_mode_enabled=args.history_cycles > 0,
+            port_states_enabled=True,
+        )
+    if args.shared_status:
+        table = StatusTable.from_stations(
+            snapshot["stations"], StationCatalog(), snapshot["updated_at"]
+        )
+        SharedStatusWriter().publish(table.count_rows(), snapshot["updated_at"])
+    return Fixture(stations)
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    build_path: PathBuilder,
+    fixture: Fixture,
+    requests: int,
+    concurrency: int,
+    seed: int,
+) -> Dict[str, Any]:
+    """闭环并发：concurrency 个 worker 各自连续发请求，直到总数达到 requests"""
+    rng = random.Random(seed)
+    paths = [build_path(rng, fixture) for _ in range(requests)]
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    total_bytes = 0
+    cursor = 0
+
+    async def worker() -> None:
+        nonlocal cursor, total_bytes
+        while cursor < len(paths):
+            path = paths[cursor]
+            cursor += 1
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            total_bytes += len(response.content)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(max(latencies), 2) if latencies else 0.0,
+        "mean_bytes": round(total_bytes / len(latencies)) if latencies else 0,
+    }
+
+
+def _start_uvicorn(workers: int, env: Dict[str, str]) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "server.api:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        cwd=PROJECT_ROOT,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            if httpx.get(url + "/api", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not become ready")
+
+
+async def run_transport(
+    transport: str, args: argparse.Namespace, fixture: Fixture, env: Dict[str, str]
+) -> List[Dict[str, Any]]:
+    process: Optional[subprocess.Popen] = None
+    if transport == "asgi":
+        from server.api import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    else:
+        process, url = _start_uvicorn(args.workers, env)
+        limits = httpx.Limits(
+            max_connections=args.concurrency, max_keepalive_connections=args.concurrency
+        )
+        client = httpx.AsyncClient(base_url=url, limits=limits, timeout=30)
+
+    cases: List[Dict[str, Any]] = []
+    try:
+        async with client:
+            for index, name in enumerate(args.scenarios):
+                build_path = SCENARIOS[name]
+                if args.warmup:
+                    await run_scenario(
+                        client, build_path, fixture, args.warmup, args.concurrency, args.seed
+                    )
+                summary = await run_scenario(
+                    client,
+                    build_path,
+                    fixture,
+                    args.requests,
+                    args.concurrency,
+                    args.seed + index,
+                )
+                cases.append(
+                    {
+                        "name": f"{transport}:{name}",
+                        "transport": transport,
+                        "scenario": name,
+                        "summary": summary,
+                    }
+                )
+                print(
+                    f"  {transport}:{name}: {summary['rps']} rps, p50 {summary['p50_ms']}ms, "
+                    f"p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms, "
+                    f"errors {summary['errors']}",
+                    file=sys.stderr,
+                )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+    return cases
+
+
+def load_budgets(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """预算文件（{"场景或 传输:场景": {"p95_ms": 50}}）与 --budget 覆盖项合并"""
+    budgets: Dict[str, Dict[str, float]] = {}
+    path = Path(args.budgets) if args.budgets else DEFAULT_BUDGETS_PATH
+    if args.budgets or (path.exists() and not args.no_budgets):
+        budgets = json.loads(path.read_text(encoding="utf-8"))
+    for item in args.budget:
+        target, _, value = item.partition("=")
+        name, _, metric = target.rpartition(".")
+        if not name or not value:
+            raise SystemExit(f"Invalid --budget {item!r}, expected NAME.METRIC=VALUE")
+        budgets.setdefault(name, {})[metric] = float(value)
+    return budgets
+
+
+def check_budgets(
+    cases: Sequence[Dict[str, Any]], budgets: Dict[str, Dict[str, float]]
+) -> List[str]:
+    """返回超出预算或出现错误响应的用例描述；case 名称的预算优先于场景名称"""
+    failures: List[str] = []
+    for case in cases:
+        summary = case["summary"]
+        if summary["errors"]:
+            failures.append(f"{case['name']}: {summary['errors']} error responses")
+        limits = {**budgets.get(case["scenario"], {}), **budgets.get(case["name"], {})}
+        for metric, limit in limits.items():
+            value = summary.get(metric)
+            if value is not None and value > limit:
+                failures.append(f"{case['name']} {metric}: {value:g} > budget {limit:g}")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="进程内 ASGI 与本地 uvicorn 的 API 负载基准")
+    parser.add_argument("--stations", type=int, default=1000, help="预置的站点数")
+    parser.add_argument("--providers", default=DEFAULT_PROVIDERS, help="站点轮流分配的服务商")
+    parser.add_argument(
+        "--history-cycles", type=int, default=0, help="预置的 usage 历史轮数（0 表示不写 usage）"
+    )
+    parser.add_argument(
+        "--no-shared-status",
+        dest="shared_status",
+        action="store_false",
+        help="不发布共享状态表，/api/status 只从 latest 表读取",
+    )
+    parser.add_argument("--transports", default="asgi,uvicorn", help="asgi、uvicorn 或两者")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker 数")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="逗号分隔的场景名")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=20, help="每个场景预热请求数（不计入结果）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--budgets",
+        help=f"延迟预算 JSON 文件，默认 {DEFAULT_BUDGETS_PATH.relative_to(PROJECT_ROOT)}",
+    )
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        help="覆盖单项预算，如 status_all.p95_ms=50 或 uvicorn:stations.p99_ms=80",
+    )
+    parser.add_argument("--no-budgets", action="store_true", help="不检查默认预算文件")
+    parser.add_argument("--output", help="结果文件，默认 data/benchmarks/api_load-<commit>.json")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="对比容差（比例）")
+    parser.add_argument("--keep-workdir", action="store_true", help="保留预置数据的临时目录")
+    args = parser.parse_args()
+    args.scenarios = [item.strip() for item in args.scenarios.split(",") if item.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    transports = [item.strip() for item in args.transports.split(",") if item.strip()]
+    if set(transports) - {"asgi", "uvicorn"}:
+        parser.error("--transports accepts asgi and/or uvicorn")
+    budgets = load_budgets(args)
+
+    # 先固定环境变量再导入 server / db 模块，Config 在导入时读取
+    workdir = Path(tempfile.mkdtemp(prefix="zju-bench-api-"))
+    env = isolated_env(
+        workdir,
+        RATE_LIMIT_ENABLED="false",
+        FETCHER_MODE="none",
+        STATIC_SNAPSHOT_ENABLED="false",
+        SHARED_STATUS_ENABLED="true" if args.shared_status else "false",
+    )
+    os.environ.update(env)
+    try:
+        started = time.perf_counter()
+        fixture = seed_database(args)
+        seed_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"[api_load] seeded {args.stations} stations in {seed_ms:.0f}ms", file=sys.stderr)
+
+        cases: List[Dict[str, Any]] = []
+        for transport in transports:
+            cases += asyncio.run(run_transport(transport, args, fixture, env))
+    finally:
+        if args.keep_workdir:
+            print(f"  workdir kept at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    metadata = run_metadata()
+    document = {
+        "benchmark": "api_load",
+        "format": RESULT_FORMAT_VERSION,
+        **metadata,
+        "params": {
+            "stations": args.stations,
+            "providers": args.providers,
+            "history_cycles": args.history_cycles,
+            "shared_status": args.shared_status,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "seed_ms": seed_ms,
+        "budgets": budgets,
+        "cases": cases,
+    }
+    output = Path(
+        args.output or default_results_dir() / f"api_load-{metadata['commit'] or 'unknown'}.json"
+    )
+    write_results(document, output)
+    print(f"results written to {os.path.relpath(output)}")
+
+    failures = check_budgets(cases, budgets)
+    for line in failures:
+        print(f"BUDGET {line}")
+    regressions: List[str] = []
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline.get("params") != document["params"]:
+            print("warning: baseline was run with different parameters", file=sys.stderr)
+        regressions = compare_results(
+            document, baseline, LOWER_IS_BETTER, HIGHER_IS_BETTER, args.tolerance
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}")
+    if failures or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
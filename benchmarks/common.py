@@ -0,0 +1,136 @@
+"""基准测试共用工具：运行环境隔离、结果文件与跨提交对比"""
+
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+PROJECT_ROOT = Path(__file__).parent.parent
+# 结果文件格式版本，字段不兼容变更时递增
+RESULT_FORMAT_VERSION = 1
+
+
+def default_results_dir() -> Path:
+    return PROJECT_ROOT / "data" / "benchmarks"
+
+
+def isolated_env(workdir: Path, **overrides: str) -> Dict[str, str]:
+    """把数据库、快照、通知文件等全部指向 workdir，避免基准测试触碰本地 data/ 目录"""
+    env = dict(os.environ)
+    env.update(
+        {
+            "SQLITE_DB_PATH": str(workdir / "charger.db"),
+            "STATUS_SNAPSHOT_PATH": str(workdir / "status_snapshot.json"),
+            "SHARED_STATUS_PATH": str(workdir / "status_table.bin"),
+            "STATIC_SNAPSHOT_DIR": str(workdir / "static"),
+            "FETCH_NOTIFY_PATH": str(workdir / "fetch_cycle.json"),
+            "FETCHER_LOCK_PATH": str(workdir / "fetcher.lock"),
+            "DEVICE_HEALTH_STATE_PATH": str(workdir / "device_health.json"),
+            "FETCH_METRICS_PATH": str(workdir / "fetch_metrics.json"),
+            "PROFILE_DIR": str(workdir / "profiles"),
+            "STATION_CATALOG_CACHE_PATH": str(workdir / "station_catalog.bin"),
+            "RATE_LIMIT_STORAGE_URI": "memory://",
+            "UPSTREAM_RECORD_DIR": "",
+            "UPSTREAM_OVERRIDE_URL": "",
+            "LOGFIRE_SEND_TO_LOGFIRE": "false",
+            "LOGFIRE_CONSOLE": "false",
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [str(PROJECT_ROOT), os.environ.get("PYTHONPATH")])
+            ),
+        }
+    )
+    env.update(overrides)
+    return env
+
+
+def percentile(values: Iterable[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_bytes() -> int:
+    """当前进程的峰值 RSS（Linux 上 ru_maxrss 单位为 KB，macOS 为字节）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def free_port() -> int:
+    """由系统分配一个本机空闲端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def file_size(*paths: Path) -> int:
+    return sum(path.stat().st_size for path in paths if path.exists())
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata() -> Dict[str, Any]:
+    """结果文件头：提交、工作区是否有改动与运行环境，用于判断两次结果是否可比"""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "started_at": datetime.now(timezone(timedelta(hours=8))).isoformat(),
+    }
+
+
+def write_results(document: Dict[str, Any], path: Path) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(document, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp_path, path)
+    return path
+
+
+def compare_results(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    lower_is_better: Iterable[str],
+    higher_is_better: Iterable[str] = (),
+    tolerance: float = 0.2,
+    key: str = "name",
+) -> List[str]:
+    """按 key 对齐两份结果的 cases，返回超出容差的退化项描述"""
+    regressions: List[str] = []
+    baseline_cases = {case[key]: case for case in baseline.get("cases", [])}
+    for case in current.get("cases", []):
+        previous = baseline_cases.get(case[key])
+        if previous is None:
+            continue
+        for metric, worse_when_higher in [(m, True) for m in lower_is_better] + [
+            (m, False) for m in higher_is_better
+        ]:
+            new = case["summary"].get(metric)
+            old = previous["summary"].get(metric)
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            if (change > tolerance) if worse_when_higher else (change < -tolerance):
+                regressions.append(f"{case[key]} {metric}: {old:g} -> {new:g} ({change:+.0%})")
+    return regressions
@@ -0,0 +1,356 @@
+"""
+数据库层微基准
+
+为每组设置（PRAGMA 配置 × 表结构变体）构建一个临时 SQLite 库：N 个站点、M 天的 usage 历史
+（按抓取间隔生成），然后分别计时热点仓库函数与代表性的历史查询：
+
+- 写路径：execute_batch_upsert（stations）、batch_insert（latest / usage），
+  以及 usage 在不同批量大小下「每批提交」与「单事务」两种分组方式；
+- 读路径：load_latest（全部 / 50 个站点）、fetch_station_metadata（全部 / 按服务商）、
+  fetch_latest_version，以及单站 24 小时曲线、全站小时均值、最近若干轮快照时间三类历史查询。
+
+每个操作重复 --repeat 次取中位数，结果写入 JSON，--compare 与此前结果对比。
+
+    python -m benchmarks.db_bench --stations 1000 --days 3
+    python -m benchmarks.db_bench --profiles default,wal --variants baseline,no_usage_time_index
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+from benchmarks.common import (
+    RESULT_FORMAT_VERSION,
+    compare_results,
+    default_results_dir,
+    file_size,
+    isolated_env,
+    percentile,
+    run_metadata,
+    write_results,
+)
+
+# PRAGMA 配置：连接建立后依次执行
+PRAGMA_PROFILES: Dict[str, Sequence[str]] = {
+    # 与 db/client.py 当前行为一致（rollback journal，synchronous=FULL）
+    "default": (),
+    "wal": ("PRAGMA journal_mode=WAL", "PRAGMA synchronous=NORMAL"),
+    "wal_mmap": (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA cache_size=-65536",
+        "PRAGMA temp_store=MEMORY",
+    ),
+    # 不保证崩溃安全，仅作为写入速度的上限参考
+    "unsafe": ("PRAGMA journal_mode=MEMORY", "PRAGMA synchronous=OFF"),
+}
+
+# 表结构变体：在 schema.sql 初始化之后执行
+SCHEMA_VARIANTS: Dict[str, Sequence[str]] = {
+    "baseline": (),
+    # 去掉只按时间的 usage 索引，衡量它对写入与历史查询的影响
+    "no_usage_time_index": ("DROP INDEX IF EXISTS idx_usage_time",),
+    # 去掉与主键重复的 latest 索引
+    "no_latest_dup_index": ("DROP INDEX IF EXISTS idx_latest_station",),
+}
+
+DEFAULT_BATCH_SIZES = "100,1000"
+LOWER_IS_BETTER = ("median_ms",)
+UTC8 = timezone(timedelta(hours=8))
+
+
+def _time_ms(operation: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    durations: List[float] = []
+    result: Any = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = operation()
+        durations.append((time.perf_counter() - started) * 1000)
+    rows = len(result) if isinstance(result, (list, dict)) else None
+    return {
+        "median_ms": round(percentile(durations, 0.5), 3),
+        "min_ms": round(min(durations), 3),
+        "max_ms": round(max(durations), 3),
+        "repeat": repeat,
+        "rows": rows,
+    }
+
+
+def build_database(
+    path: Path, profile: str, variant: str, args: argparse.Namespace
+) -> Dict[str, Any]:
+    """初始化库结构、应用设置并写入站点、latest 与 usage 历史，返回站点与快照信息"""
+    from benchmarks.synthetic import generate_stations, synthetic_snapshot
+    from db import (
+        batch_upsert_stations,
+        get_db_client,
+        initialize_db_config,
+        record_usage_data,
+        reset_db_client,
+    )
+
+    reset_db_client()
+    initialize_db_config(str(path))
+    conn = get_db_client()
+    for statement in PRAGMA_PROFILES[profile]:
+        conn.execute(statement)
+    for statement in SCHEMA_VARIANTS[variant]:
+        conn.execute(statement)
+    conn.commit()
+
+    providers = [item.strip() for item in args.providers.split(",") if item.strip()]
+    stations = generate_stations(args.stations, args.seed, providers)
+    batch_upsert_stations(stations)
+    snapshot = synthetic_snapshot(stations, args.seed)
+    record_usage_data(snapshot, history_mode_enabled=False, port_states_enabled=True)
+
+    # 历史数据直接批量写入（不是被测对象），每站沿用同一端口状态位图以接近真实行大小
+    rng = random.Random(args.seed)
+    interval = timedelta(minutes=args.interval_minutes)
+    cycles = int(args.days * 24 * 60 / args.interval_minutes)
+    end = datetime(2025, 1, 1, 8, tzinfo=UTC8)
+    start = end - interval * cycles
+    port_blobs = {row["hash_id"]: row["port_states"] for row in snapshot["stations"]}
+    totals = {row["hash_id"]: row["total"] for row in snapshot["stations"]}
+    for cycle in range(cycles):
+        snapshot_time = (start + interval * cycle).isoformat()
+        rows = []
+        for hash_id, total in totals.items():
+            used = rng.randint(0, total)
+            rows.append((hash_id, snapshot_time, total - used, used, total, 0, port_blobs[hash_id]))
+        conn.executemany(
+            "INSERT INTO usage (hash_id, snapshot_time, free, used, total, error, port_states) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    return {
+        "stations": stations,
+        "snapshot": snapshot,
+        "history_rows": cycles * len(stations),
+        "history_start": start,
+        "history_end": end,
+    }
+
+
+def run_operations(fixture: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Dict]:
+    from db import (
+        batch_insert,
+        fetch_latest_version,
+        fetch_station_metadata,
+        get_db_client,
+        load_latest,
+    )
+    from db.client import execute_batch_upsert, execute_query
+    from db.station_repo import _station_to_row
+
+    stations = fixture["stations"]
+    snapshot = fixture["snapshot"]
+    station_rows = [row for row in map(_station_to_row, stations) if row]
+    subset = [station.hash_id for station in stations[:50]]
+    provider = stations[0].provider
+    end = fixture["history_end"]
+    day_ago = (end - timedelta(days=1)).isoformat()
+    conn = get_db_client()
+
+    results: Dict[str, Dict] = {}
+
+    def measure(name: str, operation: Callable[[], Any]) -> None:
+        results[name] = _time_ms(operation, args.repeat)
+
+    # --- 写路径 ---
+    measure("stations.execute_batch_upsert", lambda: execute_batch_upsert("stations", station_rows))
+    measure(
+        "latest.batch_insert", lambda: batch_insert(snapshot, "latest", include_port_states=True)
+    )
+    measure("usage.batch_insert", lambda: batch_insert(snapshot, "usage", include_port_states=True))
+
+    for batch_size in [int(item) for item in args.batch_sizes.split(",") if item.strip()]:
+        chunks = [
+            {
+                "updated_at": snapshot["updated_at"],
+                "stations": snapshot["stations"][i : i + batch_size],
+            }
+            for i in range(0, len(snapshot["stations"]), batch_size)
+        ]
+        measure(
+            f"usage.batch{batch_size}.commit_each",
+            lambda chunks=chunks: [
+                batch_insert(chunk, "usage", include_port_states=True) for chunk in chunks
+            ],
+        )
+
+        def one_transaction(chunks=chunks) -> None:
+            # 与 batch_insert 相同的语句，但所有批次只在最后提交一次
+            for chunk in chunks:
+                conn.executemany(
+                    "INSERT INTO usage (hash_id, snapshot_time, free, used, total, error, "
+                    "port_states) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (
+                            row["hash_id"],
+                            chunk["updated_at"],
+                            row["free"],
+                            row["used"],
+                            row["total"],
+                            row["error"],
+                            row["port_states"],
+                        )
+                        for row in chunk["stations"]
+                    ],
+                )
+            conn.commit()
+
+        measure(f"usage.batch{batch_size}.one_transaction", one_transaction)
+
+    # --- 读路径 ---
+    measure("load_latest.all", lambda: (load_latest() or {}).get("rows", []))
+    measure("load_latest.50_ids", lambda: (load_latest(subset) or {}).get("rows", []))
+    measure("fetch_station_metadata.all", fetch_station_metadata)
+    measure("fetch_station_metadata.provider", lambda: fetch_station_metadata(provider=provider))
+    measure("fetch_latest_version", fetch_latest_version)
+
+    # --- 历史查询 ---
+    hash_id = stations[len(stations) // 2].hash_id
+    measure(
+        "history.station_24h",
+        lambda: execute_query(
+            "SELECT snapshot_time, free, used, total FROM usage "
+            "WHERE hash_id = ? AND snapshot_time >= ? ORDER BY snapshot_time",
+            [hash_id, day_ago],
+        ),
+    )
+    measure(
+        "history.hourly_free_24h",
+        lambda: execute_query(
+            "SELECT hash_id, substr(snapshot_time, 1, 13) AS hour, AVG(free) AS free "
+            "FROM usage WHERE snapshot_time >= ? GROUP BY hash_id, hour",
+            [day_ago],
+        ),
+    )
+    measure(
+        "history.recent_snapshots",
+        lambda: execute_query(
+            "SELECT DISTINCT snapshot_time FROM usage ORDER BY snapshot_time DESC LIMIT 12"
+        ),
+    )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="数据库层写入与读取路径微基准")
+    parser.add_argument("--stations", type=int, default=1000)
+    parser.add_argument("--days", type=float, default=3, help="usage 历史天数")
+    parser.add_argument("--interval-minutes", type=int, default=5, help="历史快照间隔（分钟）")
+    parser.add_argument("--providers", default="neptune,dlmm,else,neptune_junior")
+    parser.add_argument("--profiles", default=",".join(PRAGMA_PROFILES), help="PRAGMA 配置")
+    parser.add_argument("--variants", default="baseline", help="表结构变体")
+    parser.add_argument("--batch-sizes", default=DEFAULT_BATCH_SIZES, help="usage 分批大小")
+    parser.add_argument("--repeat", type=int, default=5, help="每个操作重复次数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果文件，默认 data/benchmarks/db_bench-<commit>.json")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="对比容差（比例）")
+    parser.add_argument("--keep-workdir", action="store_true", help="保留生成的数据库文件")
+    args = parser.parse_args()
+
+    profiles = [item.strip() for item in args.profiles.split(",") if item.strip()]
+    variants = [item.strip() for item in args.variants.split(",") if item.strip()]
+    unknown = (set(profiles) - set(PRAGMA_PROFILES)) | (set(variants) - set(SCHEMA_VARIANTS))
+    if unknown:
+        parser.error(f"unknown profiles/variants: {', '.join(sorted(unknown))}")
+
+    # 先读取对比基线，避免同一提交下输出文件覆盖基线
+    baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+
+    workdir = Path(tempfile.mkdtemp(prefix="zju-bench-db-"))
+    os.environ.update(isolated_env(workdir))
+    cases: List[Dict[str, Any]] = []
+    settings: List[Dict[str, Any]] = []
+    try:
+        for profile in profiles:
+            for variant in variants:
+                path = workdir / f"{profile}-{variant}.db"
+                print(f"[db_bench] {profile}/{variant}: building", file=sys.stderr)
+                started = time.perf_counter()
+                fixture = build_database(path, profile, variant, args)
+                build_ms = round((time.perf_counter() - started) * 1000, 1)
+                operations = run_operations(fixture, args)
+                settings.append(
+                    {
+                        "profile": profile,
+                        "variant": variant,
+                        "build_ms": build_ms,
+                        "history_rows": fixture["history_rows"],
+                        "db_bytes": file_size(path, path.with_name(path.name + "-wal")),
+                    }
+                )
+                for operation, summary in operations.items():
+                    cases.append(
+                        {
+                            "name": f"{profile}/{variant}/{operation}",
+                            "profile": profile,
+                            "variant": variant,
+                            "operation": operation,
+                            "summary": summary,
+                        }
+                    )
+                    print(
+                        f"  {operation}: {summary['median_ms']:.2f}ms (min {summary['min_ms']:.2f})",
+                        file=sys.stderr,
+                    )
+    finally:
+        from db import reset_db_client
+
+        reset_db_client()
+        if args.keep_workdir:
+            print(f"  workdir kept at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    metadata = run_metadata()
+    document = {
+        "benchmark": "db_bench",
+        "format": RESULT_FORMAT_VERSION,
+        **metadata,
+        "params": {
+            "stations": args.stations,
+            "days": args.days,
+            "interval_minutes": args.interval_minutes,
+            "providers": args.providers,
+            "batch_sizes": args.batch_sizes,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "settings": settings,
+        "cases": cases,
+    }
+    output = Path(
+        args.output or default_results_dir() / f"db_bench-{metadata['commit'] or 'unknown'}.json"
+    )
+    write_results(document, output)
+    print(f"results written to {os.path.relpath(output)}")
+
+    if baseline is not None:
+        if baseline.get("params") != document["params"]:
+            print("warning: baseline was run with different parameters", file=sys.stderr)
+        regressions = compare_results(document, baseline, LOWER_IS_BETTER, (), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
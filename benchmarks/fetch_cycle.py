@@ -0,0 +1,331 @@
+"""
+抓取周期扩展性基准
+
+对每个规模（默认 1k / 10k / 100k 个站点）在独立子进程与临时目录中运行若干完整周期：
+
+    合成上游 advance -> ProviderManager.fetch_and_format -> record_usage_data
+    -> 列式状态表 + 共享状态表发布 -> GET /api/status（ASGI 进程内调用）
+
+记录每个阶段耗时、设备吞吐、峰值 RSS 与数据库增长，结果写入 JSON 文件；
+--compare 与此前的结果文件对比，超出容差时以退出码 1 结束，便于在提交之间发现扩展性退化。
+
+    python -m benchmarks.fetch_cycle --scales 1000,10000 --cycles 3
+    python -m benchmarks.fetch_cycle --compare data/benchmarks/fetch_cycle-abc1234.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks.common import (
+    PROJECT_ROOT,
+    RESULT_FORMAT_VERSION,
+    compare_results,
+    default_results_dir,
+    file_size,
+    isolated_env,
+    peak_rss_bytes,
+    percentile,
+    run_metadata,
+    write_results,
+)
+
+DEFAULT_SCALES = "1000,10000,100000"
+# 对比时越小越好 / 越大越好的汇总指标
+LOWER_IS_BETTER = (
+    "cycle_ms",
+    "fetch_ms",
+    "record_ms",
+    "publish_ms",
+    "api_cold_ms",
+    "api_warm_ms",
+    "peak_rss_mb",
+    "db_growth_bytes_per_cycle",
+)
+HIGHER_IS_BETTER = ("devices_per_s",)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _run_cycles(args: argparse.Namespace) -> Dict[str, Any]:
+    """在当前（已隔离环境的）进程中运行一个规模的全部周期"""
+    import aiohttp
+    import httpx
+
+    from benchmarks.synthetic import (
+        PROVIDER_KEY,
+        SyntheticProvider,
+        advance_upstream,
+        generate_stations,
+        start_upstream_process,
+    )
+    from db import batch_upsert_stations, get_db_client, record_usage_data
+    from fetcher.provider_manager import ProviderManager
+    from fetcher.providers.registry import ProviderRegistry
+    from fetcher.status_table import StationCatalog, StatusTable
+    from server.config import Config
+    from server.fetch_coordination import notify_cycle_complete
+    from server.shared_status import SharedStatusWriter
+
+    upstream, upstream_url = start_upstream_process(
+        args.seed, args.change_rate, args.latency, args.error_rate
+    )
+    try:
+        Config.UPSTREAM_OVERRIDE_URL = upstream_url
+
+        started = time.perf_counter()
+        stations = generate_stations(args.run_scale, args.seed)
+        device_count = sum(len(station.device_ids) for station in stations)
+        SyntheticProvider.catalog = stations
+        registry = ProviderRegistry(discover_entry_points=False)
+        registry.register(PROVIDER_KEY, SyntheticProvider)
+        manager = ProviderManager(enabled=[PROVIDER_KEY], registry=registry)
+        generate_ms = _elapsed_ms(started)
+
+        # 导入 API 模块时按隔离后的 SQLITE_DB_PATH 初始化数据库
+        from server.api import app
+
+        started = time.perf_counter()
+        batch_upsert_stations(stations)
+        station_sync_ms = _elapsed_ms(started)
+
+        db_path = Path(Config.SQLITE_DB_PATH)
+        db_files = (db_path, db_path.with_name(db_path.name + "-wal"))
+        catalog = StationCatalog()
+        shared_status = SharedStatusWriter()
+        last_table = None
+        cycles: List[Dict[str, Any]] = []
+
+        transport = httpx.ASGITransport(app=app)
+        async with (
+            aiohttp.ClientSession() as control,
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client,
+        ):
+            for cycle in range(args.cycles):
+                db_before = file_size(*db_files)
+                changed_ports = (await advance_upstream(control, upstream_url))["changed_ports"]
+                cycle_started = time.perf_counter()
+
+                started = time.perf_counter()
+                result = await manager.fetch_and_format()
+                fetch_ms = _elapsed_ms(started)
+                result = result or {"stations": []}
+                snapshot_time = result.get("updated_at")
+
+                started = time.perf_counter()
+                record_usage_data(
+                    result,
+                    history_mode_enabled=Config.HISTORY_ENABLED,
+                    port_states_enabled=Config.PORT_STATES_ENABLED,
+                )
+                record_ms = _elapsed_ms(started)
+
+                started = time.perf_counter()
+                table = StatusTable.from_stations(result["stations"], catalog, snapshot_time)
+                changed_stations = len(table.diff(last_table))
+                last_table = table
+                shared_status.publish(table.count_rows(), snapshot_time)
+                notify_cycle_complete({"reason": "benchmark", "updated_at": snapshot_time})
+                publish_ms = _elapsed_ms(started)
+
+                api_latencies: List[float] = []
+                served = response_bytes = 0
+                for _ in range(args.api_requests):
+                    started = time.perf_counter()
+                    response = await client.get("/api/status")
+                    api_latencies.append(_elapsed_ms(started))
+                    response.raise_for_status()
+                    response_bytes = len(response.content)
+                    served = len(response.json().get("stations", []))
+                cycle_ms = _elapsed_ms(cycle_started)
+
+                cycles.append(
+                    {
+                        "cycle": cycle,
+                        "changed_ports": changed_ports,
+                        "changed_stations": changed_stations,
+                        "stations_fetched": len(result["stations"]),
+                        "stations_served": served,
+                        "fetch_ms": fetch_ms,
+                        "record_ms": record_ms,
+                        "publish_ms": publish_ms,
+                        "api_cold_ms": api_latencies[0] if api_latencies else 0.0,
+                        "api_warm_ms": percentile(api_latencies[1:], 0.5),
+                        "api_response_bytes": response_bytes,
+                        "cycle_ms": cycle_ms,
+                        "devices_per_s": round(device_count / (fetch_ms / 1000), 1)
+                        if fetch_ms
+                        else 0.0,
+                        "db_bytes": file_size(*db_files),
+                        "db_growth_bytes": file_size(*db_files) - db_before,
+                        "peak_rss_mb": round(peak_rss_bytes() / 2**20, 1),
+                    }
+                )
+                print(
+                    f"  cycle {cycle}: fetch {fetch_ms:.0f}ms, record {record_ms:.0f}ms, "
+                    f"publish {publish_ms:.0f}ms, api {cycles[-1]['api_cold_ms']:.0f}ms",
+                    file=sys.stderr,
+                )
+
+        usage_rows = get_db_client().execute("SELECT COUNT(*) FROM usage").fetchone()[0]
+    finally:
+        upstream.terminate()
+        upstream.join(5)
+
+    def median(metric: str) -> float:
+        return round(percentile([cycle[metric] for cycle in cycles], 0.5), 1)
+
+    return {
+        "name": f"{args.run_scale} stations",
+        "stations": args.run_scale,
+        "devices": device_count,
+        "generate_ms": generate_ms,
+        "station_sync_ms": station_sync_ms,
+        "usage_rows": usage_rows,
+        "cycles": cycles,
+        "summary": {
+            **{
+                metric: median(metric)
+                for metric in (
+                    "cycle_ms",
+                    "fetch_ms",
+                    "record_ms",
+                    "publish_ms",
+                    "api_cold_ms",
+                    "api_warm_ms",
+                    "devices_per_s",
+                )
+            },
+            "peak_rss_mb": max(cycle["peak_rss_mb"] for cycle in cycles),
+            "db_bytes": cycles[-1]["db_bytes"],
+            "db_growth_bytes_per_cycle": median("db_growth_bytes"),
+        },
+    }
+
+
+def _run_scale_subprocess(args: argparse.Namespace, scale: int) -> Dict[str, Any]:
+    """每个规模一个子进程：峰值 RSS 互不影响，Config 按隔离后的环境变量重新读取"""
+    workdir = Path(tempfile.mkdtemp(prefix=f"zju-bench-{scale}-"))
+    result_file = workdir / "result.json"
+    command = [
+        sys.executable,
+        "-m",
+        "benchmarks.fetch_cycle",
+        "--run-scale",
+        str(scale),
+        "--result-file",
+        str(result_file),
+        "--cycles",
+        str(args.cycles),
+        "--change-rate",
+        str(args.change_rate),
+        "--latency",
+        args.latency,
+        "--error-rate",
+        str(args.error_rate),
+        "--api-requests",
+        str(args.api_requests),
+        "--seed",
+        str(args.seed),
+    ]
+    env = isolated_env(
+        workdir,
+        RATE_LIMIT_ENABLED="false",
+        STATIC_SNAPSHOT_ENABLED="false",
+        FETCH_METRICS_EXPORT="false",
+        HISTORY_ENABLED="true" if args.history else "false",
+    )
+    try:
+        subprocess.run(command, cwd=PROJECT_ROOT, env=env, check=True)
+        return json.loads(result_file.read_text(encoding="utf-8"))
+    finally:
+        if args.keep_workdir:
+            print(f"  workdir kept at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="合成大规模站点目录的抓取周期扩展性基准")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="逗号分隔的站点数")
+    parser.add_argument("--cycles", type=int, default=3, help="每个规模运行的周期数")
+    parser.add_argument("--change-rate", type=float, default=0.05, help="每轮变化的端口比例")
+    parser.add_argument("--latency", default="fixed:0", help="合成上游延迟分布（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="合成上游返回 503 的比例")
+    parser.add_argument("--api-requests", type=int, default=5, help="每轮 /api/status 请求次数")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--no-history",
+        dest="history",
+        action="store_false",
+        help="关闭 usage 历史表（HISTORY_ENABLED=false）",
+    )
+    parser.add_argument("--output", help="结果文件，默认 data/benchmarks/fetch_cycle-<commit>.json")
+    parser.add_argument("--compare", help="与之前的结果文件对比")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="对比容差（比例）")
+    parser.add_argument("--keep-workdir", action="store_true", help="保留每个规模的临时目录")
+    # 内部参数：由父进程为单个规模启动子进程时使用
+    parser.add_argument("--run-scale", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scale:
+        write_results(asyncio.run(_run_cycles(args)), Path(args.result_file))
+        return
+
+    scales = [int(item) for item in args.scales.split(",") if item.strip()]
+    metadata = run_metadata()
+    document: Dict[str, Any] = {
+        "benchmark": "fetch_cycle",
+        "format": RESULT_FORMAT_VERSION,
+        **metadata,
+        "params": {
+            "scales": scales,
+            "cycles": args.cycles,
+            "change_rate": args.change_rate,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "api_requests": args.api_requests,
+            "seed": args.seed,
+            "history": args.history,
+        },
+        "cases": [],
+    }
+    for scale in scales:
+        print(f"[fetch_cycle] {scale} stations", file=sys.stderr)
+        document["cases"].append(_run_scale_subprocess(args, scale))
+
+    output = Path(
+        args.output or default_results_dir() / f"fetch_cycle-{metadata['commit'] or 'unknown'}.json"
+    )
+    write_results(document, output)
+    for case in document["cases"]:
+        print(f"{case['name']}: {json.dumps(case['summary'], ensure_ascii=False)}")
+    print(f"results written to {os.path.relpath(output)}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        comparable = ("cycles", "change_rate", "latency", "error_rate", "seed", "history")
+        if any(baseline["params"].get(key) != document["params"][key] for key in comparable):
+            print("warning: baseline was run with different parameters", file=sys.stderr)
+        regressions = compare_results(
+            document, baseline, LOWER_IS_BETTER, HIGHER_IS_BETTER, args.tolerance
+        )
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+合成站点目录与合成上游
+
+- generate_stations：按真实站点的设备数分布（平均约 3 个设备）生成任意规模的站点目录，
+  hash_id 按序号分配，100k 规模下也不会碰撞；
+- synthetic_snapshot：不经过上游直接生成一轮抓取结果，用于预置 API / 数据库基准的 SQLite 数据；
+- SyntheticUpstream：模拟电驴妈妈 getStation 接口，每个设备 PORTS_PER_DEVICE 个端口，
+  每次 advance 按 change_rate 随机改变一部分端口状态，相同 seed 的两次运行完全一致；
+- SyntheticProvider：复用 DlmmProvider 的请求与解析逻辑，请求经 UPSTREAM_OVERRIDE_URL
+  改发到合成上游，因此抓取路径与线上完全相同。
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, ClassVar, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.common import free_port
+from fetcher.mock_upstream import FaultProfile
+from fetcher.providers.dlmm import DlmmProvider
+from fetcher.port_state import encode_station_ports
+from fetcher.station import CAMPUS_NAME_MAP, Station
+
+PROVIDER_KEY = "synthetic"
+PORTS_PER_DEVICE = 10
+ADVANCE_PATH = "/__synthetic__/advance"
+DEVICE_ID_BASE = 40_000_000
+# 每站设备数分布，接近 fetcher/providers/data 中的真实站点
+DEVICES_PER_STATION = ((1, 0.25), (2, 0.3), (3, 0.2), (4, 0.15), (6, 0.07), (10, 0.03))
+# 初始端口状态分布：空闲 / 占用 / 故障（电驴妈妈状态码 0 / 1 / 2）
+INITIAL_PORT_STATES = ((0, 0.6), (1, 0.35), (2, 0.05))
+
+
+def generate_stations(
+    count: int, seed: int, providers: Sequence[str] = (PROVIDER_KEY,)
+) -> List[Station]:
+    """生成 count 个站点（按顺序轮流分配给 providers），相同参数总是得到相同的目录"""
+    rng = random.Random(seed)
+    sizes, size_weights = zip(*DEVICES_PER_STATION)
+    campus_ids = sorted(CAMPUS_NAME_MAP)
+    stations: List[Station] = []
+    next_device = DEVICE_ID_BASE
+    for index in range(count):
+        device_count = rng.choices(sizes, size_weights)[0]
+        device_ids = [str(next_device + offset) for offset in range(device_count)]
+        next_device += device_count
+        campus_id = campus_ids[index % len(campus_ids)]
+        stations.append(
+            Station.restore(
+                hash_id=f"{index:08x}",
+                name=f"合成站点-{index:06d}",
+                provider=providers[index % len(providers)],
+                campus_id=campus_id,
+                campus_name=CAMPUS_NAME_MAP[campus_id],
+                lat=30.0 + rng.random() * 0.3,
+                lon=120.0 + rng.random() * 0.3,
+                device_ids=device_ids,
+            )
+        )
+    return stations
+
+
+def synthetic_snapshot(stations: Sequence[Station], seed: int, cycle: int = 0) -> Dict[str, Any]:
+    """生成一轮 fetch_and_format 格式的抓取结果（含端口级状态），cycle 决定快照时间"""
+    rng = random.Random(f"{seed}:{cycle}")
+    codes, weights = zip(*INITIAL_PORT_STATES)
+    updated_at = (
+        datetime(2025, 1, 1, 8, tzinfo=timezone(timedelta(hours=8))) + timedelta(minutes=5 * cycle)
+    ).isoformat()
+    rows: List[Dict[str, Any]] = []
+    for station in stations:
+        devices = [rng.choices(codes, weights, k=PORTS_PER_DEVICE) for _ in station.device_ids]
+        ports = [state for device in devices for state in device]
+        rows.append(
+            {
+                "provider": station.provider,
+                "hash_id": station.hash_id,
+                "name": station.name,
+                "campus_id": station.campus_id,
+                "campus_name": station.campus_name,
+                "lat": station.lat,
+                "lon": station.lon,
+                "device_ids": station.device_ids,
+                "updated_at": updated_at,
+                "free": ports.count(0),
+                "used": ports.count(1),
+                "total": len(ports),
+                "error": ports.count(2),
+                "port_states": encode_station_ports(devices),
+            }
+        )
+    return {"updated_at": updated_at, "stations": rows}
+
+
+class SyntheticUpstream:
+    """按设备号返回端口状态的合成上游"""
+
+    def __init__(
+        self, seed: int, change_rate: float, profile: Optional[FaultProfile] = None
+    ) -> None:
+        self.seed = seed
+        self.change_rate = change_rate
+        self.profile = profile or FaultProfile()
+        self.rng = random.Random(seed)
+        self.ports: Dict[str, bytearray] = {}
+        self.cycle = 0
+        self.requests = 0
+
+    def _device_ports(self, device_id: str) -> bytearray:
+        ports = self.ports.get(device_id)
+        if ports is None:
+            codes, weights = zip(*INITIAL_PORT_STATES)
+            rng = random.Random(f"{self.seed}:{device_id}")
+            ports = bytearray(rng.choices(codes, weights, k=PORTS_PER_DEVICE))
+            self.ports[device_id] = ports
+        return ports
+
+    def advance(self) -> int:
+        """进入下一轮：随机改变 change_rate 比例的端口，返回改变的端口数"""
+        self.cycle += 1
+        devices = sorted(self.ports)
+        total = len(devices) * PORTS_PER_DEVICE
+        changes = min(total, int(round(total * self.change_rate)))
+        for position in self.rng.sample(range(total), changes):
+            ports = self.ports[devices[position // PORTS_PER_DEVICE]]
+            port = position % PORTS_PER_DEVICE
+            # 空闲与占用互换为主，少量端口进入或离开故障
+            ports[port] = 2 if self.rng.random() < 0.02 else 1 - min(ports[port], 1)
+        return changes
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/dlServer/dlmm/getStation", self._handle_station)
+        app.router.add_post(ADVANCE_PATH, self._handle_advance)
+        return app
+
+    async def _handle_station(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        latency = self.profile.sample_latency(self.rng)
+        if latency:
+            await asyncio.sleep(latency)
+        roll = self.rng.random()
+        if roll < self.profile.error_rate:
+            return web.Response(status=503, text="synthetic upstream error")
+        payload = await request.json()
+        ports = self._device_ports(str(payload.get("stationNo")))
+        return web.json_response(
+            {"code": 200, "data": {"socketArray": [{"status": state} for state in ports]}}
+        )
+
+    async def _handle_advance(self, request: web.Request) -> web.Response:
+        changed = self.advance()
+        return web.json_response(
+            {"cycle": self.cycle, "changed_ports": changed, "requests": self.requests}
+        )
+
+
+def serve_upstream(port: int, seed: int, change_rate: float, latency: str, error_rate: float):
+    """在独立进程中运行合成上游（multiprocessing 目标函数）"""
+    upstream = SyntheticUpstream(seed, change_rate, FaultProfile(latency, error_rate))
+    web.run_app(upstream.build_app(), host="127.0.0.1", port=port, print=None)
+
+
+def start_upstream_process(
+    seed: int, change_rate: float, latency: str = "fixed:0", error_rate: float = 0.0
+) -> Tuple[multiprocessing.Process, str]:
+    """启动合成上游进程并等待就绪，返回 (进程, 基础 URL)
+
+    上游放在独立进程中，避免与被测的抓取事件循环争用同一个 CPU 核。
+    """
+    port = free_port()
+    process = multiprocessing.get_context("spawn").Process(
+        target=serve_upstream,
+        args=(port, seed, change_rate, latency, error_rate),
+        daemon=True,
+    )
+    process.start()
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            if not process.is_alive():
+                break
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError("Synthetic upstream failed to start")
+
+
+async def advance_upstream(session: aiohttp.ClientSession, base_url: str) -> Dict[str, int]:
+    async with session.post(base_url + ADVANCE_PATH) as response:
+        response.raise_for_status()
+        return await response.json()
+
+
+@dataclass
+class SyntheticProvider(DlmmProvider):
+    """使用合成站点目录的电驴妈妈适配器"""
+
+    # 由基准测试在创建 ProviderManager 前设置
+    catalog: ClassVar[List[Station]] = []
+
+    @property
+    def provider(self) -> str:
+        return PROVIDER_KEY
+
+    def load_stations(self) -> List[Station]:
+        self.station_list = list(self.catalog)
+        return self.station_list
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="单独运行合成上游（配合 UPSTREAM_OVERRIDE_URL）")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--change-rate", type=float, default=0.05)
+    parser.add_argument("--latency", default="fixed:0")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    serve_upstream(args.port, args.seed, args.change_rate, args.latency, args.error_rate)
+
+
+if __name__ == "__main__":
+    main()
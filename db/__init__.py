@@ -16,9 +16,12 @@ from .client import (
 from .station_repo import (
     upsert_station,
     batch_upsert_stations,
+    delete_stations,
     fetch_station_metadata,
     fetch_all_stations_data,  # 低耦合查询接口，返回 List[Dict]
     fetch_distinct_providers,
+    fetch_stations_version,
+    fetch_catalog_version,
 )
 
 # --- 2. 使用数据仓库 (usage, latest 表) ---
@@ -26,6 +29,8 @@ from .usage_repo import (
     insert,  # 单条插入接口
     batch_insert,  # 批量插入接口
     load_latest,  # 读取最新缓存接口
+    load_latest_port_states,  # 读取端口级状态
+    fetch_latest_version,  # 读取 latest 表数据版本
 )
 
 # --- 3. 业务管道 (核心写入逻辑) ---
@@ -40,13 +45,18 @@ __all__ = [
     # station_repo
     "upsert_station",
     "batch_upsert_stations",
+    "delete_stations",
     "fetch_station_metadata",
     "fetch_all_stations_data",
     "fetch_distinct_providers",
+    "fetch_stations_version",
+    "fetch_catalog_version",
     # usage_repo
     "insert",
     "batch_insert",
     "load_latest",
+    "load_latest_port_states",
+    "fetch_latest_version",
     # pipeline
     "record_usage_data",
 ]
@@ -3,20 +3,41 @@
 """SQLite 客户端管理"""
 
 import os
+import re
 import sqlite3
 import json
+import time
 from pathlib import Path
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Sequence
 
 import logfire
 
+from server.config import Config
 from server.logfire_setup import ensure_logfire_configured
 
 ensure_logfire_configured()
 
+query_duration_histogram = logfire.metric_histogram(
+    "db.query.duration",
+    unit="ms",
+    description="SQLite statement latency including row fetch",
+)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# IN (?, ?, ...) 的占位符个数随参数变化，规范化时折叠为一种写法
+_IN_LIST_RE = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+([A-Za-z_][A-Za-z0-9_]*)", re.IGNORECASE)
+
 _db_connection: Optional[sqlite3.Connection] = None
 _db_path: Optional[str] = None
 
+# schema.sql 之后新增的列：(表名, 列名, 列定义)
+SCHEMA_MIGRATION_COLUMNS = [
+    ("stations", "fingerprint", "TEXT"),
+    ("latest", "port_states", "BLOB"),
+    ("usage", "port_states", "BLOB"),
+]
+
 
 def get_default_db_path() -> str:
     """获取默认数据库文件路径"""
@@ -63,6 +84,9 @@ def initialize_db_config(db_path: Optional[str] = None) -> bool:
             with open(schema_path) as f:
                 schema_sql = f.read()
             conn.executescript(schema_sql)
+            # CREATE TABLE IF NOT EXISTS 不会为旧库补列，这里补齐后续新增的列
+            for table, column, declaration in SCHEMA_MIGRATION_COLUMNS:
+                _ensure_column(conn, table, column, declaration)
             conn.commit()
             logfire.info("数据库结构初始化成功")
         else:
@@ -74,6 +98,16 @@ def initialize_db_config(db_path: Optional[str] = None) -> bool:
         return False
 
 
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, declaration: str) -> bool:
+    """列不存在时执行 ALTER TABLE ADD COLUMN，返回是否新增了列"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if column in existing:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    logfire.info("已为 {table} 表补充列 {column}", table=table, column=column)
+    return True
+
+
 def get_db_client() -> Optional[sqlite3.Connection]:
     """获取 SQLite 数据库连接实例（单例模式）"""
     global _db_connection, _db_path
@@ -110,6 +144,102 @@ def reset_db_client():
         logfire.info("数据库连接已重置（配置保持不变）")
 
 
+# 辅助函数：语句计时与慢查询日志
+
+
+def normalize_sql(query: str) -> str:
+    """压缩空白并折叠 IN 列表占位符，使同一语句在不同参数个数下归为一类"""
+    return _IN_LIST_RE.sub("IN (?...)", _WHITESPACE_RE.sub(" ", query).strip())
+
+
+def _explain_query_plan(
+    conn: sqlite3.Connection, query: str, params: Sequence[Any]
+) -> Optional[str]:
+    """获取语句的 EXPLAIN QUERY PLAN（各步骤以 | 分隔），失败时返回 None"""
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", list(params)).fetchall()
+    except sqlite3.Error:
+        return None
+    return " | ".join(str(row[3]) for row in rows) or None
+
+
+def _record_statement(
+    conn: sqlite3.Connection,
+    query: str,
+    params: Sequence[Any],
+    duration_ms: float,
+    row_count: int,
+    batch_size: Optional[int] = None,
+) -> None:
+    """记录语句耗时直方图；超过 DB_SLOW_QUERY_MS 时输出慢查询日志与查询计划"""
+    statement = normalize_sql(query)
+    operation = statement.split(" ", 1)[0].upper()
+    table_match = _TABLE_RE.search(statement)
+    table = table_match.group(1) if table_match else ""
+    query_duration_histogram.record(duration_ms, {"operation": operation, "table": table})
+
+    threshold = Config.DB_SLOW_QUERY_MS
+    if threshold <= 0 or duration_ms < threshold:
+        return
+    logfire.warn(
+        "慢查询 {duration_ms}ms: {statement}",
+        duration_ms=round(duration_ms, 1),
+        statement=statement,
+        operation=operation,
+        table=table,
+        param_count=len(params),
+        row_count=row_count,
+        batch_size=batch_size,
+        query_plan=_explain_query_plan(conn, query, params),
+    )
+
+
+def timed_execute(
+    cursor: sqlite3.Cursor,
+    query: str,
+    params: Optional[Sequence[Any]] = None,
+    fetch: Optional[str] = None,
+) -> Any:
+    """
+    执行单条语句并计时（fetch 为 "all" / "one" 时取结果的耗时一并计入）
+
+    Returns:
+        fetch="all" 时返回行列表，fetch="one" 时返回单行或 None，否则返回 None
+    """
+    params = params or []
+    started = time.perf_counter()
+    cursor.execute(query, params)
+    result = None
+    if fetch == "all":
+        result = cursor.fetchall()
+        row_count = len(result)
+    elif fetch == "one":
+        result = cursor.fetchone()
+        row_count = 1 if result else 0
+    else:
+        row_count = cursor.rowcount
+    _record_statement(
+        cursor.connection, query, params, (time.perf_counter() - started) * 1000, row_count
+    )
+    return result
+
+
+def timed_executemany(
+    cursor: sqlite3.Cursor, query: str, params_list: Sequence[Sequence[Any]]
+) -> None:
+    """批量执行同一语句并计时，慢查询日志中的查询计划按第一组参数获取"""
+    started = time.perf_counter()
+    cursor.executemany(query, params_list)
+    _record_statement(
+        cursor.connection,
+        query,
+        params_list[0] if params_list else [],
+        (time.perf_counter() - started) * 1000,
+        cursor.rowcount,
+        batch_size=len(params_list),
+    )
+
+
 # 辅助函数：处理 JSON 字段（device_ids）
 
 
@@ -187,14 +317,12 @@ def execute_query(
 
     try:
         cursor = conn.cursor()
-        cursor.execute(query, params or [])
+        result = timed_execute(cursor, query, params, fetch=fetch)
 
         if fetch == "all":
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            return [dict(row) for row in result]
         elif fetch == "one":
-            row = cursor.fetchone()
-            return dict(row) if row else None
+            return dict(result) if result else None
         return []
     except Exception as e:
         logfire.error("查询执行失败: {error}, query: {query}", error=str(e), query=query)
@@ -218,7 +346,7 @@ def execute_update(query: str, params: Optional[List[Any]] = None) -> bool:
 
     try:
         cursor = conn.cursor()
-        cursor.execute(query, params or [])
+        timed_execute(cursor, query, params)
         conn.commit()
         return True
     except Exception as e:
@@ -264,7 +392,7 @@ def execute_upsert(table: str, data: Dict[str, Any], conflict_column: str = "has
         """
 
         cursor = conn.cursor()
-        cursor.execute(query, values)
+        timed_execute(cursor, query, values)
         conn.commit()
         return True
     except Exception as e:
@@ -318,7 +446,7 @@ def execute_batch_upsert(
         """
 
         cursor = conn.cursor()
-        cursor.executemany(query, values_list)
+        timed_executemany(cursor, query, values_list)
         conn.commit()
         return True
     except Exception as e:
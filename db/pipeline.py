@@ -17,7 +17,11 @@ from .usage_repo import batch_insert
 ensure_logfire_configured()
 
 
-def record_usage_data(data: Dict[str, Any], history_mode_enabled: bool = False) -> bool:
+def record_usage_data(
+    data: Dict[str, Any],
+    history_mode_enabled: bool = False,
+    port_states_enabled: bool = False,
+) -> bool:
     """
     核心数据管道：根据模式参数，决定是只更新 latest 缓存，还是同时记录 usage 历史。
 
@@ -25,6 +29,7 @@ def record_usage_data(data: Dict[str, Any], history_mode_enabled: bool = False)
         data: 包含 'stations' (List[Dict]) 和 'updated_at' (str) 的字典。
               'updated_at' 字段是强制性的，作为所有记录的 snapshot_time。
         history_mode_enabled: 是否开启历史记录模式。
+        port_states_enabled: 是否同时记录端口级状态（port_states 列）。
 
     Returns:
         是否成功完成所有必要操作。
@@ -51,7 +56,7 @@ def record_usage_data(data: Dict[str, Any], history_mode_enabled: bool = False)
 
     # --- 2. 写入 latest 缓存表 (必须执行) ---
     # 调用 usage_repo.batch_insert 写入 latest 表
-    success_cache = batch_insert(data, sheet_name="latest")
+    success_cache = batch_insert(data, sheet_name="latest", include_port_states=port_states_enabled)
 
     if not success_cache:
         logfire.error("更新 latest 缓存表失败，流程中断。")
@@ -65,7 +70,9 @@ def record_usage_data(data: Dict[str, Any], history_mode_enabled: bool = False)
         logfire.debug("历史记录模式开启。开始归档 usage 历史数据。")
 
         # 调用 usage_repo.batch_insert 写入 usage 表
-        success_archive = batch_insert(data, sheet_name="usage")
+        success_archive = batch_insert(
+            data, sheet_name="usage", include_port_states=port_states_enabled
+        )
 
         if not success_archive:
             logfire.error("写入 usage 历史表失败。")
@@ -11,6 +11,7 @@ CREATE TABLE IF NOT EXISTS stations (
     lat REAL,
     lon REAL,
     device_ids TEXT DEFAULT '[]',
+    fingerprint TEXT,
     created_at TEXT DEFAULT (datetime('now', 'localtime')),
     updated_at TEXT DEFAULT (datetime('now', 'localtime'))
 );
@@ -27,6 +28,8 @@ CREATE TABLE IF NOT EXISTS latest (
     used INTEGER NOT NULL DEFAULT 0,
     total INTEGER NOT NULL DEFAULT 0,
     error INTEGER NOT NULL DEFAULT 0,
+    -- 端口级状态（每端口 2 bit 打包，见 fetcher/port_state.py），未采集时为 NULL
+    port_states BLOB,
     FOREIGN KEY (hash_id) REFERENCES stations(hash_id) ON DELETE CASCADE
 );
 
@@ -42,9 +45,17 @@ CREATE TABLE IF NOT EXISTS usage (
     used INTEGER NOT NULL DEFAULT 0,
     total INTEGER NOT NULL DEFAULT 0,
     error INTEGER NOT NULL DEFAULT 0,
+    -- 端口级状态（每端口 2 bit 打包，见 fetcher/port_state.py），未采集时为 NULL
+    port_states BLOB,
     FOREIGN KEY (hash_id) REFERENCES stations(hash_id) ON DELETE CASCADE
 );
 
 -- usage 表索引
 CREATE INDEX IF NOT EXISTS idx_usage_station_time ON usage(hash_id, snapshot_time DESC);
 CREATE INDEX IF NOT EXISTS idx_usage_time ON usage(snapshot_time DESC);
+
+-- 4. meta 表（键值形式的元信息，例如站点目录版本 catalog_version）
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
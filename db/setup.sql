@@ -15,6 +15,9 @@ CREATE TABLE public.stations (
     
     -- Data type for list of device IDs (jsonb is often preferred in PG)
     device_ids jsonb, 
+
+    -- 元数据指纹（规范化元数据的哈希），未变化的站点跳过写入
+    fingerprint text,
     
     -- Timestamps
     created_at timestamptz DEFAULT now() NOT NULL,
@@ -39,6 +42,8 @@ CREATE TABLE public.usage (
     used integer NOT NULL DEFAULT 0,
     total integer NOT NULL DEFAULT 0,
     error integer NOT NULL DEFAULT 0,
+    -- 端口级状态（每端口 2 bit 打包，见 fetcher/port_state.py），未采集时为 NULL
+    port_states bytea,
     
     -- 复合索引：提高历史查询效率
     UNIQUE (hash_id, snapshot_time)
@@ -55,5 +60,13 @@ CREATE TABLE public.latest (
     free integer NOT NULL DEFAULT 0,
     used integer NOT NULL DEFAULT 0,
     total integer NOT NULL DEFAULT 0,
-    error integer NOT NULL DEFAULT 0
-);
\ No newline at end of file
+    error integer NOT NULL DEFAULT 0,
+    port_states bytea
+);
+
+
+-- 4. Meta 表 (键值元信息，如站点目录版本 catalog_version)
+CREATE TABLE public.meta (
+    key text PRIMARY KEY,
+    value text NOT NULL
+);
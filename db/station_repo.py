@@ -12,10 +12,18 @@ lat,REAL,纬度,stations[*].lat,
 lon,REAL,经度,stations[*].lon,
 device_ids,TEXT,关联的设备 ID 列表 (JSON),stations[*].device_ids,
 updated_at,TEXT,本条元数据最近一次更新时间,stations[*].updated_at,NOT NULL
+fingerprint,TEXT,规范化元数据的哈希（不含 updated_at）,由本模块计算,
+
+元数据写入按 fingerprint 去重：指纹未变化的站点不会重复 upsert，
+只有确实写入了变化时才递增 meta 表中的 catalog_version。
 """
 
 # db/station_repo.py
 
+import hashlib
+import json
+import sqlite3
+from threading import Lock
 from typing import List, Dict, Any, Optional
 
 import logfire
@@ -26,11 +34,115 @@ from .client import (
     execute_upsert,
     execute_batch_upsert,
     execute_query,
+    execute_update,
+    timed_execute,
     _json_to_sqlite,
 )
 
 ensure_logfire_configured()
 
+CATALOG_VERSION_KEY = "catalog_version"
+
+# hash_id -> fingerprint 的内存缓存，与加载它的数据库连接绑定
+_fingerprint_lock = Lock()
+_fingerprint_cache: Dict[str, Optional[str]] = {}
+_fingerprint_conn: Optional[sqlite3.Connection] = None
+
+
+def compute_station_fingerprint(station_data: Dict[str, Any]) -> str:
+    """计算站点元数据指纹：规范化名称、服务商、校区、坐标与设备列表后取 sha1 前 16 位"""
+    device_ids = station_data.get("device_ids") or []
+    if isinstance(device_ids, str):
+        try:
+            device_ids = json.loads(device_ids)
+        except json.JSONDecodeError:
+            device_ids = [device_ids]
+    lat = station_data.get("lat")
+    lon = station_data.get("lon")
+    normalized = [
+        station_data.get("name") or "",
+        station_data.get("provider") or "",
+        station_data.get("campus_id"),
+        station_data.get("campus_name") or "",
+        None if lat is None else float(lat),
+        None if lon is None else float(lon),
+        [str(item) for item in device_ids],
+    ]
+    encoded = json.dumps(normalized, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def _station_to_row(station: Any) -> Optional[Dict[str, Any]]:
+    """把 Station 对象转换为 stations 表行（含 fingerprint），缺少 hash_id 时返回 None"""
+    station_id = getattr(station, "hash_id", None)
+    if not station_id:
+        return None
+
+    station_data = {
+        "hash_id": station_id,
+        "name": getattr(station, "name", None),
+        "provider": getattr(station, "provider", None),
+        "campus_id": getattr(station, "campus_id", None),
+        "campus_name": getattr(station, "campus_name", None),
+        "lat": getattr(station, "lat", None),
+        "lon": getattr(station, "lon", None),
+        "device_ids": _json_to_sqlite(getattr(station, "device_ids", [])),
+        "updated_at": getattr(station, "updated_at", None),
+    }
+    station_data["fingerprint"] = compute_station_fingerprint(station_data)
+    return station_data
+
+
+def _known_fingerprints(conn: sqlite3.Connection) -> Dict[str, Optional[str]]:
+    """返回当前连接对应的指纹缓存，首次使用（或连接被重置）时从 stations 表加载"""
+    global _fingerprint_conn
+    if _fingerprint_conn is not conn:
+        rows = execute_query("SELECT hash_id, fingerprint FROM stations")
+        _fingerprint_cache.clear()
+        if isinstance(rows, list):
+            for row in rows:
+                _fingerprint_cache[row["hash_id"]] = row.get("fingerprint")
+        _fingerprint_conn = conn
+    return _fingerprint_cache
+
+
+def _bump_catalog_version() -> bool:
+    """站点元数据发生实际变化后递增 catalog_version"""
+    return execute_update(
+        """
+        INSERT INTO meta (key, value) VALUES (?, '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """,
+        [CATALOG_VERSION_KEY],
+    )
+
+
+def _write_changed_stations(rows: List[Dict[str, Any]]) -> Optional[int]:
+    """只写入指纹发生变化的站点，返回实际写入条数，失败时返回 None"""
+    conn = get_db_client()
+    if conn is None:
+        return None
+
+    with _fingerprint_lock:
+        known = _known_fingerprints(conn)
+        changed = [row for row in rows if known.get(row["hash_id"]) != row["fingerprint"]]
+        if not changed:
+            return 0
+
+        if len(changed) == 1:
+            result = execute_upsert("stations", changed[0], conflict_column="hash_id")
+        else:
+            result = execute_batch_upsert("stations", changed, conflict_column="hash_id")
+        if not result:
+            return None
+
+        for row in changed:
+            known[row["hash_id"]] = row["fingerprint"]
+
+    if not _bump_catalog_version():
+        logfire.warn("递增站点目录版本失败")
+    return len(changed)
+
 
 def upsert_station(
     station: Any,
@@ -47,25 +159,13 @@ def upsert_station(
 
     try:
         # 假设 station 对象有 hash_id, name, provider 等属性
-        station_id = getattr(station, "hash_id", None)
-        if not station_id:
+        station_data = _station_to_row(station)
+        if station_data is None:
             logfire.error("站点信息缺少 hash_id 字段")
             return False
 
-        station_data = {
-            "hash_id": station_id,
-            "name": getattr(station, "name", None),
-            "provider": getattr(station, "provider", None),
-            "campus_id": getattr(station, "campus_id", None),
-            "campus_name": getattr(station, "campus_name", None),
-            "lat": getattr(station, "lat", None),
-            "lon": getattr(station, "lon", None),
-            "device_ids": _json_to_sqlite(getattr(station, "device_ids", [])),
-            "updated_at": getattr(station, "updated_at", None),
-        }
-
-        # 执行 upsert 操作
-        return execute_upsert("stations", station_data, conflict_column="hash_id")
+        # 指纹未变化时不写库
+        return _write_changed_stations([station_data]) is not None
     except Exception as e:
         logfire.error("插入/更新站点失败: {error}", error=str(e))
         return False
@@ -84,51 +184,102 @@ def batch_upsert_stations(stations: List[Any]) -> bool:
         # 将 Station 对象转换为字典列表
         station_data_list = []
         for station in stations:
-            station_id = getattr(station, "hash_id", None)
-            if not station_id:
+            station_data = _station_to_row(station)
+            if station_data is None:
                 logfire.warn(
                     "跳过缺少 hash_id 的站点: {station_name}",
                     station_name=getattr(station, "name", "unknown"),
                 )
                 continue
-
-            station_data = {
-                "hash_id": station_id,
-                "name": getattr(station, "name", None),
-                "provider": getattr(station, "provider", None),
-                "campus_id": getattr(station, "campus_id", None),
-                "campus_name": getattr(station, "campus_name", None),
-                "lat": getattr(station, "lat", None),
-                "lon": getattr(station, "lon", None),
-                "device_ids": _json_to_sqlite(getattr(station, "device_ids", [])),
-                "updated_at": getattr(station, "updated_at", None),
-            }
             station_data_list.append(station_data)
 
         if not station_data_list:
             logfire.warn("没有有效的站点数据可插入")
             return True
 
-        # 执行批量 upsert
-        result = execute_batch_upsert("stations", station_data_list, conflict_column="hash_id")
-        if result:
+        # 只写入指纹变化的站点
+        written = _write_changed_stations(station_data_list)
+        if written is None:
+            return False
+        if written:
             logfire.info(
-                "成功批量插入/更新 {count} 个站点",
-                count=len(station_data_list),
+                "成功批量插入/更新 {count} 个站点（共 {total} 个，其余未变化）",
+                count=written,
+                total=len(station_data_list),
+            )
+        else:
+            logfire.debug(
+                "{total} 个站点元数据均未变化，跳过写入",
+                total=len(station_data_list),
             )
-        return result
+        return True
     except Exception as e:
         logfire.error("批量插入/更新站点失败: {error}", error=str(e))
         return False
 
 
+def delete_stations(station_ids: List[str]) -> bool:
+    """删除站点基础信息及其 latest 缓存（usage 历史保留），并递增 catalog_version"""
+    if not station_ids:
+        return True
+
+    conn = get_db_client()
+    if conn is None:
+        return False
+
+    placeholders = ",".join(["?" for _ in station_ids])
+    try:
+        with _fingerprint_lock:
+            cursor = conn.cursor()
+            timed_execute(
+                cursor, f"DELETE FROM latest WHERE hash_id IN ({placeholders})", station_ids
+            )
+            timed_execute(
+                cursor, f"DELETE FROM stations WHERE hash_id IN ({placeholders})", station_ids
+            )
+            conn.commit()
+            if _fingerprint_conn is conn:
+                for station_id in station_ids:
+                    _fingerprint_cache.pop(station_id, None)
+        deleted = cursor.rowcount
+    except Exception as e:
+        logfire.error("删除站点失败: {error}", error=str(e))
+        conn.rollback()
+        return False
+
+    if deleted:
+        logfire.info("已删除 {count} 个站点", count=deleted)
+        if not _bump_catalog_version():
+            logfire.warn("递增站点目录版本失败")
+    return True
+
+
+STATION_METADATA_COLUMNS = [
+    "hash_id",
+    "name",
+    "provider",
+    "campus_id",
+    "campus_name",
+    "lat",
+    "lon",
+    "device_ids",
+    "updated_at",
+]
+
+
 def fetch_station_metadata(
     station_ids: Optional[List[str]] = None,
     provider: Optional[str] = None,
+    columns: Optional[List[str]] = None,
 ) -> Dict[str, Dict[str, Any]]:
     """
     读取站点基础信息，返回 hash_id -> metadata 的映射 (原始数据库字典格式)。
     这是 DB 层的最底层查询接口。
+
+    Args:
+        station_ids: 可选，只读取这些站点
+        provider: 可选，按服务商过滤（idx_stations_provider）
+        columns: 可选，只读取这些列（hash_id 总会包含），缺省读取全部列
     """
     if get_db_client() is None:
         return {}
@@ -149,8 +300,16 @@ def fetch_station_metadata(
         if where_parts:
             where_clause = " WHERE " + " AND ".join(where_parts)
 
+        if columns:
+            # 仅允许已知列名，避免拼接任意 SQL
+            selected = ["hash_id"] + [
+                col for col in STATION_METADATA_COLUMNS if col in columns and col != "hash_id"
+            ]
+        else:
+            selected = STATION_METADATA_COLUMNS
+
         query = f"""
-            SELECT hash_id, name, provider, campus_id, campus_name, lat, lon, device_ids, updated_at
+            SELECT {", ".join(selected)}
             FROM stations{where_clause}
         """
 
@@ -212,3 +371,43 @@ def fetch_distinct_providers() -> List[str]:
     except Exception as exc:
         logfire.error("读取 provider 列表失败: {error}", error=str(exc))
         return []
+
+
+def fetch_catalog_version() -> Optional[int]:
+    """返回 meta 表中的站点目录版本，尚未写入过站点时返回 None"""
+
+    if get_db_client() is None:
+        return None
+
+    row = execute_query("SELECT value FROM meta WHERE key = ?", [CATALOG_VERSION_KEY], fetch="one")
+    if not isinstance(row, dict):
+        return None
+    try:
+        return int(row["value"])
+    except (TypeError, ValueError):
+        return None
+
+
+def fetch_stations_version() -> Optional[str]:
+    """返回 stations 表当前数据版本，用于响应缓存失效判断
+
+    优先使用 catalog_version（仅在元数据实际变化时递增）；旧库或外部写入、
+    尚无 catalog_version 时退化为最近 updated_at 与行数的组合。
+    """
+
+    if get_db_client() is None:
+        return None
+
+    try:
+        catalog_version = fetch_catalog_version()
+        if catalog_version is not None:
+            return f"catalog:{catalog_version}"
+
+        query = "SELECT MAX(updated_at) AS updated_at, COUNT(*) AS row_count FROM stations"
+        row = execute_query(query, fetch="one")
+        if not isinstance(row, dict) or not row.get("row_count"):
+            return None
+        return f"{row['updated_at']}#{row['row_count']}"
+    except Exception as exc:
+        logfire.error("读取 stations 表版本失败: {error}", error=str(exc))
+        return None
@@ -10,6 +10,7 @@ free,INTEGER,可用数量,stations[*].free,NOT NULL
 used,INTEGER,已用数量,stations[*].used,NOT NULL
 total,INTEGER,总数,stations[*].total,NOT NULL
 error,INTEGER,故障数量,stations[*].error,NOT NULL
+port_states,BLOB,端口级状态位图,stations[*].port_states,可为空
 
 
 latest 表
@@ -21,6 +22,7 @@ free,INTEGER,可用数量,stations[*].free,NOT NULL
 used,INTEGER,已用数量,stations[*].used,NOT NULL
 total,INTEGER,总数,stations[*].total,NOT NULL
 error,INTEGER,故障数量,stations[*].error,NOT NULL
+port_states,BLOB,端口级状态位图,stations[*].port_states,可为空
 """
 
 # db/usage_repo.py
@@ -35,6 +37,8 @@ from .client import (
     execute_upsert,
     execute_batch_upsert,
     execute_query,
+    timed_execute,
+    timed_executemany,
 )
 
 ensure_logfire_configured()
@@ -45,13 +49,21 @@ USAGE_TABLE_NAME = "usage"
 # --- 公共接口实现 ---
 
 
-def insert(data: Dict[str, Any], sheet_name: str) -> bool:
+def _port_states_value(value: Any) -> Optional[bytes]:
+    """port_states 统一转为 bytes（未采集时为 None）"""
+    if value is None:
+        return None
+    return bytes(value)
+
+
+def insert(data: Dict[str, Any], sheet_name: str, include_port_states: bool = False) -> bool:
     """
     插入单条使用情况记录。
 
     Args:
         data: 包含单个站点信息的字典。
         sheet_name: 目标表单名称 ('latest' 或 'usage')。
+        include_port_states: 是否同时写入 port_states 列。
     """
     if get_db_client() is None:
         return False
@@ -75,6 +87,8 @@ def insert(data: Dict[str, Any], sheet_name: str) -> bool:
         "total": int(data.get("total", 0)),
         "error": int(data.get("error", 0)),
     }
+    if include_port_states:
+        record["port_states"] = _port_states_value(data.get("port_states"))
 
     if not record["hash_id"]:
         logfire.warn("跳过单条插入：缺少 hash_id")
@@ -97,7 +111,7 @@ def insert(data: Dict[str, Any], sheet_name: str) -> bool:
 
             query = f"INSERT INTO {table_name} ({column_names}) VALUES ({placeholders})"
             cursor = conn.cursor()
-            cursor.execute(query, list(record.values()))
+            timed_execute(cursor, query, list(record.values()))
             conn.commit()
 
             logfire.debug("成功插入 {table_name} 单条记录。", table_name=table_name)
@@ -108,13 +122,14 @@ def insert(data: Dict[str, Any], sheet_name: str) -> bool:
         return False
 
 
-def batch_insert(data: Dict[str, Any], sheet_name: str) -> bool:
+def batch_insert(data: Dict[str, Any], sheet_name: str, include_port_states: bool = False) -> bool:
     """
     批量插入使用情况记录。
 
     Args:
         data: 包含 'stations' (List[Dict]) 和 'updated_at' (str) 的字典。
         sheet_name: 目标表单名称 ('latest' 或 'usage')。
+        include_port_states: 是否同时写入 port_states 列（站点未采集端口时写入 NULL）。
     """
     if get_db_client() is None:
         return False
@@ -142,16 +157,17 @@ def batch_insert(data: Dict[str, Any], sheet_name: str) -> bool:
         if not station_id:
             continue  # 跳过缺少 id 的记录
 
-        usage_records.append(
-            {
-                "hash_id": station_id,
-                "snapshot_time": snapshot_time,
-                "free": int(station.get("free", 0)),
-                "used": int(station.get("used", 0)),
-                "total": int(station.get("total", 0)),
-                "error": int(station.get("error", 0)),
-            }
-        )
+        record = {
+            "hash_id": station_id,
+            "snapshot_time": snapshot_time,
+            "free": int(station.get("free", 0)),
+            "used": int(station.get("used", 0)),
+            "total": int(station.get("total", 0)),
+            "error": int(station.get("error", 0)),
+        }
+        if include_port_states:
+            record["port_states"] = _port_states_value(station.get("port_states"))
+        usage_records.append(record)
 
     if not usage_records:
         logfire.warn("没有有效的使用情况记录可插入 {table_name} 表。", table_name=table_name)
@@ -176,7 +192,7 @@ def batch_insert(data: Dict[str, Any], sheet_name: str) -> bool:
             cursor = conn.cursor()
 
             values_list = [list(record.values()) for record in usage_records]
-            cursor.executemany(query, values_list)
+            timed_executemany(cursor, query, values_list)
             conn.commit()
 
             result = True
@@ -196,10 +212,13 @@ def batch_insert(data: Dict[str, Any], sheet_name: str) -> bool:
         return False
 
 
-def load_latest() -> Optional[Dict[str, Any]]:
+def load_latest(station_ids: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
     """
     从 SQLite latest 表读取缓存数据。
     返回格式: {"updated_at": latest_snapshot_time (str), "rows": List[Dict]}
+
+    Args:
+        station_ids: 可选，只读取这些站点（走主键索引）
     """
     if get_db_client() is None:
         return None
@@ -209,8 +228,13 @@ def load_latest() -> Optional[Dict[str, Any]]:
             SELECT hash_id, snapshot_time, free, used, total, error
             FROM latest
         """
+        params: List[Any] = []
+        if station_ids:
+            placeholders = ",".join(["?" for _ in station_ids])
+            query += f" WHERE hash_id IN ({placeholders})"
+            params.extend(station_ids)
 
-        result = execute_query(query)
+        result = execute_query(query, params or None)
         if not isinstance(result, list) or not result:
             logfire.warn("latest 表暂无缓存数据。")
             return None
@@ -222,3 +246,51 @@ def load_latest() -> Optional[Dict[str, Any]]:
     except Exception as exc:
         logfire.error("读取 latest 表失败: {error}", error=str(exc))
         return None
+
+
+def load_latest_port_states(station_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    读取指定站点在 latest 表中的端口级状态。
+    返回 {hash_id: {"snapshot_time": str, "port_states": bytes | None}}，不存在的站点不出现在结果中。
+    """
+    if get_db_client() is None or not station_ids:
+        return {}
+
+    try:
+        placeholders = ",".join(["?" for _ in station_ids])
+        query = (
+            "SELECT hash_id, snapshot_time, port_states FROM latest "
+            f"WHERE hash_id IN ({placeholders})"
+        )
+        result = execute_query(query, list(station_ids))
+        if not isinstance(result, list):
+            return {}
+        return {
+            row["hash_id"]: {
+                "snapshot_time": row.get("snapshot_time"),
+                "port_states": row.get("port_states"),
+            }
+            for row in result
+        }
+    except Exception as exc:
+        logfire.error("读取 latest 表端口状态失败: {error}", error=str(exc))
+        return {}
+
+
+def fetch_latest_version() -> Optional[str]:
+    """
+    返回 latest 表当前数据版本（最新 snapshot_time 与行数的组合）。
+    用于 API 层判断缓存的响应体是否仍然有效，开销远低于 load_latest。
+    """
+    if get_db_client() is None:
+        return None
+
+    try:
+        query = "SELECT MAX(snapshot_time) AS snapshot_time, COUNT(*) AS row_count FROM latest"
+        row = execute_query(query, fetch="one")
+        if not isinstance(row, dict) or not row.get("snapshot_time"):
+            return None
+        return f"{row['snapshot_time']}#{row['row_count']}"
+    except Exception as exc:
+        logfire.error("读取 latest 表版本失败: {error}", error=str(exc))
+        return None
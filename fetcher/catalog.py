@@ -0,0 +1,350 @@
+"""
+站点目录编译缓存
+
+把 fetcher/providers/data/*.csv 编译成一份经过校验的二进制目录（marshal），缓存在磁盘上：
+- 以各 CSV 的 mtime / 大小 / sha256 作为缓存键，文件未变化时启动直接读取编译结果，
+  不再逐行 DictReader、json.loads 与计算 md5；
+- 仅 mtime 变化而内容不变（例如 touch、git checkout）时复用原编译结果；
+- check_reload() 轮询文件签名，发现变化后重新编译并返回与上一版的站点差异，
+  供后台抓取在不重启的情况下增量更新服务商站点列表与 stations 表。
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import marshal
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import logfire
+
+from fetcher.station import Station
+from server.config import Config
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+# 编译格式版本，Station 字段或校验规则变化时递增以作废旧缓存
+CATALOG_FORMAT_VERSION = 1
+
+DEFAULT_DATA_DIR = Path(__file__).parent / "providers" / "data"
+
+# 编译后的站点记录：(hash_id, name, provider, campus_id, campus_name, lat, lon, device_ids)
+StationRecord = Tuple[str, str, str, int, str, float, float, Tuple[str, ...]]
+
+
+def get_catalog_cache_path() -> Path:
+    """获取编译缓存文件路径（默认位于项目根目录/data 下）"""
+    if Config.STATION_CATALOG_CACHE_PATH:
+        return Path(Config.STATION_CATALOG_CACHE_PATH)
+    return Path(__file__).parent.parent / "data" / "station_catalog.bin"
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fp:
+        for chunk in iter(lambda: fp.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _station_to_record(station: Station) -> StationRecord:
+    return (
+        station.hash_id,
+        station.name,
+        station.provider,
+        station.campus_id,
+        station.campus_name,
+        float(station.lat),
+        float(station.lon),
+        tuple(station.device_ids),
+    )
+
+
+def _record_to_station(record: StationRecord) -> Station:
+    hash_id, name, provider, campus_id, campus_name, lat, lon, device_ids = record
+    return Station.restore(
+        hash_id=hash_id,
+        name=name,
+        provider=provider,
+        campus_id=campus_id,
+        campus_name=campus_name,
+        lat=lat,
+        lon=lon,
+        device_ids=list(device_ids),
+    )
+
+
+def compile_csv(path: Path) -> List[StationRecord]:
+    """解析并校验单个 CSV：跳过缺少名称 / 服务商 / 设备的行，以及重复的 hash_id"""
+    records: List[StationRecord] = []
+    seen: Dict[str, int] = {}
+    with path.open("r", encoding="utf-8") as fp:
+        for line_no, row in enumerate(csv.DictReader(fp), start=2):
+            try:
+                station = Station.from_csv_row(row)
+            except (TypeError, ValueError) as exc:
+                logfire.warn(
+                    "站点目录 {file} 第 {line} 行无法解析，已跳过: {error}",
+                    file=path.name,
+                    line=line_no,
+                    error=str(exc),
+                )
+                continue
+            if not station.name or not station.provider or not station.device_ids:
+                continue
+            if station.hash_id in seen:
+                logfire.warn(
+                    "站点目录 {file} 第 {line} 行与第 {first} 行 hash_id 重复（{hash_id}），已跳过",
+                    file=path.name,
+                    line=line_no,
+                    first=seen[station.hash_id],
+                    hash_id=station.hash_id,
+                )
+                continue
+            seen[station.hash_id] = line_no
+            records.append(_station_to_record(station))
+    return records
+
+
+@dataclass
+class CatalogDiff:
+    """两版目录之间按文件归类的站点差异"""
+
+    added: Dict[str, List[Station]] = field(default_factory=dict)
+    changed: Dict[str, List[Station]] = field(default_factory=dict)
+    removed: Dict[str, List[str]] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def files(self) -> List[str]:
+        return sorted(set(self.added) | set(self.changed) | set(self.removed))
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            "added": sum(len(v) for v in self.added.values()),
+            "changed": sum(len(v) for v in self.changed.values()),
+            "removed": sum(len(v) for v in self.removed.values()),
+        }
+
+
+class StationCatalogStore:
+    """编译后的站点目录：按 CSV 文件名提供 Station 列表，并支持热重载"""
+
+    def __init__(self, data_dir: Optional[Path] = None, cache_path: Optional[Path] = None):
+        self._data_dir = data_dir or DEFAULT_DATA_DIR
+        self._cache_path = cache_path or get_catalog_cache_path()
+        self._lock = threading.Lock()
+        # 文件名 -> {"mtime_ns", "size", "sha256"}
+        self._sources: Dict[str, Dict[str, Any]] = {}
+        self._records: Dict[str, List[StationRecord]] = {}
+        self._stations: Dict[str, List[Station]] = {}
+        self._loaded = False
+
+    # --- 加载 ---
+
+    def _source_files(self) -> Dict[str, Path]:
+        if not self._data_dir.is_dir():
+            return {}
+        return {path.name: path for path in sorted(self._data_dir.glob("*.csv"))}
+
+    def _read_cache(self) -> Optional[Dict[str, Any]]:
+        try:
+            with self._cache_path.open("rb") as fp:
+                document = marshal.load(fp)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(document, dict) or document.get("format") != CATALOG_FORMAT_VERSION:
+            return None
+        return document
+
+    def _write_cache(self) -> None:
+        document = {
+            "format": CATALOG_FORMAT_VERSION,
+            "sources": self._sources,
+            "records": self._records,
+        }
+        tmp_name: Optional[str] = None
+        try:
+            self._cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "wb",
+                dir=self._cache_path.parent,
+                prefix=f".{self._cache_path.name}.",
+                suffix=".tmp",
+                delete=False,
+            ) as fp:
+                tmp_name = fp.name
+                marshal.dump(document, fp)
+            os.replace(tmp_name, self._cache_path)
+            tmp_name = None
+        except Exception as exc:
+            logfire.warn("写入站点目录编译缓存失败: {error}", error=str(exc))
+        finally:
+            if tmp_name:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+
+    def _compile_sources(
+        self, cached: Optional[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[StationRecord]], int]:
+        """按文件比对签名，只重新编译内容变化的 CSV，返回 (sources, records, 编译文件数)"""
+        cached_sources = cached.get("sources", {}) if cached else {}
+        cached_records = cached.get("records", {}) if cached else {}
+        sources: Dict[str, Dict[str, Any]] = {}
+        records: Dict[str, List[StationRecord]] = {}
+        compiled = 0
+
+        for name, path in self._source_files().items():
+            signature = _stat_signature(path)
+            if signature is None:
+                continue
+            mtime_ns, size = signature
+            previous = cached_sources.get(name)
+            if (
+                previous is not None
+                and previous.get("mtime_ns") == mtime_ns
+                and previous.get("size") == size
+                and name in cached_records
+            ):
+                sources[name] = previous
+                records[name] = cached_records[name]
+                continue
+
+            sha256 = _file_sha256(path)
+            if previous is not None and previous.get("sha256") == sha256 and name in cached_records:
+                # 仅 mtime 变化：内容相同，复用编译结果并更新签名
+                records[name] = cached_records[name]
+            else:
+                records[name] = compile_csv(path)
+                compiled += 1
+            sources[name] = {"mtime_ns": mtime_ns, "size": size, "sha256": sha256}
+
+        return sources, records, compiled
+
+    def load(self) -> None:
+        """加载目录：签名全部命中时直接使用磁盘上的编译结果"""
+        with self._lock:
+            with logfire.span("加载站点目录", data_dir=str(self._data_dir)):
+                cached = self._read_cache()
+                sources, records, compiled = self._compile_sources(cached)
+                self._sources, self._records = sources, records
+                self._stations = {
+                    name: [_record_to_station(record) for record in file_records]
+                    for name, file_records in records.items()
+                }
+                self._loaded = True
+                if cached is None or cached.get("sources") != sources:
+                    self._write_cache()
+                logfire.info(
+                    "站点目录加载完成：{file_count} 个文件，{station_count} 个站点，重新编译 {compiled} 个",
+                    file_count=len(records),
+                    station_count=sum(len(v) for v in records.values()),
+                    compiled=compiled,
+                )
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def stations_for(self, filename: str) -> List[Station]:
+        """返回某个 CSV 对应的站点列表（新列表，元素为共享的 Station 实例）"""
+        self._ensure_loaded()
+        return list(self._stations.get(filename, []))
+
+    def has_source(self, filename: str) -> bool:
+        self._ensure_loaded()
+        return filename in self._sources
+
+    # --- 热重载 ---
+
+    def _signatures_changed(self) -> bool:
+        files = self._source_files()
+        if set(files) != set(self._sources):
+            return True
+        for name, path in files.items():
+            previous = self._sources[name]
+            if _stat_signature(path) != (previous["mtime_ns"], previous["size"]):
+                return True
+        return False
+
+    def check_reload(self) -> CatalogDiff:
+        """文件签名变化时重新编译，返回与上一版相比新增 / 变化 / 删除的站点"""
+        self._ensure_loaded()
+        with self._lock:
+            if not self._signatures_changed():
+                return CatalogDiff()
+
+            with logfire.span("热重载站点目录"):
+                sources, records, compiled = self._compile_sources(
+                    {"sources": self._sources, "records": self._records}
+                )
+                diff = CatalogDiff()
+                stations: Dict[str, List[Station]] = {}
+                for name in set(records) | set(self._records):
+                    old_by_id = {
+                        record[0]: (record, station)
+                        for record, station in zip(
+                            self._records.get(name, []), self._stations.get(name, [])
+                        )
+                    }
+                    new_records = records.get(name, [])
+                    new_ids = {record[0] for record in new_records}
+                    file_stations: List[Station] = []
+                    for record in new_records:
+                        previous = old_by_id.get(record[0])
+                        if previous is not None and previous[0] == record:
+                            # 未变化的站点沿用原实例
+                            file_stations.append(previous[1])
+                            continue
+                        station = _record_to_station(record)
+                        file_stations.append(station)
+                        target = diff.added if previous is None else diff.changed
+                        target.setdefault(name, []).append(station)
+                    removed = [hash_id for hash_id in old_by_id if hash_id not in new_ids]
+                    if removed:
+                        diff.removed[name] = removed
+                    if name in records:
+                        stations[name] = file_stations
+
+                self._sources, self._records, self._stations = sources, records, stations
+                self._write_cache()
+                if not diff:
+                    # 仅 mtime 变化，内容未变
+                    return diff
+                logfire.info(
+                    "站点目录已热重载（重新编译 {compiled} 个文件）: {counts}",
+                    compiled=compiled,
+                    counts=diff.counts(),
+                )
+                return diff
+
+
+_default_store: Optional[StationCatalogStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_station_catalog_store() -> StationCatalogStore:
+    """进程内共享的站点目录实例"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = StationCatalogStore()
+        return _default_store
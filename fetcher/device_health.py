@@ -0,0 +1,316 @@
+"""
+设备健康度跟踪与隔离
+
+每个设备以 (station.provider, device_id) 为键记录连续失败次数：
+- 连续失败达到 DEVICE_QUARANTINE_FAILURES 次后进入隔离，之后的抓取轮次直接跳过该设备，
+  不再付出超时与重试的开销；
+- 隔离中的设备按指数增长的间隔重新探测（DEVICE_QUARANTINE_BASE_SECONDS 起，每次失败翻倍，
+  上限 DEVICE_QUARANTINE_MAX_SECONDS），探测成功即解除隔离；
+- 含隔离设备的站点标记为 degraded；状态每轮写入状态文件，重启后保留，
+  API 进程通过管理接口读取。
+
+“失败”包括请求异常，以及返回 0 个端口的空结果（如电动车充电网对失效站点静默返回 0）。
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import logfire
+
+from fetcher.station import Station
+from server.config import Config
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+# 状态文件格式版本，结构不兼容变更时递增
+HEALTH_STATE_FORMAT_VERSION = 1
+
+DeviceKey = Tuple[str, str]
+
+
+class DeviceQuarantinedError(Exception):
+    """设备处于隔离期，本轮未发请求"""
+
+
+def get_health_state_path() -> Path:
+    """获取设备健康状态文件路径（默认位于项目根目录/data 下）"""
+    if Config.DEVICE_HEALTH_STATE_PATH:
+        return Path(Config.DEVICE_HEALTH_STATE_PATH)
+    return Path(__file__).parent.parent / "data" / "device_health.json"
+
+
+def _to_iso(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone(timedelta(hours=8))).isoformat()
+
+
+@dataclass(slots=True)
+class DeviceHealth:
+    """单个设备的健康记录"""
+
+    consecutive_failures: int = 0
+    last_error: Optional[str] = None
+    last_failure_at: Optional[float] = None
+    quarantined_at: Optional[float] = None
+    next_probe_at: Optional[float] = None
+    probe_interval: float = 0.0
+
+    @property
+    def quarantined(self) -> bool:
+        return self.quarantined_at is not None
+
+
+class DeviceHealthTracker:
+    """记录设备连续失败次数，管理隔离与指数退避的重新探测"""
+
+    def __init__(
+        self,
+        failure_threshold: Optional[int] = None,
+        base_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        enabled: Optional[bool] = None,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold or Config.DEVICE_QUARANTINE_FAILURES)
+        self.base_interval = float(base_interval or Config.DEVICE_QUARANTINE_BASE_SECONDS)
+        self.max_interval = float(max_interval or Config.DEVICE_QUARANTINE_MAX_SECONDS)
+        self.enabled = Config.DEVICE_QUARANTINE_ENABLED if enabled is None else enabled
+        self._devices: Dict[DeviceKey, DeviceHealth] = {}
+        self._lock = threading.Lock()
+        # 本轮因隔离而跳过的请求数
+        self.skipped = 0
+
+    # --- 抓取路径 ---
+
+    def should_fetch(self, provider: str, device_id: str, now: Optional[float] = None) -> bool:
+        """未隔离，或已到重新探测时间时返回 True；跳过时计入 skipped"""
+        if not self.enabled:
+            return True
+        health = self._devices.get((provider, device_id))
+        if health is None or not health.quarantined:
+            return True
+        now = time.time() if now is None else now
+        if health.next_probe_at is not None and now >= health.next_probe_at:
+            return True
+        self.skipped += 1
+        return False
+
+    def quarantined_error(self, provider: str, device_id: str) -> DeviceQuarantinedError:
+        health = self._devices.get((provider, device_id))
+        next_probe = _to_iso(health.next_probe_at) if health else None
+        return DeviceQuarantinedError(
+            f"Device {device_id} of {provider} is quarantined until {next_probe}"
+        )
+
+    def record_success(self, provider: str, device_id: str) -> None:
+        with self._lock:
+            health = self._devices.get((provider, device_id))
+            if health is None:
+                return
+            if health.quarantined:
+                logfire.info(
+                    "设备 {provider}/{device_id} 重新探测成功，解除隔离",
+                    provider=provider,
+                    device_id=device_id,
+                )
+            # 健康设备不保留记录，状态文件只包含有过失败的设备
+            del self._devices[(provider, device_id)]
+
+    def record_failure(
+        self, provider: str, device_id: str, error: Any, now: Optional[float] = None
+    ) -> None:
+        now = time.time() if now is None else now
+        with self._lock:
+            health = self._devices.setdefault((provider, device_id), DeviceHealth())
+            health.consecutive_failures += 1
+            health.last_error = str(error)[:200] if error is not None else None
+            health.last_failure_at = now
+
+            if health.quarantined:
+                # 重新探测仍失败：间隔翻倍
+                health.probe_interval = min(health.probe_interval * 2, self.max_interval)
+                health.next_probe_at = now + health.probe_interval
+            elif health.consecutive_failures >= self.failure_threshold:
+                health.quarantined_at = now
+                health.probe_interval = min(self.base_interval, self.max_interval)
+                health.next_probe_at = now + health.probe_interval
+                logfire.warn(
+                    "设备 {provider}/{device_id} 连续失败 {failures} 次，进入隔离: {error}",
+                    provider=provider,
+                    device_id=device_id,
+                    failures=health.consecutive_failures,
+                    error=health.last_error,
+                )
+
+    def record(
+        self,
+        provider: str,
+        device_id: str,
+        ok: bool,
+        error: Any = None,
+        now: Optional[float] = None,
+    ) -> None:
+        if not self.enabled:
+            return
+        if ok:
+            self.record_success(provider, device_id)
+        else:
+            self.record_failure(provider, device_id, error or "empty result", now)
+
+    # --- 查询 ---
+
+    def is_quarantined(self, provider: str, device_id: str) -> bool:
+        health = self._devices.get((provider, device_id))
+        return health is not None and health.quarantined
+
+    def quarantined_devices(self) -> List[DeviceKey]:
+        return [key for key, health in self._devices.items() if health.quarantined]
+
+    def degraded_stations(self, stations: Iterable[Station]) -> List[Dict[str, Any]]:
+        """含隔离设备的站点及其隔离设备列表"""
+        degraded = []
+        for station in stations:
+            quarantined = [
+                device_id
+                for device_id in station.device_ids
+                if self.is_quarantined(station.provider, device_id)
+            ]
+            if quarantined:
+                degraded.append(
+                    {
+                        "hash_id": station.hash_id,
+                        "name": station.name,
+                        "provider": station.provider,
+                        "quarantined_devices": quarantined,
+                        "device_count": len(station.device_ids),
+                        # 全部设备都被隔离时站点实际已不可用
+                        "all_quarantined": len(quarantined) == len(station.device_ids),
+                    }
+                )
+        return degraded
+
+    def begin_cycle(self) -> None:
+        self.skipped = 0
+
+    # --- 持久化 ---
+
+    def snapshot(self, stations: Iterable[Station] = ()) -> Dict[str, Any]:
+        """管理接口与状态文件使用的可 JSON 序列化视图"""
+        with self._lock:
+            devices = [
+                {
+                    "provider": provider,
+                    "device_id": device_id,
+                    "quarantined": health.quarantined,
+                    "consecutive_failures": health.consecutive_failures,
+                    "last_error": health.last_error,
+                    "last_failure_at": _to_iso(health.last_failure_at),
+                    "quarantined_at": _to_iso(health.quarantined_at),
+                    "next_probe_at": _to_iso(health.next_probe_at),
+                    "probe_interval": health.probe_interval,
+                }
+                for (provider, device_id), health in sorted(self._devices.items())
+            ]
+        return {
+            "quarantined_count": sum(1 for device in devices if device["quarantined"]),
+            "failing_count": len(devices),
+            "skipped_last_cycle": self.skipped,
+            "devices": devices,
+            "degraded_stations": self.degraded_stations(stations),
+        }
+
+    def save(self, stations: Iterable[Station] = (), path: Optional[Path] = None) -> None:
+        """原子写入状态文件：原始记录用于重启恢复，snapshot 供管理接口直接返回"""
+        target = path or get_health_state_path()
+        with self._lock:
+            records = [
+                [provider, device_id, asdict(health)]
+                for (provider, device_id), health in self._devices.items()
+            ]
+        document = {
+            "format": HEALTH_STATE_FORMAT_VERSION,
+            "written_at": _to_iso(time.time()),
+            "records": records,
+            "snapshot": self.snapshot(stations),
+        }
+        tmp_name: Optional[str] = None
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w",
+                encoding="utf-8",
+                dir=target.parent,
+                prefix=f".{target.name}.",
+                suffix=".tmp",
+                delete=False,
+            ) as fp:
+                tmp_name = fp.name
+                json.dump(document, fp, ensure_ascii=False, separators=(",", ":"))
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, target)
+            tmp_name = None
+        except Exception as exc:
+            logfire.warn("写入设备健康状态文件失败: {error}", error=str(exc))
+        finally:
+            if tmp_name:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+
+    def load(self, path: Optional[Path] = None) -> None:
+        """从状态文件恢复隔离记录（文件缺失或格式不符时从空状态开始）"""
+        document = load_health_state(path)
+        if document is None:
+            return
+        devices: Dict[DeviceKey, DeviceHealth] = {}
+        for provider, device_id, fields in document.get("records", []):
+            try:
+                devices[(provider, device_id)] = DeviceHealth(**fields)
+            except TypeError:
+                continue
+        with self._lock:
+            self._devices = devices
+        logfire.info(
+            "已恢复 {count} 条设备健康记录（{quarantined} 个隔离中）",
+            count=len(devices),
+            quarantined=sum(1 for health in devices.values() if health.quarantined),
+        )
+
+
+def load_health_state(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """读取设备健康状态文件，供 API 进程的管理接口使用"""
+    target = path or get_health_state_path()
+    try:
+        with target.open("r", encoding="utf-8") as fp:
+            document = json.load(fp)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        logfire.warn("读取设备健康状态文件失败: {error}", error=str(exc))
+        return None
+    if not isinstance(document, dict) or document.get("format") != HEALTH_STATE_FORMAT_VERSION:
+        return None
+    return document
+
+
+_tracker: Optional[DeviceHealthTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_device_health_tracker() -> DeviceHealthTracker:
+    """进程内共享的设备健康跟踪器（首次使用时从状态文件恢复）"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = DeviceHealthTracker()
+            _tracker.load()
+        return _tracker
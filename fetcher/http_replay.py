@@ -0,0 +1,317 @@
+"""
+上游请求录制与重定向
+
+服务商适配器共用 ProviderManager 创建的 ClientSession，这里为该会话提供两种可选行为：
+- 录制（UPSTREAM_RECORD_DIR）：把每个读取过响应体的请求 / 响应对写入夹具文件，
+  按上游主机分目录保存，相同请求只保留最近一次；
+- 重定向（UPSTREAM_OVERRIDE_URL）：把所有上游请求改发到本地模拟服务（fetcher/mock_upstream.py），
+  原始主机与协议通过 X-Upstream-Host / X-Upstream-Scheme 请求头传递，供模拟服务匹配夹具。
+
+夹具以 (主机, 方法, 路径, 规范化查询参数, 规范化请求体) 为键；token、openid 等敏感参数录制时脱敏，
+且不参与匹配，因此重放时不需要真实凭据。JSON 响应体中的同名字段（例如登录接口返回的 token）
+在写入夹具前同样脱敏。
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+import aiohttp
+import logfire
+from multidict import CIMultiDict
+from yarl import URL
+
+from server.config import Config
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+FIXTURE_FORMAT_VERSION = 1
+UPSTREAM_HOST_HEADER = "X-Upstream-Host"
+UPSTREAM_SCHEME_HEADER = "X-Upstream-Scheme"
+# 录制时脱敏、匹配时忽略的参数名（不区分大小写），同时用于脱敏 JSON 响应体中的字段
+REDACTED_FIELDS = frozenset(
+    {
+        "token",
+        "access_token",
+        "refresh_token",
+        "opentool_token",
+        "password",
+        "secret",
+        "openid",
+        "unionid",
+    }
+)
+REDACTED_VALUE = "***"
+
+
+# --- 规范化与匹配键 ---
+
+
+def _redact_pairs(pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return [
+        (key, REDACTED_VALUE if key.lower() in REDACTED_FIELDS else value) for key, value in pairs
+    ]
+
+
+def redact_document(document: Any) -> Any:
+    """递归脱敏 JSON 文档中键名属于 REDACTED_FIELDS 的值"""
+    if isinstance(document, dict):
+        return {
+            key: REDACTED_VALUE
+            if isinstance(key, str) and key.lower() in REDACTED_FIELDS
+            else redact_document(value)
+            for key, value in document.items()
+        }
+    if isinstance(document, list):
+        return [redact_document(item) for item in document]
+    return document
+
+
+def redact_response_body(body: bytes) -> bytes:
+    """脱敏 JSON 响应体（很多上游以 text/plain 返回 JSON，因此不看 Content-Type），其他内容原样返回"""
+    try:
+        document = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(document, (dict, list)):
+        return body
+    redacted = redact_document(document)
+    if redacted == document:
+        return body
+    return json.dumps(redacted, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def canonical_query(query_string: str) -> str:
+    """排序后的查询字符串，敏感参数已脱敏"""
+    pairs = parse_qsl(query_string, keep_blank_values=True)
+    return urlencode(sorted(_redact_pairs(pairs)))
+
+
+def canonical_body(body: bytes, content_type: str) -> str:
+    """规范化请求体：表单排序、JSON 按键排序，敏感字段脱敏"""
+    if not body:
+        return ""
+    text = body.decode("utf-8", errors="replace")
+    content_type = (content_type or "").lower()
+    if "application/x-www-form-urlencoded" in content_type:
+        return urlencode(sorted(_redact_pairs(parse_qsl(text, keep_blank_values=True))))
+    if "json" in content_type:
+        try:
+            document = json.loads(text)
+        except ValueError:
+            return text
+        return json.dumps(
+            redact_document(document), sort_keys=True, ensure_ascii=False, separators=(",", ":")
+        )
+    return text
+
+
+def fixture_key(host: str, method: str, path: str, query: str, body: str) -> str:
+    raw = "\n".join([host.lower(), method.upper(), path, query, body])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value).strip("_")[:60] or "root"
+
+
+def _now_utc8_iso() -> str:
+    return datetime.now(timezone(timedelta(hours=8))).isoformat()
+
+
+# --- 夹具存储 ---
+
+
+class FixtureStore:
+    """按上游主机分目录的夹具文件：每个请求键一个 JSON 文件"""
+
+    def __init__(self, directory: Path | str) -> None:
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._exact: Dict[str, Dict[str, Any]] = {}
+        # (主机, 方法, 路径) -> 夹具列表，精确匹配失败时按路径回退
+        self._by_path: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+
+    def save(
+        self,
+        request: Dict[str, Any],
+        status: int,
+        content_type: str,
+        body: bytes,
+    ) -> Path:
+        try:
+            text, encoding = body.decode("utf-8"), "utf-8"
+        except UnicodeDecodeError:
+            text, encoding = base64.b64encode(body).decode("ascii"), "base64"
+        document = {
+            "format": FIXTURE_FORMAT_VERSION,
+            "recorded_at": _now_utc8_iso(),
+            "key": request["key"],
+            "request": {k: v for k, v in request.items() if k != "key"},
+            "response": {
+                "status": status,
+                "content_type": content_type,
+                "body": text,
+                "body_encoding": encoding,
+            },
+        }
+        host_dir = self.directory / _slug(request["host"])
+        path = host_dir / f"{request['method']}-{_slug(request['path'])}-{request['key']}.json"
+        with self._lock:
+            host_dir.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=host_dir, suffix=".tmp", delete=False
+            ) as fp:
+                json.dump(document, fp, ensure_ascii=False, indent=2)
+            os.replace(fp.name, path)
+        return path
+
+    def load(self) -> int:
+        """加载目录下全部夹具，返回数量"""
+        exact: Dict[str, Dict[str, Any]] = {}
+        by_path: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        for path in sorted(self.directory.glob("*/*.json")):
+            try:
+                document = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as exc:
+                logfire.warn(
+                    "夹具 {path} 无法解析，已跳过: {error}", path=str(path), error=str(exc)
+                )
+                continue
+            if document.get("format") != FIXTURE_FORMAT_VERSION:
+                continue
+            request = document["request"]
+            exact[document["key"]] = document
+            by_path.setdefault(
+                (request["host"].lower(), request["method"].upper(), request["path"]), []
+            ).append(document)
+        with self._lock:
+            self._exact, self._by_path = exact, by_path
+        return len(exact)
+
+    def match(
+        self, host: str, method: str, path: str, query: str, body: str
+    ) -> Optional[Dict[str, Any]]:
+        """精确匹配请求键；没有时回退到同一主机、方法与路径的第一个夹具"""
+        document = self._exact.get(fixture_key(host, method, path, query, body))
+        if document is not None:
+            return document
+        candidates = self._by_path.get((host.lower(), method.upper(), path))
+        return candidates[0] if candidates else None
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+
+def fixture_response_body(document: Dict[str, Any]) -> bytes:
+    response = document["response"]
+    if response.get("body_encoding") == "base64":
+        return base64.b64decode(response["body"])
+    return response["body"].encode("utf-8")
+
+
+# --- ClientSession 扩展 ---
+
+
+def _payload_bytes(body: Any) -> bytes:
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    decode = getattr(body, "decode", None)
+    if callable(decode):
+        try:
+            return decode().encode("utf-8")
+        except Exception:
+            pass
+    value = getattr(body, "_value", None)
+    return bytes(value) if isinstance(value, (bytes, bytearray)) else b""
+
+
+class UpstreamRequest(aiohttp.ClientRequest):
+    """按配置把请求改发到模拟服务，并在录制模式下记下请求信息"""
+
+    override_url: Optional[URL] = None
+    recorder: Optional[FixtureStore] = None
+
+    def __init__(self, method: str, url: URL, *args: Any, headers: Any = None, **kwargs: Any):
+        self.upstream_host = url.host or ""
+        self.upstream_scheme = url.scheme
+        if self.override_url is not None:
+            headers = CIMultiDict(headers or {})
+            headers[UPSTREAM_HOST_HEADER] = self.upstream_host
+            headers[UPSTREAM_SCHEME_HEADER] = self.upstream_scheme
+            url = self.override_url.with_path(url.raw_path, encoded=True).with_query(
+                url.raw_query_string
+            )
+        super().__init__(method, url, *args, headers=headers, **kwargs)
+
+    async def send(self, conn: Any) -> aiohttp.ClientResponse:
+        response = await super().send(conn)
+        if self.recorder is not None:
+            content_type = self.headers.get("Content-Type", "")
+            query = canonical_query(self.url.query_string)
+            body = canonical_body(_payload_bytes(self.body), content_type)
+            response._upstream_recording = (  # type: ignore[attr-defined]
+                self.recorder,
+                {
+                    "key": fixture_key(self.upstream_host, self.method, self.url.path, query, body),
+                    "scheme": self.upstream_scheme,
+                    "host": self.upstream_host,
+                    "method": self.method,
+                    "path": self.url.path,
+                    "query": query,
+                    "content_type": content_type,
+                    "body": body,
+                },
+            )
+        return response
+
+
+class RecordingResponse(aiohttp.ClientResponse):
+    """首次读取响应体后把请求 / 响应对写入夹具"""
+
+    async def read(self) -> bytes:
+        body = await super().read()
+        recording = getattr(self, "_upstream_recording", None)
+        if recording is not None:
+            self._upstream_recording = None
+            store, request = recording
+            try:
+                store.save(
+                    request,
+                    self.status,
+                    self.headers.get("Content-Type", ""),
+                    redact_response_body(body),
+                )
+            except Exception as exc:  # pragma: no cover - defensive logging
+                logfire.warn("录制上游响应失败: {error}", error=str(exc))
+        return body
+
+
+def create_upstream_session(**kwargs: Any) -> aiohttp.ClientSession:
+    """创建服务商共用的 ClientSession，按 Config 启用录制或重定向到模拟服务"""
+    override = Config.UPSTREAM_OVERRIDE_URL
+    record_dir = Config.UPSTREAM_RECORD_DIR
+    if not override and not record_dir:
+        return aiohttp.ClientSession(**kwargs)
+
+    request_class = type(
+        "ConfiguredUpstreamRequest",
+        (UpstreamRequest,),
+        {
+            "override_url": URL(override) if override else None,
+            "recorder": FixtureStore(record_dir) if record_dir else None,
+        },
+    )
+    kwargs.setdefault("request_class", request_class)
+    if record_dir:
+        kwargs.setdefault("response_class", RecordingResponse)
+    return aiohttp.ClientSession(**kwargs)
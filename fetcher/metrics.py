@@ -0,0 +1,336 @@
+"""
+抓取侧指标
+
+通过 logfire.metric_* 上报（与 API 侧 api.request.duration 同一套导出通道）：
+- fetcher.upstream.duration / fetcher.upstream.requests：按上游主机统计的请求耗时与结果
+  （ok / http_error / timeout / error），由 aiohttp TraceConfig 自动采集；
+- fetcher.retries：服务商重试次数；
+- fetcher.device.duration：逐设备查询耗时（按服务商，设备号不作为指标维度）；
+- fetcher.device.quarantined：隔离中的设备数（设备隔离相当于逐设备的断路器）；
+- fetcher.provider.duration：各服务商 fetch_status 耗时；
+- fetcher.cycle.duration / fetcher.cycle.interval_ratio：整轮耗时及其占 BACKEND_FETCH_INTERVAL 的比例；
+- fetcher.station.freshness：各站点距离上次抓到有效数据的时长。
+
+同时在进程内汇总每轮数据，写入 FETCH_METRICS_PATH（默认 data/fetch_metrics.json），
+便于在本地直接找出慢上游、评估抓取间隔，无需接入 logfire 后台。
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, List, Optional, Set
+
+import aiohttp
+import logfire
+
+from server.config import Config
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+# 本地导出文件中保留的历史轮数
+CYCLE_HISTORY_SIZE = 48
+# 本地导出文件中列出的最慢设备数
+SLOWEST_DEVICE_COUNT = 20
+
+upstream_latency_histogram = logfire.metric_histogram(
+    "fetcher.upstream.duration",
+    unit="ms",
+    description="Upstream HTTP request latency per host",
+)
+upstream_request_counter = logfire.metric_counter(
+    "fetcher.upstream.requests",
+    unit="1",
+    description="Upstream HTTP requests per host and outcome",
+)
+retry_counter = logfire.metric_counter(
+    "fetcher.retries",
+    unit="1",
+    description="Retries issued by provider adapters",
+)
+device_latency_histogram = logfire.metric_histogram(
+    "fetcher.device.duration",
+    unit="ms",
+    description="Per-device status lookup latency including retries",
+)
+quarantined_gauge = logfire.metric_gauge(
+    "fetcher.device.quarantined",
+    unit="1",
+    description="Devices currently quarantined per provider",
+)
+provider_duration_histogram = logfire.metric_histogram(
+    "fetcher.provider.duration",
+    unit="ms",
+    description="Duration of one provider fetch_status call",
+)
+cycle_duration_histogram = logfire.metric_histogram(
+    "fetcher.cycle.duration",
+    unit="ms",
+    description="End-to-end fetch cycle duration",
+)
+cycle_interval_gauge = logfire.metric_gauge(
+    "fetcher.cycle.interval_ratio",
+    unit="1",
+    description="Last cycle duration divided by BACKEND_FETCH_INTERVAL",
+)
+station_freshness_histogram = logfire.metric_histogram(
+    "fetcher.station.freshness",
+    unit="s",
+    description="Seconds since each station last returned data",
+)
+
+
+def get_metrics_path() -> Path:
+    """获取本地指标导出文件路径（默认位于项目根目录/data 下）"""
+    if Config.FETCH_METRICS_PATH:
+        return Path(Config.FETCH_METRICS_PATH)
+    return Path(__file__).parent.parent / "data" / "fetch_metrics.json"
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50_ms": round(_percentile(values, 0.5), 1),
+        "p95_ms": round(_percentile(values, 0.95), 1),
+        "max_ms": round(max(values), 1) if values else 0.0,
+    }
+
+
+def _now_utc8_iso() -> str:
+    return datetime.now(timezone(timedelta(hours=8))).isoformat()
+
+
+class FetchMetrics:
+    """上报 logfire 指标，并在进程内汇总当前一轮的数据用于本地导出"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=CYCLE_HISTORY_SIZE)
+        # hash_id -> 上次抓到有效数据的时间戳
+        self._last_seen: Dict[str, float] = {}
+        self._quarantine_reported: Set[str] = set()
+        self._reset_cycle()
+
+    def _reset_cycle(self) -> None:
+        self._host_latencies: Dict[str, List[float]] = defaultdict(list)
+        self._host_outcomes: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._retries: Dict[str, int] = defaultdict(int)
+        self._device_latencies: Dict[str, List[float]] = defaultdict(list)
+        self._slow_devices: List[tuple] = []
+        self._provider_durations: Dict[str, Dict[str, Any]] = {}
+        self._cycle_started: Optional[float] = None
+
+    # --- 采集 ---
+
+    def begin_cycle(self) -> None:
+        with self._lock:
+            self._reset_cycle()
+            self._cycle_started = time.perf_counter()
+
+    def record_upstream(self, host: str, method: str, outcome: str, duration_ms: float) -> None:
+        attributes = {"host": host, "method": method, "outcome": outcome}
+        upstream_request_counter.add(1, attributes)
+        upstream_latency_histogram.record(duration_ms, attributes)
+        with self._lock:
+            self._host_latencies[host].append(duration_ms)
+            self._host_outcomes[host][outcome] += 1
+
+    def record_retry(self, provider: str, count: int = 1) -> None:
+        if count <= 0:
+            return
+        retry_counter.add(count, {"provider": provider})
+        with self._lock:
+            self._retries[provider] += count
+
+    def record_device(self, provider: str, device_id: str, duration_ms: float, ok: bool) -> None:
+        device_latency_histogram.record(duration_ms, {"provider": provider, "ok": ok})
+        with self._lock:
+            self._device_latencies[provider].append(duration_ms)
+            self._slow_devices.append((duration_ms, provider, device_id, ok))
+            if len(self._slow_devices) > SLOWEST_DEVICE_COUNT * 4:
+                self._slow_devices.sort(reverse=True)
+                del self._slow_devices[SLOWEST_DEVICE_COUNT:]
+
+    def record_provider(self, provider: str, duration_ms: float, status: str) -> None:
+        provider_duration_histogram.record(duration_ms, {"provider": provider, "status": status})
+        with self._lock:
+            self._provider_durations[provider] = {
+                "duration_ms": round(duration_ms, 1),
+                "status": status,
+            }
+
+    def record_quarantined(self, counts: Dict[str, int]) -> None:
+        # 已解除全部隔离的服务商需要显式归零，否则仪表保留旧值
+        for provider in self._quarantine_reported - set(counts):
+            quarantined_gauge.set(0, {"provider": provider})
+        for provider, count in counts.items():
+            quarantined_gauge.set(count, {"provider": provider})
+        self._quarantine_reported = set(counts)
+
+    def record_station_freshness(
+        self, stations: List[Dict[str, Any]], now: Optional[float] = None
+    ) -> Dict[str, float]:
+        """抓到设备（total > 0）的站点刷新时间戳，并上报所有站点距离上次有效数据的时长"""
+        now = time.time() if now is None else now
+        ages: List[float] = []
+        with self._lock:
+            for station in stations:
+                station_id = station.get("hash_id") or station.get("id")
+                if not station_id:
+                    continue
+                if int(station.get("total") or 0) > 0:
+                    self._last_seen[station_id] = now
+                last_seen = self._last_seen.get(station_id)
+                if last_seen is None:
+                    continue
+                age = now - last_seen
+                ages.append(age)
+                station_freshness_histogram.record(age)
+        return {
+            "stations": len(ages),
+            "stale_stations": sum(1 for age in ages if age > 0),
+            "max_age_s": round(max(ages), 1) if ages else 0.0,
+        }
+
+    def end_cycle(
+        self, reason: str, freshness: Optional[Dict[str, float]] = None
+    ) -> Dict[str, Any]:
+        """结束本轮：上报整轮耗时并生成本地导出用的汇总"""
+        with self._lock:
+            started = self._cycle_started
+            duration_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
+            interval = Config.BACKEND_FETCH_INTERVAL
+            ratio = duration_ms / 1000 / interval if interval > 0 else 0.0
+            slowest = sorted(self._slow_devices, reverse=True)[:SLOWEST_DEVICE_COUNT]
+            summary = {
+                "finished_at": _now_utc8_iso(),
+                "reason": reason,
+                "duration_ms": round(duration_ms, 1),
+                "interval_s": interval,
+                "interval_ratio": round(ratio, 4),
+                "providers": dict(self._provider_durations),
+                "hosts": {
+                    host: {**_summarize(latencies), "outcomes": dict(self._host_outcomes[host])}
+                    for host, latencies in sorted(self._host_latencies.items())
+                },
+                "retries": dict(self._retries),
+                "devices": {
+                    provider: _summarize(latencies)
+                    for provider, latencies in sorted(self._device_latencies.items())
+                },
+                "slowest_devices": [
+                    {
+                        "provider": provider,
+                        "device_id": device_id,
+                        "duration_ms": round(duration, 1),
+                        "ok": ok,
+                    }
+                    for duration, provider, device_id, ok in slowest
+                ],
+                "freshness": freshness or {},
+            }
+            self._history.append(
+                {
+                    "finished_at": summary["finished_at"],
+                    "duration_ms": summary["duration_ms"],
+                    "interval_ratio": summary["interval_ratio"],
+                }
+            )
+        cycle_duration_histogram.record(duration_ms, {"reason": reason})
+        cycle_interval_gauge.set(ratio)
+        return summary
+
+    # --- 本地导出 ---
+
+    def export(self, summary: Dict[str, Any], path: Optional[Path] = None) -> None:
+        """原子写入本轮汇总与最近若干轮的耗时历史"""
+        target = path or get_metrics_path()
+        with self._lock:
+            document = {"last_cycle": summary, "history": list(self._history)}
+        tmp_name: Optional[str] = None
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w",
+                encoding="utf-8",
+                dir=target.parent,
+                prefix=f".{target.name}.",
+                suffix=".tmp",
+                delete=False,
+            ) as fp:
+                tmp_name = fp.name
+                json.dump(document, fp, ensure_ascii=False, indent=2)
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, target)
+            tmp_name = None
+        except Exception as exc:
+            logfire.warn("写入抓取指标文件失败: {error}", error=str(exc))
+        finally:
+            if tmp_name:
+                try:
+                    os.unlink(tmp_name)
+                except OSError:
+                    pass
+
+
+_metrics = FetchMetrics()
+
+
+def get_fetch_metrics() -> FetchMetrics:
+    """进程内共享的抓取指标"""
+    return _metrics
+
+
+# --- aiohttp 请求追踪 ---
+
+
+def _outcome_for_exception(exc: BaseException) -> str:
+    if isinstance(exc, (TimeoutError, aiohttp.ServerTimeoutError)):
+        return "timeout"
+    return "error"
+
+
+async def _on_request_start(session, context: SimpleNamespace, params) -> None:
+    context.started = time.perf_counter()
+
+
+async def _on_request_end(session, context: SimpleNamespace, params) -> None:
+    duration_ms = (time.perf_counter() - context.started) * 1000
+    outcome = "ok" if params.response.status < 400 else "http_error"
+    _metrics.record_upstream(params.url.host or "", params.method, outcome, duration_ms)
+
+
+async def _on_request_exception(session, context: SimpleNamespace, params) -> None:
+    started = getattr(context, "started", None)
+    if started is None:
+        return
+    duration_ms = (time.perf_counter() - started) * 1000
+    _metrics.record_upstream(
+        params.url.host or "",
+        params.method,
+        _outcome_for_exception(params.exception),
+        duration_ms,
+    )
+
+
+def create_trace_config() -> aiohttp.TraceConfig:
+    """为抓取用的 ClientSession 创建请求追踪配置，自动记录每个上游主机的耗时与结果"""
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_on_request_start)
+    trace_config.on_request_end.append(_on_request_end)
+    trace_config.on_request_exception.append(_on_request_exception)
+    return trace_config
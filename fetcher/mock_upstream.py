@@ -0,0 +1,241 @@
+"""
+本地模拟上游服务
+
+重放 fetcher/http_replay.py 录制的夹具，并按配置注入延迟、错误、超时与损坏的响应体，
+用于在不访问真实服务商的情况下复现抓取行为、评估重试 / 隔离策略和做基准测试。
+
+抓取进程设置 UPSTREAM_OVERRIDE_URL 指向本服务后，原始主机通过 X-Upstream-Host 请求头传入，
+据此按主机选择夹具与故障配置。
+
+    python -m fetcher.mock_upstream --fixtures data/upstream_fixtures --port 8765 \\
+        --latency lognormal:80,0.6 --error-rate 0.02 --timeout-rate 0.01
+
+延迟分布写法：fixed:MS、uniform:LO,HI、lognormal:MEDIAN,SIGMA（单位毫秒）。
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+from collections import defaultdict
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import logfire
+from aiohttp import web
+
+from fetcher.http_replay import (
+    UPSTREAM_HOST_HEADER,
+    FixtureStore,
+    canonical_body,
+    canonical_query,
+    fixture_response_body,
+)
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+STATS_PATH = "/__mock__/stats"
+
+
+def parse_latency(spec: str) -> Tuple[str, Tuple[float, ...]]:
+    """解析延迟分布，返回 (分布名, 参数)；格式错误时抛出 ValueError"""
+    kind, _, raw = (spec or "fixed:0").partition(":")
+    kind = kind.strip().lower()
+    params = tuple(float(part) for part in raw.split(",") if part.strip()) if raw else ()
+    expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+    if kind not in expected or len(params) != expected[kind]:
+        raise ValueError(f"Invalid latency spec: {spec!r}")
+    return kind, params
+
+
+@dataclass
+class FaultProfile:
+    """一个上游主机的延迟与故障注入配置"""
+
+    latency: str = "fixed:0"
+    error_rate: float = 0.0
+    timeout_rate: float = 0.0
+    malformed_rate: float = 0.0
+    # 注入超时时挂起的时长，应大于抓取侧的请求超时
+    timeout_seconds: float = 30.0
+
+    def __post_init__(self) -> None:
+        self._latency = parse_latency(self.latency)
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """按分布抽取一次延迟（秒）"""
+        kind, params = self._latency
+        if kind == "fixed":
+            milliseconds = params[0]
+        elif kind == "uniform":
+            milliseconds = rng.uniform(params[0], params[1])
+        else:
+            milliseconds = rng.lognormvariate(math.log(max(params[0], 0.001)), params[1])
+        return max(0.0, milliseconds) / 1000
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FaultProfile":
+        known = {field.name for field in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+
+class MockUpstream:
+    """按请求匹配夹具并注入故障的 aiohttp 应用"""
+
+    def __init__(
+        self,
+        store: FixtureStore,
+        default_profile: Optional[FaultProfile] = None,
+        host_profiles: Optional[Dict[str, FaultProfile]] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.store = store
+        self.default_profile = default_profile or FaultProfile()
+        self.host_profiles = {
+            host.lower(): profile for host, profile in (host_profiles or {}).items()
+        }
+        self.rng = random.Random(seed)
+        # host -> 结果 -> 次数
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def profile_for(self, host: str) -> FaultProfile:
+        return self.host_profiles.get(host.lower(), self.default_profile)
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(STATS_PATH, self._handle_stats)
+        app.router.add_route("*", "/{tail:.*}", self._handle)
+        return app
+
+    async def _handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "fixtures": len(self.store),
+                "hosts": {host: dict(outcomes) for host, outcomes in self.stats.items()},
+            }
+        )
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        host = request.headers.get(UPSTREAM_HOST_HEADER) or request.host.split(":")[0]
+        profile = self.profile_for(host)
+        stats = self.stats[host]
+
+        latency = profile.sample_latency(self.rng)
+        if latency:
+            await asyncio.sleep(latency)
+
+        roll = self.rng.random()
+        if roll < profile.timeout_rate:
+            stats["timeout"] += 1
+            await asyncio.sleep(profile.timeout_seconds)
+            return web.Response(status=504, text="mock upstream timeout")
+        roll -= profile.timeout_rate
+        if roll < profile.error_rate:
+            stats["error"] += 1
+            return web.Response(status=503, text="mock upstream error")
+        roll -= profile.error_rate
+
+        body = await request.read()
+        content_type = request.headers.get("Content-Type", "")
+        document = self.store.match(
+            host,
+            request.method,
+            request.path,
+            canonical_query(request.query_string),
+            canonical_body(body, content_type),
+        )
+        if document is None:
+            stats["unmatched"] += 1
+            logfire.warn(
+                "模拟上游没有匹配的夹具: {method} {host}{path}",
+                method=request.method,
+                host=host,
+                path=request.path,
+            )
+            return web.Response(status=404, text="no fixture recorded for this request")
+
+        response = document["response"]
+        payload = fixture_response_body(document)
+        if roll < profile.malformed_rate:
+            # 截断响应体，模拟上游返回不完整的 JSON
+            stats["malformed"] += 1
+            payload = payload[: len(payload) // 2]
+        else:
+            stats["ok"] += 1
+        headers = {"Content-Type": response.get("content_type") or "application/json"}
+        return web.Response(status=response.get("status", 200), body=payload, headers=headers)
+
+
+async def start_mock_upstream(
+    store: FixtureStore,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    **kwargs: Any,
+) -> Tuple[web.AppRunner, str, MockUpstream]:
+    """在当前事件循环中启动模拟服务，返回 (runner, 基础 URL, MockUpstream)
+
+    port=0 时自动选择空闲端口；使用完毕后调用 runner.cleanup()。
+    """
+    mock = MockUpstream(store, **kwargs)
+    runner = web.AppRunner(mock.build_app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}", mock
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="重放录制的上游夹具并注入故障")
+    parser.add_argument("--fixtures", required=True, help="UPSTREAM_RECORD_DIR 录制的夹具目录")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="fixed:0", help="延迟分布（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 503 的比例")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="挂起不响应的比例")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="返回截断响应体的比例")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0)
+    parser.add_argument(
+        "--profile",
+        help='按上游主机覆盖故障配置的 JSON 文件，如 {"www.szlzxn.cn": {"error_rate": 0.2}}',
+    )
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，便于复现")
+    args = parser.parse_args()
+
+    store = FixtureStore(args.fixtures)
+    count = store.load()
+    if not count:
+        parser.error(f"No fixtures found in {args.fixtures}")
+
+    default_profile = FaultProfile(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        malformed_rate=args.malformed_rate,
+        timeout_seconds=args.timeout_seconds,
+    )
+    host_profiles: Dict[str, FaultProfile] = {}
+    if args.profile:
+        overrides = json.loads(Path(args.profile).read_text(encoding="utf-8"))
+        for upstream_host, override in overrides.items():
+            merged = {
+                field.name: getattr(default_profile, field.name) for field in fields(FaultProfile)
+            }
+            merged.update(override)
+            host_profiles[upstream_host] = FaultProfile.from_dict(merged)
+
+    mock = MockUpstream(store, default_profile, host_profiles, args.seed)
+    logfire.info(
+        "模拟上游已加载 {count} 个夹具，监听 http://{host}:{port}",
+        count=count,
+        host=args.host,
+        port=args.port,
+    )
+    web.run_app(mock.build_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+端口级状态的紧凑编码
+
+每个端口用 2 bit 表示（FREE=0、USED=1、ERROR=2、UNKNOWN=3），4 个端口打包为 1 字节。
+一个站点的编码按 station.device_ids 顺序拼接各设备：
+
+    [端口数 uint8][ceil(端口数 / 4) 字节的 2-bit 位图] ...
+
+设备抓取失败时端口数记为 0。10 个端口的设备每次采样只占 4 字节；
+两次采样字节完全相同即无变化，不同时才解码定位变化的端口。
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+FREE = 0
+USED = 1
+ERROR = 2
+UNKNOWN = 3
+
+STATE_NAMES = {FREE: "free", USED: "used", ERROR: "error", UNKNOWN: "unknown"}
+
+# 单个设备最多记录的端口数（端口数字段为 1 字节）
+MAX_PORTS_PER_DEVICE = 255
+
+
+def pack_states(states: Sequence[int]) -> bytes:
+    """把端口状态序列打包为 2-bit 位图（端口 i 位于第 i // 4 字节的第 (i % 4) * 2 位）"""
+    packed = bytearray((len(states) + 3) // 4)
+    for index, state in enumerate(states):
+        packed[index >> 2] |= (state & 0b11) << ((index & 3) << 1)
+    return bytes(packed)
+
+
+def unpack_states(packed: bytes, count: int) -> List[int]:
+    """pack_states 的逆操作"""
+    return [(packed[index >> 2] >> ((index & 3) << 1)) & 0b11 for index in range(count)]
+
+
+def encode_station_ports(devices: Iterable[Optional[Sequence[int]]]) -> bytes:
+    """按设备顺序编码站点下所有设备的端口状态，None 表示该设备本轮没有数据"""
+    encoded = bytearray()
+    for states in devices:
+        states = list(states or [])[:MAX_PORTS_PER_DEVICE]
+        encoded.append(len(states))
+        encoded += pack_states(states)
+    return bytes(encoded)
+
+
+def decode_station_ports(blob: Optional[bytes]) -> List[List[int]]:
+    """解码站点端口状态，返回每个设备的端口状态列表"""
+    devices: List[List[int]] = []
+    if not blob:
+        return devices
+    offset = 0
+    while offset < len(blob):
+        count = blob[offset]
+        offset += 1
+        width = (count + 3) // 4
+        devices.append(unpack_states(blob[offset : offset + width], count))
+        offset += width
+    return devices
+
+
+def diff_station_ports(
+    previous: Optional[bytes], current: Optional[bytes]
+) -> List[Tuple[int, int, int, int]]:
+    """比较两次采样，返回 (设备序号, 端口序号, 旧状态, 新状态) 列表
+
+    字节相同（绝大多数站点、绝大多数轮次）直接返回空列表，不做解码。
+    """
+    if previous == current:
+        return []
+    changes: List[Tuple[int, int, int, int]] = []
+    old_devices = decode_station_ports(previous)
+    new_devices = decode_station_ports(current)
+    for device_index in range(max(len(old_devices), len(new_devices))):
+        old_states = old_devices[device_index] if device_index < len(old_devices) else []
+        new_states = new_devices[device_index] if device_index < len(new_devices) else []
+        for port_index in range(max(len(old_states), len(new_states))):
+            old_state = old_states[port_index] if port_index < len(old_states) else UNKNOWN
+            new_state = new_states[port_index] if port_index < len(new_states) else UNKNOWN
+            if old_state != new_state:
+                changes.append((device_index, port_index, old_state, new_state))
+    return changes
+
+
+def states_to_string(states: Sequence[int]) -> str:
+    """端口状态的可读形式，每个端口一个数字（0 空闲、1 占用、2 故障、3 未知）"""
+    return "".join(str(state) for state in states)
+
+
+# --- 各服务商原始端口数据的转换 ---
+
+
+def states_from_codes(codes: Iterable[Any], mapping: Dict[Any, int], default: int) -> List[int]:
+    """按映射表把上游端口状态码转换为统一状态，未知状态码使用 default"""
+    return [mapping.get(code, default) for code in codes]
+
+
+# 尼普顿 portstatur 字符串：0 空闲、1 占用、3 故障，其余字符计入总数但不归类
+NEPTUNE_PORT_CODES = {"0": FREE, "1": USED, "3": ERROR}
+# 电驴妈妈 socketArray[*].status：0 空闲、1 占用，其余视为故障
+DLMM_PORT_CODES = {0: FREE, 1: USED}
+# 万充科技 port[*].state：0 空闲、2 占用，其余视为故障
+WANCHONG_PORT_CODES = {0: FREE, 2: USED}
+# 点点畅行 DeviceWays[*].State：2 空闲、1 占用，其余视为故障
+CHAOXIANG_PORT_CODES = {2: FREE, 1: USED}
+# 多航科技 port_list[*].status_text
+OPENCOOL_PORT_CODES = {"空闲": FREE, "使用中": USED}
@@ -1,15 +1,17 @@
 """服务商管理器：管理所有充电桩服务商，提供统一接口"""
 
 import asyncio
+import time
 from datetime import datetime, timezone, timedelta
 from typing import List, Dict, Any, Optional
 
 import aiohttp
+from fetcher.catalog import CatalogDiff, get_station_catalog_store
+from fetcher.http_replay import create_upstream_session
+from fetcher.metrics import create_trace_config, get_fetch_metrics
 from fetcher.providers.provider_base import ProviderBase
-from fetcher.providers.neptune import NeptuneProvider
-from fetcher.providers.neptune_junior import NeptuneJuniorProvider
-from fetcher.providers.dlmm import DlmmProvider
-from fetcher.providers.else_provider import ElseProvider
+from fetcher.providers.registry import ProviderRegistry, get_provider_registry
+from server.config import Config
 
 import logfire
 from server.logfire_setup import ensure_logfire_configured
@@ -29,51 +31,43 @@ class ProviderManager:
     职责：初始化、管理生命周期、并发调度、结果合并与格式化。
     """
 
-    def __init__(self):
-        """初始化服务商管理器"""
+    def __init__(
+        self,
+        enabled: Optional[List[str]] = None,
+        registry: Optional[ProviderRegistry] = None,
+    ):
+        """初始化服务商管理器
+
+        Args:
+            enabled: 要启用的服务商键列表，缺省读取 Config.ENABLED_PROVIDERS
+            registry: 服务商注册表，缺省使用进程内共享实例
+        """
         self.providers: List[ProviderBase] = []
-        self._register_providers()
-
-    def _register_providers(self):
-        """注册所有可用服务商"""
-        neptune = NeptuneProvider()
-        neptune_junior = NeptuneJuniorProvider()
-        dlmm = DlmmProvider()
-        else_provider = ElseProvider()
-        try:
-            neptune.load_stations()
-            neptune_junior.load_stations()
-            dlmm.load_stations()
-            else_provider.load_stations()
-        except Exception as exc:
-            logfire.error(
-                "加载 {provider} 站点失败: {error}",
-                provider=neptune.provider,
-                error=str(exc),
-            )
-            logfire.error(
-                "加载 {provider} 站点失败: {error}",
-                provider=neptune_junior.provider,
-                error=str(exc),
-            )
-            logfire.error(
-                "加载 {provider} 站点失败: {error}",
-                provider=dlmm.provider,
-                error=str(exc),
-            )
-            logfire.error(
-                "加载 {provider} 站点失败: {error}",
-                provider=else_provider.provider,
-                error=str(exc),
-            )
-        self.providers.append(neptune)
-        logfire.info("已注册服务商: {provider}", provider=neptune.provider)
-        self.providers.append(neptune_junior)
-        logfire.info("已注册服务商: {provider}", provider=neptune_junior.provider)
-        self.providers.append(dlmm)
-        logfire.info("已注册服务商: {provider}", provider=dlmm.provider)
-        self.providers.append(else_provider)
-        logfire.info("已注册服务商: {provider}", provider=else_provider.provider)
+        self._registry = registry or get_provider_registry()
+        self._register_providers(enabled)
+
+    def _register_providers(self, enabled: Optional[List[str]] = None):
+        """注册启用的服务商：只导入并实例化被启用的适配器"""
+        keys = self._registry.resolve_enabled(
+            enabled if enabled is not None else Config.ENABLED_PROVIDERS
+        )
+        for key in keys:
+            try:
+                prov = self._registry.create(key)
+            except Exception as exc:
+                logfire.error("加载服务商 {provider} 失败: {error}", provider=key, error=str(exc))
+                continue
+
+            try:
+                prov.load_stations()
+            except Exception as exc:
+                logfire.error(
+                    "加载 {provider} 站点失败: {error}",
+                    provider=prov.provider,
+                    error=str(exc),
+                )
+            self.providers.append(prov)
+            logfire.info("已注册服务商: {provider}", provider=prov.provider)
 
     def list_providers(self) -> List[Dict[str, str]]:
         """返回当前已注册的服务商列表"""
@@ -100,16 +94,61 @@ class ProviderManager:
                     error=str(e),
                 )
 
+    def reload_catalog(self) -> CatalogDiff:
+        """检查站点 CSV 是否变化，变化时热重载目录并替换受影响服务商的站点列表
+
+        未变化的站点沿用原 Station 实例，仅受影响的服务商会更新 station_list。
+        """
+        diff = get_station_catalog_store().check_reload()
+        if not diff:
+            return diff
+
+        changed_files = set(diff.files)
+        for prov in self.providers:
+            if prov.catalog_filename not in changed_files:
+                continue
+            prov.load_station_from_catalog()
+            logfire.info(
+                "服务商 {provider} 站点列表已热重载，当前 {count} 个站点",
+                provider=prov.provider,
+                count=len(prov.station_list),
+            )
+        return diff
+
+    @staticmethod
+    def _create_session() -> aiohttp.ClientSession:
+        """抓取用的 ClientSession，附带按上游主机记录耗时的请求追踪
+
+        配置了 UPSTREAM_RECORD_DIR / UPSTREAM_OVERRIDE_URL 时同时启用录制或重定向到模拟服务。
+        """
+        return create_upstream_session(trace_configs=[create_trace_config()])
+
+    @staticmethod
+    async def _timed_fetch(
+        prov: ProviderBase, session: aiohttp.ClientSession
+    ) -> Optional[List[Dict[str, Any]]]:
+        """调用 fetch_status 并记录该服务商本轮耗时"""
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await prov.fetch_status(session)
+            status = "success" if result is not None else "empty"
+            return result
+        finally:
+            get_fetch_metrics().record_provider(
+                prov.provider, (time.perf_counter() - started) * 1000, status
+            )
+
     async def fetch_all_providers(self) -> Dict[str, Any]:
         """并发获取所有服务商的数据"""
         results: Dict[str, Any] = {}
 
-        async with aiohttp.ClientSession() as session:
+        async with self._create_session() as session:
             tasks = []
 
             for prov in self.providers:
                 # fetch_status 负责返回 List[Dict] 且 Dict 已规范化
-                tasks.append(prov.fetch_status(session))
+                tasks.append(self._timed_fetch(prov, session))
 
             fetch_results = await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -168,8 +207,8 @@ class ProviderManager:
                 logfire.error("未找到服务商: {provider}", provider=provider)
                 return None
 
-            async with aiohttp.ClientSession() as session:
-                stations = await provider_obj.fetch_status(session)
+            async with self._create_session() as session:
+                stations = await self._timed_fetch(provider_obj, session)
 
                 if stations is None:
                     return None
@@ -9,7 +9,9 @@ import logfire
 
 import aiohttp
 
-from .provider_base import ProviderBase
+from .provider_base import DeviceResults, ProviderBase
+from fetcher.device_health import DeviceQuarantinedError
+from fetcher.port_state import DLMM_PORT_CODES, ERROR, encode_station_ports, states_from_codes
 from fetcher.station import Station
 from server.config import Config
 
@@ -75,42 +77,65 @@ class DlmmProvider(ProviderBase):
         used = sum(1 for socket in socket_array if socket.get("status") == 1)
         error = sum(1 for socket in socket_array if socket.get("status") not in (0, 1))
 
-        return {"total": total, "free": free, "used": used, "error": error}, None
+        ports = states_from_codes(
+            (socket.get("status") for socket in socket_array), DLMM_PORT_CODES, ERROR
+        )
+
+        return {"total": total, "free": free, "used": used, "error": error, "ports": ports}, None
+
+    def is_device_result_healthy(self, data: Optional[Dict[str, Any]]) -> bool:
+        # socketArray 为空的设备视为失效
+        return data is not None and data["total"] > 0
 
     async def fetch_station_status(
-        self, station: Station, session: aiohttp.ClientSession
+        self,
+        station: Station,
+        session: aiohttp.ClientSession,
+        device_results: Optional[DeviceResults] = None,
     ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
         if not station.device_ids:
             return {"total": 0, "free": 0, "used": 0, "error": 0}, None
 
-        tasks = [
-            self.fetch_device_status(station, device_id, session)
-            for device_id in station.device_ids
-        ]
-        results = await asyncio.gather(*tasks)
+        results = await self.device_statuses_for(station, session, device_results)
 
         total = free = used = error = 0
+        device_ports: List[Optional[List[int]]] = []
 
         for device_id, (data, exc) in zip(station.device_ids, results):
             if exc or data is None:
-                logfire.warn(
-                    "Failed to fetch DLMM status for {device_id}: {error}",
-                    device_id=device_id,
-                    error=str(exc),
-                )
+                # 隔离中的设备在进入隔离时已告警，这里不再逐轮重复
+                if not isinstance(exc, DeviceQuarantinedError):
+                    logfire.warn(
+                        "Failed to fetch DLMM status for {device_id}: {error}",
+                        device_id=device_id,
+                        error=str(exc),
+                    )
+                device_ports.append(None)
                 continue
             total += data["total"]
             free += data["free"]
             used += data["used"]
             error += data["error"]
+            device_ports.append(data.get("ports"))
 
-        return {"total": total, "free": free, "used": used, "error": error}, None
+        return {
+            "total": total,
+            "free": free,
+            "used": used,
+            "error": error,
+            "port_states": encode_station_ports(device_ports),
+        }, None
 
     async def fetch_status(self, session: aiohttp.ClientSession) -> Optional[List[Dict[str, Any]]]:
         if not self.station_list:
             return []
 
-        tasks = [self.fetch_station_status(station, session) for station in self.station_list]
+        # 先统一预取本轮全部设备状态（批量接口优先，共享设备只请求一次）
+        device_results = await self.collect_device_statuses(session)
+        tasks = [
+            self.fetch_station_status(station, session, device_results)
+            for station in self.station_list
+        ]
         results = await asyncio.gather(*tasks)
 
         final_list: List[Dict[str, Any]] = []
@@ -154,6 +179,7 @@ class DlmmProvider(ProviderBase):
                     "used": status["used"],
                     "total": status["total"],
                     "error": status["error"],
+                    "port_states": status.get("port_states"),
                 }
             )
 
@@ -1,38 +1,26 @@
-from fetcher.providers.provider_base import ProviderBase
+from fetcher.providers.provider_base import DeviceResults, ProviderBase
 from typing import List, Dict, Any, Optional, Tuple
 import aiohttp
 import asyncio
-from fetcher.station import Station, load_stations_from_csv
-from server.config import Config
+import logfire
+from fetcher.providers.else_vendors import SUB_VENDOR_ADAPTERS, SubVendorAdapter, empty_counts
+from fetcher.station import Station
 
 
 class ElseProvider(ProviderBase):
+    """“其他”服务商：按 else_stations.csv 中的子厂商分派到各自的适配器"""
+
     def __init__(self):
         super().__init__()
-        self.opentool_token = Config.get_provider_config_value(
-            "else_provider", "opentool_token", ""
-        )
-        self.letfungo_token = Config.get_provider_config_value(
-            "else_provider", "letfungo_token", ""
-        )
-        self.wanchong_token = Config.get_provider_config_value(
-            "else_provider", "wanchong_token", ""
-        )
-        self.wkd_token = Config.get_provider_config_value("else_provider", "wkd_token", "")
+        self._adapters: Dict[str, SubVendorAdapter] = {}
 
     @property
     def provider(self) -> str:
         return "其他"
 
-    def load_station_from_csv(self) -> List[Station]:
-        csv_filename = f"else_stations.csv"
-        csv_path = self.DATA_DIR / csv_filename
-        if not csv_path.exists():
-            print(f"Warning: Station file not found for provider '其他' at {csv_path}")
-            self.station_list = []
-            return []
-        self.station_list = load_stations_from_csv(csv_path)
-        return self.station_list
+    @property
+    def catalog_filename(self) -> str:
+        return "else_stations.csv"
 
     async def fetch_station_list(
         self, session: aiohttp.ClientSession
@@ -42,225 +30,115 @@ class ElseProvider(ProviderBase):
     async def fetch_device_status(
         self, station: Station, device_id: str, session: aiohttp.ClientSession
     ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
-        if station.provider == "万充科技":
-            url = f"https://websocket.wanzhuangkj.com/query?company_id=29&device_num={device_id}"
-            try:
-                headers = {"authorization": self.wanchong_token} if self.wanchong_token else {}
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(
-                        url, headers=headers, timeout=aiohttp.ClientTimeout(total=5)
-                    ) as resp:
-                        resp.raise_for_status()
-                        data = await resp.json(content_type=None)
-                ports = data.get("data", {}).get("port", [])
-                state = [port.get("state") for port in ports]
-                free = state.count(0)
-                used = state.count(2)
-                return {
-                    "total": len(state),
-                    "free": free,
-                    "used": used,
-                    "error": len(state) - free - used,
-                }, None
-            except Exception as exc:
-                return {"total": 0, "free": 0, "used": 0, "error": 0}, exc
-        elif station.provider == "点点畅行":
-            url = "https://api2.hzchaoxiang.cn/api-device/api/v1/scan/Index"
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, data={"DeviceNumber": device_id}) as resp:
-                        data = await resp.json()
-                device_ways = data.get("data", {}).get("DeviceWays", [])
-                sta = [way.get("State") for way in device_ways]
-                free = sta.count(2)
-                used = sta.count(1)
-                return {
-                    "total": len(device_ways),
-                    "free": free,
-                    "used": used,
-                    "error": len(device_ways) - free - used,
-                }, None
-            except Exception as exc:
-                return {"total": 0, "free": 0, "used": 0, "error": 0}, exc
-        elif station.provider == "河狸物联":
-            return {"total": 0, "free": 0, "used": 0, "error": 0}, None
-        elif station.provider == "电动车充电网":
-            url = "https://app.letfungo.com/api/cabinet/getSiteDetail2"
-            params = {
-                k: v
-                for k, v in {"siteId": device_id, "token": self.letfungo_token}.items()
-                if v is not None
-            }
-            try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, params=params) as resp:
-                        data = await resp.json(content_type=None)
-                device = data.get("data", {})
-                used = device.get("charger_false")
-                free = device.get("charger_true")
-                return {"total": free + used, "free": free, "used": used, "error": 0}, None
-            except Exception:
-                return {"total": 0, "free": 0, "used": 0, "error": 0}, None
-        elif station.provider == "多航科技":
-            url = "https://mini.opencool.top/api/device.device/scan"
-            headers = {
-                "Content-Type": "application/json",
-                "token": self.opentool_token,
-            }
-            # 过滤掉 None 值
-            headers = {k: v for k, v in headers.items() if v is not None}
-            data = {
-                "sn": f"GD1B{device_id}",
-                "_sn": f"GD1B{device_id}",
-                "is_check": 0,
-                "new_rule": 1,
-            }
-            try:
-                async with session.post(url, headers=headers, json=data) as resp:
-                    resp_data = await resp.json()
-                    data = resp_data.get("data", {})
-                    # name = data.get("device_data", "").get("description", "")
-                    port_list = data.get("port_list", [])
-
-                    free = used = total = error = 0
-                    for port in port_list:
-                        if port.get("status_text") == "使用中":
-                            used += 1
-                        elif port.get("status_text") == "空闲":
-                            free += 1
-                        else:
-                            error += 1
-                    total = free + used + error
-                    return {"total": total, "free": free, "used": used, "error": error}, None
-            except Exception as exc:
-                return {"total": 0, "free": 0, "used": 0, "error": 0}, exc
-        elif station.provider == "威可迪换电":
-            url = "https://gateway.wkdsz.com/ce-battery-account/app/cabinetDevice/getCabinetDeviceDoorById"
-            try:
-                headers = {"header-secretkey": self.wkd_token} if self.wkd_token else {}
-                # 过滤掉 None 值
-                headers = {k: v for k, v in headers.items() if v is not None}
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, headers=headers, json={"id": device_id}) as resp:
-                        result = await resp.json()
-                doors = (
-                    result.get("data", {})
-                    .get("cabinetDeviceList", [{}])[0]
-                    .get("detailBatteryList", [])
-                )
-                free = used = error = 0
-                for door in doors:
-                    if door.get("onlineStatus") is None:
-                        error += 1
-                    elif door.get("changeFlag") != "Y":
-                        used += 1
-                    else:
-                        free += 1
-                total = free + used + error
-                return {"total": total, "free": free, "used": used, "error": error}, None
-            except Exception as exc:
-                return {"total": 0, "free": 0, "used": 0, "error": 0}, exc
-        elif station.provider == "待补充":
-            return {"total": 0, "free": 0, "used": 0, "error": 0}, None
-        # TODO: 把嘟嘟换电独立出去
-        elif station.provider == "嘟嘟换电":
-            url = f"https://api.dudugxcd.com/sharing-citybike-consumer/site/v2/map/info?id={device_id}"  # good!
-            try:
-                async with session.get(url, headers={"oem_code": "citybike"}) as resp:
-                    data = await resp.json()
-                    if data.get("code") != 200:
-                        error_msg = data.get("message", "Unknown API Error")
-                        return {"total": 0, "free": 0, "used": 0, "error": 0}, Exception(error_msg)
-                    exchange_vo = data.get("data", {}).get("cbExchangeVOList")
-                    free = data.get(
-                        "data", {}
-                    ).get(
-                        "storeTake"
-                    )  # 这里没有弄清楚其能用的标准是什么，free就不按照一个电站进行统计了，经过了验证
-                    used = error = total = 0
-                    if exchange_vo and isinstance(exchange_vo, list):  # 按电站来计算
-                        for device in exchange_vo:
-                            upload_vo = (
-                                device.get("cbExchangeUploadVO", {})
-                                if isinstance(device, dict)
-                                else {}
-                            )
-                            used += upload_vo.get("storeNull", 0)  # 这个是对的
-                            error += upload_vo.get("storeLowPowerBatteryCharge", 0) + upload_vo.get(
-                                "storeSoftLock", 0
-                            )  # 这个不一定是对的
-                            total += upload_vo.get("storeCount", 0)  # 这个是对的
-                    return {"total": total, "free": free, "used": used, "error": error}, None
-            except Exception as exc:
-                return {"total": 0, "free": 0, "used": 0, "error": 0}, exc
-        else:
+        adapter = self._adapter_for(station)
+        if adapter is None:
             return None, ValueError(f"Unknown provider: {station.provider}")
+        return await adapter.fetch_device_status(device_id, session)
 
     async def fetch_station_status(
-        self, station: Station, session: aiohttp.ClientSession
+        self,
+        station: Station,
+        session: aiohttp.ClientSession,
+        device_results: Optional[DeviceResults] = None,
     ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
-        if station.provider == "专用站点":
-            return {"total": 0, "free": 0, "used": 0, "error": 0}, None
-        else:
+        # 子厂商各自调度，不使用统一预取结果
+        adapter = self._adapter_for(station)
+        if adapter is None:
+            return None, ValueError(f"Unknown provider: {station.provider}")
+        return await adapter.fetch_station_status(station.device_ids, session), None
+
+    def _adapter_for(self, station: Station) -> Optional[SubVendorAdapter]:
+        adapter = self._adapters.get(station.provider)
+        if adapter is None:
+            cls = SUB_VENDOR_ADAPTERS.get(station.provider)
+            if cls is None:
+                return None
+            adapter = self._adapters[station.provider] = cls()
+        return adapter
+
+    async def _fetch_vendor(
+        self,
+        adapter: SubVendorAdapter,
+        stations: List[Station],
+        session: aiohttp.ClientSession,
+    ) -> List[Optional[Dict[str, Any]]]:
+        """抓取单个子厂商的全部站点；超过该厂商整体时限的站点返回 None"""
+        adapter.begin_cycle()
+        with logfire.span("抓取子厂商 {vendor}", vendor=adapter.name, station_count=len(stations)):
             tasks = [
-                self.fetch_device_status(station, device_id, session)
-                for device_id in station.device_ids
+                asyncio.ensure_future(adapter.fetch_station_status(station.device_ids, session))
+                for station in stations
             ]
-            results = await asyncio.gather(*tasks)
-            total = 0
-            free = 0
-            used = 0
-            error = 0
-            for data, exc in results:
-                if exc or data is None:
-                    continue
-                total += data["total"]
-                free += data["free"]
-                used += data["used"]
-                error += data["error"]
-        return {"total": total, "free": free, "used": used, "error": error}, None
+            done, pending = await asyncio.wait(tasks, timeout=adapter.policy.deadline)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+                adapter.metrics.timed_out_stations = len(pending)
+                logfire.warn(
+                    "子厂商 {vendor} 超过整体时限 {deadline} 秒，{count} 个站点本轮按故障处理",
+                    vendor=adapter.name,
+                    deadline=adapter.policy.deadline,
+                    count=len(pending),
+                )
+
+            results: List[Optional[Dict[str, Any]]] = []
+            for task in tasks:
+                if task in done and task.exception() is None:
+                    results.append(task.result())
+                else:
+                    results.append(None)
+            logfire.info(
+                "子厂商 {vendor} 抓取完成",
+                vendor=adapter.name,
+                **adapter.metrics.as_attributes(),
+            )
+            return results
 
     async def fetch_status(self, session: aiohttp.ClientSession) -> Optional[List[Dict[str, Any]]]:
         if not self.station_list:
             return []
-        tasks = [self.fetch_station_status(station, session) for station in self.station_list]
-        results = await asyncio.gather(*tasks)
+
+        # 按子厂商分组后各自调度，慢厂商不影响其他厂商
+        groups: Dict[str, List[Station]] = {}
+        for station in self.station_list:
+            if self._adapter_for(station) is None:
+                logfire.warn("未知子厂商 {vendor}，站点按 0 处理", vendor=station.provider)
+                continue
+            groups.setdefault(station.provider, []).append(station)
+
+        vendor_names = list(groups)
+        vendor_results = await asyncio.gather(
+            *(
+                self._fetch_vendor(self._adapters[name], groups[name], session)
+                for name in vendor_names
+            )
+        )
+        status_by_id: Dict[str, Optional[Dict[str, Any]]] = {}
+        for name, results in zip(vendor_names, vendor_results):
+            for station, status in zip(groups[name], results):
+                status_by_id[station.hash_id] = status
+
         final_list = []
-        for station, (status, exc) in zip(self.station_list, results):
-            if exc or status is None:
-                final_list.append(
-                    {
-                        "provider": station.provider,
-                        "hash_id": station.hash_id,
-                        "name": station.name,
-                        "campus_id": station.campus_id,
-                        "campus_name": station.campus_name,
-                        "lat": station.lat,
-                        "lon": station.lon,
-                        "device_ids": station.device_ids,
-                        "updated_at": station.updated_at,
-                        "free": 0,
-                        "used": 0,
-                        "total": 0,
-                        "error": 0,
-                    }
-                )
-            else:
-                final_list.append(
-                    {
-                        "provider": station.provider,
-                        "hash_id": station.hash_id,
-                        "name": station.name,
-                        "campus_id": station.campus_id,
-                        "campus_name": station.campus_name,
-                        "lat": station.lat,
-                        "lon": station.lon,
-                        "device_ids": station.device_ids,
-                        "updated_at": station.updated_at,
-                        "free": status["free"],
-                        "used": status["used"],
-                        "total": status["total"],
-                        "error": status["error"],
-                    }
-                )
+        for station in self.station_list:
+            status = status_by_id.get(station.hash_id) or empty_counts()
+            final_list.append(
+                {
+                    # provider 为实际子厂商，“其他”仅作为分组展示名称
+                    "provider": station.provider,
+                    "hash_id": station.hash_id,
+                    "name": station.name,
+                    "campus_id": station.campus_id,
+                    "campus_name": station.campus_name,
+                    "lat": station.lat,
+                    "lon": station.lon,
+                    "device_ids": station.device_ids,
+                    "updated_at": station.updated_at,
+                    "free": status["free"],
+                    "used": status["used"],
+                    "total": status["total"],
+                    "error": status["error"],
+                    "port_states": status.get("port_states"),
+                }
+            )
         return final_list
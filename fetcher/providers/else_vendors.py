@@ -0,0 +1,413 @@
+"""“其他”服务商下的子厂商适配器
+
+else_stations.csv 中每个站点的 provider 列是实际的子厂商（万充科技、多航科技等）。
+每个子厂商是独立的适配器，拥有自己的并发上限、单次请求超时、重试策略、整体时限与指标，
+ElseProvider 按 SUB_VENDOR_ADAPTERS 表分派，某个子厂商变慢只会拖慢它自己的站点。
+
+策略可通过环境变量覆盖：PROVIDER_ELSE_PROVIDER_<KEY>_<FIELD>，例如
+PROVIDER_ELSE_PROVIDER_DUDU_TIMEOUT=8、PROVIDER_ELSE_PROVIDER_OPENCOOL_CONCURRENCY=2。
+"""
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import aiohttp
+import logfire
+
+from fetcher.device_health import get_device_health_tracker
+from fetcher.metrics import get_fetch_metrics
+from fetcher.port_state import (
+    CHAOXIANG_PORT_CODES,
+    ERROR,
+    OPENCOOL_PORT_CODES,
+    WANCHONG_PORT_CODES,
+    encode_station_ports,
+    states_from_codes,
+)
+from server.config import Config
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+CONFIG_PROVIDER_ID = "else_provider"
+
+# 网络层错误才重试，解析错误直接失败
+RETRYABLE_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+def empty_counts() -> Dict[str, int]:
+    return {"total": 0, "free": 0, "used": 0, "error": 0}
+
+
+@dataclass(frozen=True)
+class VendorPolicy:
+    """子厂商调度策略"""
+
+    concurrency: int = 4  # 同时在途请求数（按厂商主机限流）
+    timeout: float = 5.0  # 单次请求超时（秒）
+    retries: int = 1  # 网络错误的重试次数
+    backoff: float = 0.5  # 首次重试等待（秒），之后翻倍
+    deadline: float = 30.0  # 单轮内该厂商全部站点的总时限（秒）
+
+    def with_overrides(self, key: str) -> "VendorPolicy":
+        """读取 PROVIDER_ELSE_PROVIDER_<KEY>_<FIELD> 环境变量覆盖默认策略"""
+        overrides: Dict[str, Any] = {}
+        for name, cast in (
+            ("concurrency", int),
+            ("timeout", float),
+            ("retries", int),
+            ("backoff", float),
+            ("deadline", float),
+        ):
+            raw = Config.get_provider_config_value(CONFIG_PROVIDER_ID, f"{key}_{name}")
+            if raw:
+                try:
+                    overrides[name] = cast(raw)
+                except ValueError:
+                    logfire.warn(
+                        "子厂商 {vendor} 的策略 {field}={value} 无法解析，使用默认值",
+                        vendor=key,
+                        field=name,
+                        value=raw,
+                    )
+        return replace(self, **overrides) if overrides else self
+
+
+@dataclass
+class VendorMetrics:
+    """单轮抓取中某个子厂商的请求统计"""
+
+    requests: int = 0
+    failures: int = 0
+    retries: int = 0
+    timed_out_stations: int = 0
+    quarantined_skips: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+    def observe(self, latency: float, ok: bool) -> None:
+        self.requests += 1
+        if not ok:
+            self.failures += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+
+    def as_attributes(self) -> Dict[str, Any]:
+        average = self.latency_total / self.requests if self.requests else 0.0
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "retries": self.retries,
+            "timed_out_stations": self.timed_out_stations,
+            "quarantined_skips": self.quarantined_skips,
+            "latency_avg_ms": round(average * 1000, 1),
+            "latency_max_ms": round(self.latency_max * 1000, 1),
+        }
+
+
+class SubVendorAdapter(ABC):
+    """子厂商适配器基类：子类实现 request_device，基类负责限流、超时、重试与指标"""
+
+    # 与 CSV provider 列一致的子厂商名称
+    name: str = ""
+    # 配置与指标使用的 ASCII 键
+    key: str = ""
+    default_policy = VendorPolicy()
+
+    def __init__(self) -> None:
+        self.policy = self.default_policy.with_overrides(self.key)
+        self.metrics = VendorMetrics()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _token(self, config_key: str) -> str:
+        return Config.get_provider_config_value(CONFIG_PROVIDER_ID, config_key, "") or ""
+
+    def begin_cycle(self) -> None:
+        """每轮开始时重置指标与信号量（信号量绑定当前事件循环）"""
+        self.metrics = VendorMetrics()
+        self._semaphore = asyncio.Semaphore(max(1, self.policy.concurrency))
+
+    @abstractmethod
+    async def request_device(
+        self, device_id: str, session: aiohttp.ClientSession, timeout: aiohttp.ClientTimeout
+    ) -> Dict[str, Any]:
+        """请求单个设备并返回计数，失败时抛出异常"""
+        raise NotImplementedError
+
+    async def fetch_device_status(
+        self, device_id: str, session: aiohttp.ClientSession
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+        """请求单个设备；隔离中的设备未到探测时间时直接返回，0 端口的结果计为失败"""
+        tracker = get_device_health_tracker()
+        if not tracker.should_fetch(self.name, device_id):
+            self.metrics.quarantined_skips += 1
+            return None, tracker.quarantined_error(self.name, device_id)
+        started = time.perf_counter()
+        counts, exc = await self._request_with_retries(device_id, session)
+        ok = counts is not None and counts["total"] > 0
+        get_fetch_metrics().record_device(
+            self.name, device_id, (time.perf_counter() - started) * 1000, ok
+        )
+        tracker.record(self.name, device_id, ok, exc)
+        return counts, exc
+
+    async def _request_with_retries(
+        self, device_id: str, session: aiohttp.ClientSession
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+        if self._semaphore is None:
+            self.begin_cycle()
+        assert self._semaphore is not None
+
+        timeout = aiohttp.ClientTimeout(total=self.policy.timeout)
+        delay = self.policy.backoff
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                started = time.perf_counter()
+                try:
+                    counts = await self.request_device(device_id, session, timeout)
+                except RETRYABLE_ERRORS as exc:
+                    self.metrics.observe(time.perf_counter() - started, ok=False)
+                    if attempt >= self.policy.retries:
+                        return None, exc
+                except Exception as exc:
+                    self.metrics.observe(time.perf_counter() - started, ok=False)
+                    return None, exc
+                else:
+                    self.metrics.observe(time.perf_counter() - started, ok=True)
+                    return counts, None
+            attempt += 1
+            self.metrics.retries += 1
+            get_fetch_metrics().record_retry(self.name)
+            await asyncio.sleep(delay)
+            delay *= 2
+
+    async def fetch_station_status(
+        self, device_ids: List[str], session: aiohttp.ClientSession
+    ) -> Dict[str, Any]:
+        """汇总站点下所有设备，失败的设备不计入；提供端口明细的子厂商附带 port_states"""
+        results = await asyncio.gather(
+            *(self.fetch_device_status(device_id, session) for device_id in device_ids)
+        )
+        totals: Dict[str, Any] = empty_counts()
+        device_ports: List[Optional[List[int]]] = []
+        for counts, exc in results:
+            if exc or counts is None:
+                device_ports.append(None)
+                continue
+            for field_name in ("total", "free", "used", "error"):
+                totals[field_name] += counts[field_name]
+            device_ports.append(counts.get("ports"))
+        if any(ports is not None for ports in device_ports):
+            totals["port_states"] = encode_station_ports(device_ports)
+        return totals
+
+
+class StaticZeroAdapter(SubVendorAdapter):
+    """暂无可用接口的子厂商：固定返回 0，不发请求"""
+
+    async def request_device(self, device_id, session, timeout):
+        return empty_counts()
+
+    async def fetch_station_status(
+        self, device_ids: List[str], session: aiohttp.ClientSession
+    ) -> Dict[str, Any]:
+        return empty_counts()
+
+
+class WanchongAdapter(SubVendorAdapter):
+    name = "万充科技"
+    key = "wanchong"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.token = self._token("wanchong_token")
+
+    async def request_device(self, device_id, session, timeout):
+        url = f"https://websocket.wanzhuangkj.com/query?company_id=29&device_num={device_id}"
+        headers = {"authorization": self.token} if self.token else {}
+        async with session.get(url, headers=headers, timeout=timeout) as resp:
+            resp.raise_for_status()
+            data = await resp.json(content_type=None)
+        ports = data.get("data", {}).get("port", [])
+        state = [port.get("state") for port in ports]
+        free = state.count(0)
+        used = state.count(2)
+        return {
+            "total": len(state),
+            "free": free,
+            "used": used,
+            "error": len(state) - free - used,
+            "ports": states_from_codes(state, WANCHONG_PORT_CODES, ERROR),
+        }
+
+
+class ChaoxiangAdapter(SubVendorAdapter):
+    name = "点点畅行"
+    key = "chaoxiang"
+
+    async def request_device(self, device_id, session, timeout):
+        url = "https://api2.hzchaoxiang.cn/api-device/api/v1/scan/Index"
+        async with session.post(url, data={"DeviceNumber": device_id}, timeout=timeout) as resp:
+            data = await resp.json()
+        device_ways = data.get("data", {}).get("DeviceWays", [])
+        sta = [way.get("State") for way in device_ways]
+        free = sta.count(2)
+        used = sta.count(1)
+        return {
+            "total": len(device_ways),
+            "free": free,
+            "used": used,
+            "error": len(device_ways) - free - used,
+            "ports": states_from_codes(sta, CHAOXIANG_PORT_CODES, ERROR),
+        }
+
+
+class LetfungoAdapter(SubVendorAdapter):
+    name = "电动车充电网"
+    key = "letfungo"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.token = self._token("letfungo_token")
+
+    async def request_device(self, device_id, session, timeout):
+        url = "https://app.letfungo.com/api/cabinet/getSiteDetail2"
+        params = {"siteId": device_id, "token": self.token}
+        async with session.post(url, params=params, timeout=timeout) as resp:
+            data = await resp.json(content_type=None)
+        device = data.get("data", {})
+        used = device.get("charger_false")
+        free = device.get("charger_true")
+        return {"total": free + used, "free": free, "used": used, "error": 0}
+
+
+class OpencoolAdapter(SubVendorAdapter):
+    name = "多航科技"
+    key = "opencool"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.token = self._token("opentool_token")
+
+    async def request_device(self, device_id, session, timeout):
+        url = "https://mini.opencool.top/api/device.device/scan"
+        headers = {"Content-Type": "application/json", "token": self.token}
+        payload = {
+            "sn": f"GD1B{device_id}",
+            "_sn": f"GD1B{device_id}",
+            "is_check": 0,
+            "new_rule": 1,
+        }
+        async with session.post(url, headers=headers, json=payload, timeout=timeout) as resp:
+            resp_data = await resp.json()
+        port_list = resp_data.get("data", {}).get("port_list", [])
+
+        free = used = error = 0
+        for port in port_list:
+            if port.get("status_text") == "使用中":
+                used += 1
+            elif port.get("status_text") == "空闲":
+                free += 1
+            else:
+                error += 1
+        ports = states_from_codes(
+            (port.get("status_text") for port in port_list), OPENCOOL_PORT_CODES, ERROR
+        )
+        return {
+            "total": free + used + error,
+            "free": free,
+            "used": used,
+            "error": error,
+            "ports": ports,
+        }
+
+
+class WkdAdapter(SubVendorAdapter):
+    name = "威可迪换电"
+    key = "wkd"
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.token = self._token("wkd_token")
+
+    async def request_device(self, device_id, session, timeout):
+        url = "https://gateway.wkdsz.com/ce-battery-account/app/cabinetDevice/getCabinetDeviceDoorById"
+        headers = {"header-secretkey": self.token} if self.token else {}
+        async with session.post(
+            url, headers=headers, json={"id": device_id}, timeout=timeout
+        ) as resp:
+            result = await resp.json()
+        doors = (
+            result.get("data", {}).get("cabinetDeviceList", [{}])[0].get("detailBatteryList", [])
+        )
+        free = used = error = 0
+        for door in doors:
+            if door.get("onlineStatus") is None:
+                error += 1
+            elif door.get("changeFlag") != "Y":
+                used += 1
+            else:
+                free += 1
+        return {"total": free + used + error, "free": free, "used": used, "error": error}
+
+
+class DuduAdapter(SubVendorAdapter):
+    name = "嘟嘟换电"
+    key = "dudu"
+
+    async def request_device(self, device_id, session, timeout):
+        url = f"https://api.dudugxcd.com/sharing-citybike-consumer/site/v2/map/info?id={device_id}"
+        async with session.get(url, headers={"oem_code": "citybike"}, timeout=timeout) as resp:
+            data = await resp.json()
+        if data.get("code") != 200:
+            raise ValueError(data.get("message", "Unknown API Error"))
+
+        exchange_vo = data.get("data", {}).get("cbExchangeVOList")
+        # 这里没有弄清楚其能用的标准是什么，free就不按照一个电站进行统计了，经过了验证
+        free = data.get("data", {}).get("storeTake")
+        used = error = total = 0
+        if exchange_vo and isinstance(exchange_vo, list):  # 按电站来计算
+            for device in exchange_vo:
+                upload_vo = device.get("cbExchangeUploadVO", {}) if isinstance(device, dict) else {}
+                used += upload_vo.get("storeNull", 0)  # 这个是对的
+                error += upload_vo.get("storeLowPowerBatteryCharge", 0) + upload_vo.get(
+                    "storeSoftLock", 0
+                )  # 这个不一定是对的
+                total += upload_vo.get("storeCount", 0)  # 这个是对的
+        return {"total": total, "free": free, "used": used, "error": error}
+
+
+class HeliAdapter(StaticZeroAdapter):
+    name = "河狸物联"
+    key = "heli"
+
+
+class PendingAdapter(StaticZeroAdapter):
+    name = "待补充"
+    key = "pending"
+
+
+class DedicatedAdapter(StaticZeroAdapter):
+    name = "专用站点"
+    key = "dedicated"
+
+
+# 子厂商名称 -> 适配器类
+SUB_VENDOR_ADAPTERS: Dict[str, Type[SubVendorAdapter]] = {
+    adapter.name: adapter
+    for adapter in (
+        WanchongAdapter,
+        ChaoxiangAdapter,
+        LetfungoAdapter,
+        OpencoolAdapter,
+        WkdAdapter,
+        DuduAdapter,
+        HeliAdapter,
+        PendingAdapter,
+        DedicatedAdapter,
+    )
+}
@@ -9,7 +9,14 @@ from typing import Dict, Any, Optional, List, Tuple
 import logfire
 
 # 假设这些类和函数已定义或可导入
-from .provider_base import ProviderBase
+from .provider_base import DeviceResults, ProviderBase
+from fetcher.metrics import get_fetch_metrics
+from fetcher.port_state import (
+    NEPTUNE_PORT_CODES,
+    UNKNOWN,
+    encode_station_ports,
+    states_from_codes,
+)
 from fetcher.station import Station
 
 from server.logfire_setup import ensure_logfire_configured
@@ -76,22 +83,25 @@ class NeptuneProvider(ProviderBase):
             ) as e:
                 if attempt == MAX_RETRIES - 1:
                     return None, e
+                get_fetch_metrics().record_retry(self.provider)
                 await asyncio.sleep(1)
                 continue
         return None, Exception("Reached max retries fetching device status.")
 
+    def is_device_result_healthy(self, data: Optional[Dict[str, Any]]) -> bool:
+        # 没有 portstatur 的设备视为失效
+        return data is not None and bool(data.get("portstatur"))
+
     async def fetch_station_status(
-        self, station: Station, session: ClientSession
+        self,
+        station: Station,
+        session: ClientSession,
+        device_results: Optional[DeviceResults] = None,
     ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
         """获取站点（包含其所有设备）的聚合状态数据。"""
 
         # 尼普顿模式下，我们必须对每个 device_id 执行一次 API 调用并聚合结果
-        tasks = [
-            self.fetch_device_status(station, device_id, session)
-            for device_id in station.device_ids
-        ]
-
-        results = await asyncio.gather(*tasks)
+        results = await self.device_statuses_for(station, session, device_results)
 
         free = 0
         used = 0
@@ -99,10 +109,12 @@ class NeptuneProvider(ProviderBase):
         total = 0
 
         exceptions = []
+        device_ports: List[Optional[List[int]]] = []
 
         for device_id, (device_data, exc) in zip(station.device_ids, results):
             if exc or device_data is None:
                 exceptions.append(exc or ValueError("No device data"))
+                device_ports.append(None)
                 continue
 
             # 提取并聚合 portstatur 核心逻辑 (保持不变)
@@ -113,7 +125,9 @@ class NeptuneProvider(ProviderBase):
                     "Device {device_id} status data has no 'portstatur' string.",
                     device_id=device_id,
                 )
+                device_ports.append(None)
                 continue
+            device_ports.append(states_from_codes(portstatus, NEPTUNE_PORT_CODES, UNKNOWN))
             # print(portstatus)
             free += portstatus.count("0")
             used += portstatus.count("1")
@@ -132,6 +146,7 @@ class NeptuneProvider(ProviderBase):
             "lat": station.lat,
             "lon": station.lon,
             "device_ids": station.device_ids,
+            "port_states": encode_station_ports(device_ports),
         }
 
         # 仅在所有任务都失败时才返回异常
@@ -146,8 +161,12 @@ class NeptuneProvider(ProviderBase):
         if not self.station_list:
             return []
 
-        tasks = [self.fetch_station_status(station, session) for station in self.station_list]
-
+        # 先统一预取本轮全部设备状态（批量接口优先，共享设备只请求一次）
+        device_results = await self.collect_device_statuses(session)
+        tasks = [
+            self.fetch_station_status(station, session, device_results)
+            for station in self.station_list
+        ]
         results = await asyncio.gather(*tasks)
         final_list: List[Dict[str, Any]] = []
 
@@ -189,6 +208,7 @@ class NeptuneProvider(ProviderBase):
                 "used": status_dict["used"],
                 "total": status_dict["total"],
                 "error": status_dict["error"],
+                "port_states": status_dict["port_states"],
             }
             final_list.append(formatted_item)
 
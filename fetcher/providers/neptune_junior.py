@@ -4,7 +4,10 @@ import json
 from dataclasses import dataclass
 from typing import Dict, Any, Optional, List, Tuple
 
-from .provider_base import ProviderBase
+import logfire
+
+from .provider_base import DeviceResults, ProviderBase
+from fetcher.metrics import get_fetch_metrics
 from fetcher.station import Station
 from server.config import Config
 
@@ -46,7 +49,9 @@ class NeptuneJuniorProvider(ProviderBase):
         self, station: Station, device_id: str, session: aiohttp.ClientSession
     ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
         try:
-            await self.ensure_token(session)
+            # token 每轮在 fetch_status 中获取一次，这里只在缺失时补取
+            if not self.token:
+                await self.ensure_token(session)
 
             url = (
                 "https://gateway.hzxwwl.com/api/charging/pile/"
@@ -54,8 +59,16 @@ class NeptuneJuniorProvider(ProviderBase):
             )
 
             async with session.get(url, headers={"REQ-NPD-TOKEN": self.token}) as res:
-                res.raise_for_status()
-                resp = await res.json()
+                if res.status in (401, 403):
+                    # token 失效：刷新后重试一次
+                    get_fetch_metrics().record_retry(self.provider)
+                    await self.ensure_token(session)
+                    async with session.get(url, headers={"REQ-NPD-TOKEN": self.token}) as retry:
+                        retry.raise_for_status()
+                        resp = await retry.json()
+                else:
+                    res.raise_for_status()
+                    resp = await res.json()
 
                 data = resp.get("data", {})
                 total = data.get("totalPileNumber", 0)
@@ -76,13 +89,12 @@ class NeptuneJuniorProvider(ProviderBase):
             return None, e
 
     async def fetch_station_status(
-        self, station: Station, session: aiohttp.ClientSession
+        self,
+        station: Station,
+        session: aiohttp.ClientSession,
+        device_results: Optional[DeviceResults] = None,
     ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
-        tasks = [
-            self.fetch_device_status(station, device_id, session)
-            for device_id in station.device_ids
-        ]
-        results = await asyncio.gather(*tasks)
+        results = await self.device_statuses_for(station, session, device_results)
 
         total = free = used = error = booking = 0
 
@@ -107,7 +119,17 @@ class NeptuneJuniorProvider(ProviderBase):
         if not self.station_list:
             return []
 
-        tasks = [self.fetch_station_status(station, session) for station in self.station_list]
+        try:
+            await self.ensure_token(session)
+        except Exception as exc:
+            logfire.warn("neptune_junior 获取 token 失败: {error}", error=str(exc))
+
+        # 先统一预取本轮全部设备状态（批量接口优先，共享设备只请求一次）
+        device_results = await self.collect_device_statuses(session)
+        tasks = [
+            self.fetch_station_status(station, session, device_results)
+            for station in self.station_list
+        ]
         results = await asyncio.gather(*tasks)
 
         final_list = []
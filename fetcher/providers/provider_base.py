@@ -2,17 +2,26 @@
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import time
+from typing import ClassVar, List, Dict, Any, Optional, Tuple
 
 from pathlib import Path
 
+from fetcher.catalog import StationCatalogStore, get_station_catalog_store
+from fetcher.device_health import get_device_health_tracker
+from fetcher.metrics import get_fetch_metrics
 from fetcher.station import Station, load_stations_from_csv, load_stations_from_db
 
 import aiohttp
+import logfire
 
 # 定义一个类型别名，或直接在签名中使用 aiohttp.ClientSession
 ClientSession = aiohttp.ClientSession
 
+# device_id -> (设备状态, 异常)，与 fetch_device_status 的返回值一致
+DeviceResults = Dict[str, Tuple[Optional[Dict[str, Any]], Optional[Exception]]]
+
 
 @dataclass
 class ProviderBase(ABC):
@@ -25,14 +34,22 @@ class ProviderBase(ABC):
 
     station_list: List[Station] = field(default_factory=list)
 
+    # 实现了 fetch_bulk_status（一次请求返回多个设备状态）的服务商置为 True
+    supports_bulk_status: ClassVar[bool] = False
+
     @property
     @abstractmethod
     def provider(self) -> str:
         """服务商标识（如 'neptune'）"""
         raise NotImplementedError
 
+    @property
+    def catalog_filename(self) -> str:
+        """站点 CSV 文件名（位于 DATA_DIR 下）"""
+        return f"{self.provider}_stations.csv"
+
     def load_station_from_csv(self) -> List[Station]:
-        csv_filename = f"{self.provider}_stations.csv"
+        csv_filename = self.catalog_filename
         csv_path = self.DATA_DIR / csv_filename
 
         if not csv_path.exists():
@@ -51,15 +68,32 @@ class ProviderBase(ABC):
         self.station_list = load_stations_from_db(self.provider)
         return self.station_list
 
+    def load_station_from_catalog(
+        self, catalog: Optional[StationCatalogStore] = None
+    ) -> List[Station]:
+        """
+        从编译后的站点目录加载站点列表（CSV 未变化时不重新解析）
+        """
+        catalog = catalog or get_station_catalog_store()
+        if not catalog.has_source(self.catalog_filename):
+            print(
+                f"Warning: Station file not found for provider '{self.provider}' "
+                f"at {self.DATA_DIR / self.catalog_filename}"
+            )
+            self.station_list = []
+            return []
+        self.station_list = catalog.stations_for(self.catalog_filename)
+        return self.station_list
+
     def load_stations(self) -> List[Station]:
         """
-        根据 self.provider 构造 CSV 路径，加载并设置站点列表。
-        例如：provider="neptune" -> 尝试加载 "data/neptune_stations.csv"
+        根据 self.provider 确定 CSV 文件，从站点目录加载并设置站点列表。
+        例如：provider="neptune" -> 加载 "data/neptune_stations.csv" 的编译结果
 
         Returns:
             加载后的 Station 实例列表
         """
-        return self.load_station_from_csv()
+        return self.load_station_from_catalog()
 
     # 其余抽象方法保持不变
     @abstractmethod
@@ -76,11 +110,117 @@ class ProviderBase(ABC):
 
     @abstractmethod
     async def fetch_station_status(
-        self, station: Station, session: ClientSession
+        self,
+        station: Station,
+        session: ClientSession,
+        device_results: Optional[DeviceResults] = None,
     ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
-        """获取站点状态数据 (包含聚合结果)。"""
+        """获取站点状态数据 (包含聚合结果)。device_results 为本轮已预取的设备状态。"""
         raise NotImplementedError
 
+    async def fetch_bulk_status(
+        self, device_ids: List[str], session: ClientSession
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        可选的批量接口：一次（或少量）区域 / 列表级请求返回多个设备的状态。
+
+        返回 device_id -> 设备状态，格式与 fetch_device_status 成功时相同；
+        未出现在结果中的设备会由 collect_device_statuses 逐个回退查询。
+        实现后需将 supports_bulk_status 置为 True。
+        """
+        return {}
+
+    def is_device_result_healthy(self, data: Optional[Dict[str, Any]]) -> bool:
+        """设备结果是否算作健康（用于设备隔离），默认非空即健康；返回空结果的服务商可覆盖"""
+        return data is not None
+
+    async def fetch_device_status_tracked(
+        self, station: Station, device_id: str, session: ClientSession
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Exception]]:
+        """经过设备健康跟踪的 fetch_device_status：隔离中的设备未到探测时间时不发请求"""
+        tracker = get_device_health_tracker()
+        if not tracker.should_fetch(station.provider, device_id):
+            return None, tracker.quarantined_error(station.provider, device_id)
+        started = time.perf_counter()
+        data, exc = await self.fetch_device_status(station, device_id, session)
+        ok = exc is None and self.is_device_result_healthy(data)
+        get_fetch_metrics().record_device(
+            station.provider, device_id, (time.perf_counter() - started) * 1000, ok
+        )
+        tracker.record(station.provider, device_id, ok, exc)
+        return data, exc
+
+    async def collect_device_statuses(
+        self, session: ClientSession, stations: Optional[List[Station]] = None
+    ) -> DeviceResults:
+        """
+        预取本轮全部设备状态：优先使用批量接口，缺口逐设备补齐。
+        多个站点共享的设备号只请求一次，隔离中的设备跳过逐设备查询。
+        """
+        stations = self.station_list if stations is None else stations
+        owners: Dict[str, Station] = {}
+        for station in stations:
+            for device_id in station.device_ids:
+                owners.setdefault(device_id, station)
+
+        results: DeviceResults = {}
+        if self.supports_bulk_status and owners:
+            try:
+                bulk = await self.fetch_bulk_status(list(owners), session)
+            except Exception as exc:
+                logfire.warn(
+                    "服务商 {provider} 批量状态接口失败，回退逐设备查询: {error}",
+                    provider=self.provider,
+                    error=str(exc),
+                )
+                bulk = {}
+            tracker = get_device_health_tracker()
+            for device_id, data in bulk.items():
+                if device_id in owners and data is not None:
+                    results[device_id] = (data, None)
+                    tracker.record(
+                        owners[device_id].provider,
+                        device_id,
+                        self.is_device_result_healthy(data),
+                    )
+
+        missing = [device_id for device_id in owners if device_id not in results]
+        if missing:
+            fetched = await asyncio.gather(
+                *(
+                    self.fetch_device_status_tracked(owners[device_id], device_id, session)
+                    for device_id in missing
+                )
+            )
+            results.update(zip(missing, fetched))
+
+        logfire.debug(
+            "服务商 {provider} 设备状态：批量 {bulk_count} 个，逐设备 {single_count} 个",
+            provider=self.provider,
+            bulk_count=len(owners) - len(missing),
+            single_count=len(missing),
+        )
+        return results
+
+    async def device_statuses_for(
+        self,
+        station: Station,
+        session: ClientSession,
+        device_results: Optional[DeviceResults] = None,
+    ) -> List[Tuple[Optional[Dict[str, Any]], Optional[Exception]]]:
+        """按 station.device_ids 顺序返回设备状态，预取结果缺失的设备逐个查询"""
+        device_results = device_results or {}
+        missing = [d for d in station.device_ids if d not in device_results]
+        fetched = dict(
+            zip(
+                missing,
+                await asyncio.gather(
+                    *(self.fetch_device_status_tracked(station, d, session) for d in missing)
+                ),
+            )
+        )
+        return [device_results.get(d) or fetched[d] for d in station.device_ids]
+
     @abstractmethod
     async def fetch_status(self, session: ClientSession) -> Optional[List[Dict[str, Any]]]:
         """获取供应商所有 station 的状态数据并转换为统一格式。"""
@@ -0,0 +1,150 @@
+"""服务商注册表：按需导入服务商适配器
+
+- 内置服务商以 "模块:类名" 字符串登记，只有被启用时才会导入对应模块；
+- 第三方服务商可通过 Python entry point（组名 zju_charger.providers）发布，
+  entry point 名称即服务商键，值指向 ProviderBase 子类；
+- 每个部署通过 Config.ENABLED_PROVIDERS 选择启用哪些服务商，留空表示全部启用。
+"""
+
+import importlib
+import threading
+from importlib.metadata import EntryPoint, entry_points
+from typing import Dict, List, Optional
+
+import logfire
+
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+ENTRY_POINT_GROUP = "zju_charger.providers"
+
+# 内置服务商：键 -> "模块:类名"
+BUILTIN_PROVIDERS: Dict[str, str] = {
+    "neptune": "fetcher.providers.neptune:NeptuneProvider",
+    "neptune_junior": "fetcher.providers.neptune_junior:NeptuneJuniorProvider",
+    "dlmm": "fetcher.providers.dlmm:DlmmProvider",
+    "else": "fetcher.providers.else_provider:ElseProvider",
+}
+
+ProviderTarget = str | EntryPoint | type
+
+
+def _import_target(target: ProviderTarget) -> type:
+    if isinstance(target, type):
+        return target
+    if isinstance(target, EntryPoint):
+        return target.load()
+    module_name, _, attr = target.partition(":")
+    if not attr:
+        raise ValueError(f"服务商目标格式应为 '模块:类名'，实际为 {target!r}")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr)
+
+
+class ProviderRegistry:
+    """服务商键到适配器类的映射，类在首次使用时才导入"""
+
+    def __init__(self, discover_entry_points: bool = True) -> None:
+        self._targets: Dict[str, ProviderTarget] = dict(BUILTIN_PROVIDERS)
+        self._classes: Dict[str, type] = {}
+        self._lock = threading.Lock()
+        self._discover = discover_entry_points
+        self._discovered = False
+
+    def register(self, key: str, target: ProviderTarget) -> None:
+        """登记服务商（"模块:类名"、entry point 或类本身），覆盖同名登记"""
+        with self._lock:
+            self._targets[key] = target
+            self._classes.pop(key, None)
+
+    def _discover_entry_points(self) -> None:
+        """读取已安装包声明的 entry point（只读元数据，不导入模块）"""
+        if self._discovered or not self._discover:
+            return
+        self._discovered = True
+        try:
+            discovered = entry_points(group=ENTRY_POINT_GROUP)
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logfire.warn("读取服务商 entry point 失败: {error}", error=str(exc))
+            return
+        for entry_point in discovered:
+            if entry_point.name in BUILTIN_PROVIDERS:
+                logfire.warn(
+                    "entry point 服务商 {provider} 与内置服务商同名，已忽略",
+                    provider=entry_point.name,
+                )
+                continue
+            self._targets.setdefault(entry_point.name, entry_point)
+
+    def available(self) -> List[str]:
+        """返回所有可用服务商键（内置在前，entry point 按名称排序）"""
+        with self._lock:
+            self._discover_entry_points()
+            builtin = [key for key in BUILTIN_PROVIDERS if key in self._targets]
+            extra = sorted(key for key in self._targets if key not in BUILTIN_PROVIDERS)
+            return builtin + extra
+
+    def load_class(self, key: str) -> type:
+        """导入并返回服务商类（结果缓存）"""
+        with self._lock:
+            cls = self._classes.get(key)
+            if cls is not None:
+                return cls
+            if key not in self._targets:
+                self._discover_entry_points()
+            target = self._targets.get(key)
+            if target is None:
+                raise KeyError(f"未知服务商: {key}")
+
+        with logfire.span("导入服务商适配器", provider=key):
+            cls = _import_target(target)
+
+        from fetcher.providers.provider_base import ProviderBase
+
+        if not (isinstance(cls, type) and issubclass(cls, ProviderBase)):
+            raise TypeError(f"服务商 {key} 不是 ProviderBase 子类: {cls!r}")
+        with self._lock:
+            self._classes[key] = cls
+        return cls
+
+    def create(self, key: str):
+        """实例化服务商"""
+        return self.load_class(key)()
+
+    def resolve_enabled(self, enabled: str | List[str] | None) -> List[str]:
+        """解析启用列表：逗号分隔字符串或列表；留空或 "*" 表示全部可用服务商"""
+        if isinstance(enabled, str):
+            keys = [item.strip() for item in enabled.split(",") if item.strip()]
+        else:
+            keys = [item for item in (enabled or []) if item]
+
+        if not keys or keys == ["*"]:
+            return self.available()
+
+        resolved: List[str] = []
+        with self._lock:
+            for key in keys:
+                if key not in self._targets:
+                    self._discover_entry_points()
+                if key not in self._targets:
+                    logfire.warn(
+                        "ENABLED_PROVIDERS 中的服务商 {provider} 不存在，已忽略", provider=key
+                    )
+                    continue
+                if key not in resolved:
+                    resolved.append(key)
+        return resolved
+
+
+_registry: Optional[ProviderRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_provider_registry() -> ProviderRegistry:
+    """进程内共享的服务商注册表"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ProviderRegistry()
+        return _registry
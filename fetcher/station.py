@@ -7,10 +7,11 @@ from __future__ import annotations
 import csv
 import hashlib
 import json
+import sys
 from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 # 校园 ID 映射，定义在外部，作为常量
 CAMPUS_NAME_MAP = {1: "玉泉校区", 2: "紫金港校区", 3: "华家池校区", 4: "西溪校区", 5: "之江校区"}
@@ -22,7 +23,7 @@ def _now_ts() -> str:
     return datetime.now(tz_utc_8).isoformat()
 
 
-@dataclass
+@dataclass(slots=True)
 class StationUsage:
     """站点使用情况统计"""
 
@@ -32,9 +33,9 @@ class StationUsage:
     error: int = 0  # 故障
 
 
-@dataclass
+@dataclass(slots=True)
 class Station:
-    """站点基本信息"""
+    """站点基本信息（使用 __slots__，不为每个实例分配 __dict__）"""
 
     # --- 1. 必需参数 (Non-default arguments) 放在最前面 ---
     name: str
@@ -74,6 +75,34 @@ class Station:
         # 3. 设备 ID 全部转成字符串，便于比较
         self.device_ids = [str(d) for d in self.device_ids if str(d)]
 
+    @classmethod
+    def restore(
+        cls,
+        *,
+        hash_id: str,
+        name: str,
+        provider: str,
+        campus_id: int,
+        campus_name: str,
+        lat: float,
+        lon: float,
+        device_ids: List[str],
+        updated_at: Optional[str] = None,
+    ) -> Station:
+        """从已校验的编译结果恢复实例，跳过 __post_init__ 中的 md5 计算与规范化"""
+        station = cls.__new__(cls)
+        station.name = name
+        station.provider = sys.intern(provider)
+        station.campus_id = campus_id
+        station.campus_name = sys.intern(campus_name)
+        station.lat = lat
+        station.lon = lon
+        station.device_ids = device_ids
+        station.updated_at = updated_at or _now_ts()
+        station.hash_id = hash_id
+        station.usage = StationUsage()
+        return station
+
     @classmethod
     def from_csv_row(cls, row: dict) -> Station:
         """从 CSV 行数据（字典）创建一个 Station 实例"""
@@ -107,6 +136,100 @@ class Station:
         )
 
 
+class StationRegistry:
+    """以 hash_id 为键的常驻站点表
+
+    后台抓取每轮都会拿到全部站点的字典数据，registry 让各轮复用同一批 Station 实例：
+    元数据没有变化时只就地更新 usage 计数，不再重建对象、重算 md5 hash_id。
+    """
+
+    def __init__(self) -> None:
+        self._stations: Dict[str, Station] = {}
+
+    def __len__(self) -> int:
+        return len(self._stations)
+
+    def __contains__(self, hash_id: object) -> bool:
+        return hash_id in self._stations
+
+    def get(self, hash_id: str) -> Optional[Station]:
+        return self._stations.get(hash_id)
+
+    def remove(self, hash_id: str) -> Optional[Station]:
+        return self._stations.pop(hash_id, None)
+
+    def stations(self) -> List[Station]:
+        return list(self._stations.values())
+
+    def upsert(
+        self,
+        hash_id: str,
+        *,
+        name: str,
+        provider: str,
+        campus_id: int,
+        campus_name: str,
+        lat: float,
+        lon: float,
+        device_ids: List[str],
+        updated_at: str,
+    ) -> Tuple[Station, bool]:
+        """登记站点元数据，返回 (站点实例, 元数据是否新增或变化)"""
+        if not campus_name:
+            campus_name = CAMPUS_NAME_MAP.get(campus_id, "")
+
+        station = self._stations.get(hash_id)
+        if station is None:
+            # provider / 校区名在所有站点间高度重复，驻留后各实例共享同一字符串
+            station = Station(
+                name=name,
+                provider=sys.intern(provider),
+                campus_id=campus_id,
+                campus_name=sys.intern(campus_name),
+                lat=lat,
+                lon=lon,
+                device_ids=device_ids,
+                updated_at=updated_at,
+            )
+            station.hash_id = hash_id
+            self._stations[hash_id] = station
+            return station, True
+
+        changed = False
+        if station.name != name:
+            station.name = name
+            changed = True
+        if station.provider != provider:
+            station.provider = sys.intern(provider)
+            changed = True
+        if station.campus_id != campus_id:
+            station.campus_id = campus_id
+            changed = True
+        if station.campus_name != campus_name:
+            station.campus_name = sys.intern(campus_name)
+            changed = True
+        if station.lat != lat or station.lon != lon:
+            station.lat = lat
+            station.lon = lon
+            changed = True
+        if station.device_ids != device_ids:
+            station.device_ids = list(device_ids)
+            changed = True
+        if station.updated_at != updated_at:
+            station.updated_at = updated_at
+            changed = True
+        return station, changed
+
+    @staticmethod
+    def set_usage(station: Station, free: int, used: int, total: int, error: int) -> None:
+        """就地更新站点计数，不分配新的 StationUsage"""
+        usage = station.usage
+        usage.free = free
+        usage.used = used
+        usage.total = total
+        usage.error = error
+
+
 def load_stations_from_csv(csv_path: Path) -> List[Station]:
     """从 CSV 文件加载所有站点信息"""
     with csv_path.open("r", encoding="utf-8") as fp:
@@ -0,0 +1,491 @@
+"""
+列式站点状态表
+
+一轮抓取（或一个 latest 数据版本）的站点状态以列的形式保存：
+站点基础信息按稳定的站点序号（ordinal）存放在 StationCatalog 中，跨轮复用；
+每轮只分配四个 array('i') 计数列与一个 bytearray 存在标记，不再为每个站点构建 13 个键的字典。
+
+过滤（服务商 / 校区 / 设备 / 最少空闲数）基于目录预先建立的序号索引，
+聚合结果（全局、校区、服务商合计）在表上惰性计算一次后缓存，
+两轮之间的差异通过逐列比较得到。只有在输出 API 响应或快照时才物化为字典。
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 计数列顺序
+COUNT_FIELDS = ("free", "used", "total", "error")
+
+_NO_CAMPUS = -1
+
+
+def _normalize_device_ids(value: Any) -> List[str]:
+    if not value:
+        return []
+    if isinstance(value, str):
+        stripped = value.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            try:
+                value = json.loads(stripped)
+            except json.JSONDecodeError:
+                return [stripped]
+        else:
+            return [stripped] if stripped else []
+    if isinstance(value, (list, tuple)):
+        return [str(item) for item in value if item is not None and str(item).strip()]
+    return [str(value)]
+
+
+def _to_int(value: Any, default: int = 0) -> int:
+    try:
+        if value is None or value == "":
+            return default
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _to_float(value: Any) -> float:
+    try:
+        if value is None or value == "":
+            return math.nan
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _comparable(metadata: Tuple[Any, ...]) -> Tuple[Any, ...]:
+    # NaN 不等于自身，比较前换成 None，避免缺少坐标的站点每轮都被视为变化
+    return tuple(
+        None if isinstance(value, float) and math.isnan(value) else value for value in metadata
+    )
+
+
+class StationCatalog:
+    """站点目录：hash_id 到稳定序号的映射以及按序号存放的基础信息列
+
+    序号在站点首次出现时分配并在进程生命周期内保持不变，因此不同轮次的状态表可以直接按序号比较。
+    """
+
+    def __init__(self) -> None:
+        self._ordinals: Dict[str, int] = {}
+        self.hash_ids: List[str] = []
+        self.names: List[Optional[str]] = []
+        self.providers: List[Optional[str]] = []
+        self.campus_ids = array("i")
+        self.campus_names: List[Optional[str]] = []
+        self.lats = array("d")
+        self.lons = array("d")
+        self.device_ids: List[List[str]] = []
+        # 目录新增站点或基础信息变化时递增，用于失效序号索引
+        self.generation = 0
+        self._index_generation = -1
+        self._by_provider: Dict[str, array] = {}
+        self._by_campus: Dict[int, array] = {}
+        self._by_devid: Dict[Tuple[str, str], array] = {}
+
+    def __len__(self) -> int:
+        return len(self.hash_ids)
+
+    def get(self, hash_id: str) -> Optional[int]:
+        return self._ordinals.get(hash_id)
+
+    def ordinal(self, hash_id: str) -> int:
+        """返回站点序号，首次出现时分配新序号（基础信息为空）"""
+        ordinal = self._ordinals.get(hash_id)
+        if ordinal is not None:
+            return ordinal
+
+        ordinal = len(self.hash_ids)
+        self._ordinals[hash_id] = ordinal
+        self.hash_ids.append(hash_id)
+        self.names.append(None)
+        self.providers.append(None)
+        self.campus_ids.append(_NO_CAMPUS)
+        self.campus_names.append(None)
+        self.lats.append(math.nan)
+        self.lons.append(math.nan)
+        self.device_ids.append([])
+        self.generation += 1
+        return ordinal
+
+    def update(self, hash_id: str, station: Dict[str, Any]) -> int:
+        """用服务商站点字典或 stations 表行更新基础信息，返回序号"""
+        ordinal = self.ordinal(hash_id)
+        campus_id = station.get("campus_id")
+        metadata = (
+            station.get("name"),
+            station.get("provider"),
+            _NO_CAMPUS if campus_id is None else _to_int(campus_id, _NO_CAMPUS),
+            station.get("campus_name"),
+            _to_float(station.get("lat")),
+            _to_float(station.get("lon")),
+            _normalize_device_ids(station.get("device_ids") or station.get("devids")),
+        )
+        if _comparable(metadata) != _comparable(self._metadata(ordinal)):
+            (
+                self.names[ordinal],
+                self.providers[ordinal],
+                self.campus_ids[ordinal],
+                self.campus_names[ordinal],
+                self.lats[ordinal],
+                self.lons[ordinal],
+                self.device_ids[ordinal],
+            ) = metadata
+            self.generation += 1
+        return ordinal
+
+    def _metadata(self, ordinal: int) -> Tuple[Any, ...]:
+        return (
+            self.names[ordinal],
+            self.providers[ordinal],
+            self.campus_ids[ordinal],
+            self.campus_names[ordinal],
+            self.lats[ordinal],
+            self.lons[ordinal],
+            self.device_ids[ordinal],
+        )
+
+    def _ensure_indexes(self) -> None:
+        if self._index_generation == self.generation:
+            return
+        by_provider: Dict[str, array] = {}
+        by_campus: Dict[int, array] = {}
+        by_devid: Dict[Tuple[str, str], array] = {}
+        for ordinal, provider in enumerate(self.providers):
+            if provider is None:
+                continue
+            by_provider.setdefault(provider, array("I")).append(ordinal)
+            campus_id = self.campus_ids[ordinal]
+            if campus_id != _NO_CAMPUS:
+                by_campus.setdefault(campus_id, array("I")).append(ordinal)
+            for devid in self.device_ids[ordinal]:
+                by_devid.setdefault((provider, devid), array("I")).append(ordinal)
+        self._by_provider, self._by_campus, self._by_devid = by_provider, by_campus, by_devid
+        self._index_generation = self.generation
+
+    def ordinals_for(
+        self,
+        *,
+        provider: Optional[str] = None,
+        campus_id: Optional[int] = None,
+        devid: Optional[str] = None,
+    ) -> Optional[Sequence[int]]:
+        """按基础信息过滤，返回升序序号；没有任何条件时返回 None 表示全部站点"""
+        if provider is None and campus_id is None:
+            return None
+        self._ensure_indexes()
+
+        candidates: Optional[Sequence[int]] = None
+        if provider is not None and devid is not None:
+            candidates = self._by_devid.get((provider, str(devid)), array("I"))
+        elif provider is not None:
+            candidates = self._by_provider.get(provider, array("I"))
+        if campus_id is not None:
+            in_campus = self._by_campus.get(campus_id, array("I"))
+            if candidates is None:
+                candidates = in_campus
+            else:
+                campus_set = set(in_campus)
+                candidates = [ordinal for ordinal in candidates if ordinal in campus_set]
+        return candidates
+
+
+class StatusTable:
+    """一个数据版本的列式站点状态"""
+
+    __slots__ = (
+        "catalog",
+        "updated_at",
+        "present",
+        "free",
+        "used",
+        "total",
+        "error",
+        "_ordinals",
+        "_aggregates",
+    )
+
+    def __init__(self, catalog: StationCatalog, updated_at: Optional[str] = None) -> None:
+        self.catalog = catalog
+        self.updated_at = updated_at
+        self.present = bytearray()
+        self.free = array("i")
+        self.used = array("i")
+        self.total = array("i")
+        self.error = array("i")
+        self._ordinals: Optional[array] = None
+        self._aggregates: Dict[str, Any] = {}
+
+    # --- 构建 ---
+
+    def _grow(self, size: int) -> None:
+        missing = size - len(self.present)
+        if missing <= 0:
+            return
+        self.present.extend(bytes(missing))
+        zeros = array("i", bytes(4 * missing))
+        for column in (self.free, self.used, self.total, self.error):
+            column.extend(zeros)
+
+    def set_counts(self, ordinal: int, free: int, used: int, total: int, error: int) -> bool:
+        """写入站点计数；同一表内重复出现的站点保留第一次的值，返回是否写入"""
+        self._grow(ordinal + 1)
+        if self.present[ordinal]:
+            return False
+        self.present[ordinal] = 1
+        self.free[ordinal] = free
+        self.used[ordinal] = used
+        self.total[ordinal] = total
+        self.error[ordinal] = error
+        self._ordinals = None
+        self._aggregates.clear()
+        return True
+
+    @classmethod
+    def from_stations(
+        cls,
+        stations: Iterable[Dict[str, Any]],
+        catalog: StationCatalog,
+        updated_at: Optional[str] = None,
+    ) -> StatusTable:
+        """由服务商抓取结果构建，同时更新目录中的基础信息"""
+        table = cls(catalog, updated_at)
+        table._grow(len(catalog))
+        for station in stations:
+            station_id = station.get("hash_id") or station.get("id")
+            if not station_id:
+                continue
+            ordinal = catalog.get(station_id)
+            if ordinal is not None and ordinal < len(table.present) and table.present[ordinal]:
+                continue
+            ordinal = catalog.update(station_id, station)
+            table.set_counts(
+                ordinal,
+                _to_int(station.get("free")),
+                _to_int(station.get("used")),
+                _to_int(station.get("total")),
+                _to_int(station.get("error")),
+            )
+        return table
+
+    @classmethod
+    def from_latest_rows(
+        cls,
+        rows: Iterable[Dict[str, Any]],
+        catalog: StationCatalog,
+        updated_at: Optional[str] = None,
+    ) -> StatusTable:
+        """由 latest 行（只含计数）构建，基础信息需事先通过 catalog.update 写入
+
+        目录中不存在的站点（例如已被删除）直接跳过，不为其分配序号。
+        """
+        table = cls(catalog, updated_at)
+        table._grow(len(catalog))
+        for row in rows:
+            station_id = row.get("hash_id")
+            ordinal = catalog.get(station_id) if station_id else None
+            if ordinal is None:
+                continue
+            table.set_counts(
+                ordinal,
+                _to_int(row.get("free")),
+                _to_int(row.get("used")),
+                _to_int(row.get("total")),
+                _to_int(row.get("error")),
+            )
+        return table
+
+    # --- 查询 ---
+
+    def __len__(self) -> int:
+        return len(self.ordinals())
+
+    def ordinals(self) -> array:
+        """当前表中存在的站点序号（升序）"""
+        if self._ordinals is None:
+            self._ordinals = array(
+                "I", (ordinal for ordinal, flag in enumerate(self.present) if flag)
+            )
+        return self._ordinals
+
+    def select(
+        self,
+        *,
+        provider: Optional[str] = None,
+        campus_id: Optional[int] = None,
+        devid: Optional[str] = None,
+        station_ids: Optional[Iterable[str]] = None,
+        min_free: Optional[int] = None,
+    ) -> List[int]:
+        """组合过滤，返回命中站点的序号
+
+        station_ids 给出时按其顺序返回；否则按序号升序返回。
+        """
+        present = self.present
+        size = len(present)
+        if station_ids is not None:
+            ordinals: Iterable[int] = (
+                ordinal
+                for ordinal in (self.catalog.get(station_id) for station_id in station_ids)
+                if ordinal is not None
+            )
+        else:
+            candidates = self.catalog.ordinals_for(
+                provider=provider, campus_id=campus_id, devid=devid
+            )
+            ordinals = self.ordinals() if candidates is None else candidates
+
+        selected = [ordinal for ordinal in ordinals if ordinal < size and present[ordinal]]
+        if station_ids is not None and (provider is not None or campus_id is not None):
+            allowed = set(
+                self.catalog.ordinals_for(provider=provider, campus_id=campus_id, devid=devid) or ()
+            )
+            selected = [ordinal for ordinal in selected if ordinal in allowed]
+        if min_free is not None:
+            free = self.free
+            selected = [ordinal for ordinal in selected if free[ordinal] >= min_free]
+        return selected
+
+    def counts(self, ordinal: int) -> Tuple[int, int, int, int]:
+        return (
+            self.free[ordinal],
+            self.used[ordinal],
+            self.total[ordinal],
+            self.error[ordinal],
+        )
+
+    # --- 聚合 ---
+
+    def totals(self, ordinals: Optional[Iterable[int]] = None) -> Dict[str, int]:
+        """计数合计；不传 ordinals 时为全表合计（缓存）"""
+        if ordinals is None:
+            cached = self._aggregates.get("totals")
+            if cached is None:
+                cached = self._aggregates["totals"] = self._sum(self.ordinals())
+            return dict(cached)
+        return self._sum(ordinals)
+
+    def _sum(self, ordinals: Iterable[int]) -> Dict[str, int]:
+        free, used, total, error = self.free, self.used, self.total, self.error
+        result = dict.fromkeys(COUNT_FIELDS, 0)
+        count = 0
+        for ordinal in ordinals:
+            result["free"] += free[ordinal]
+            result["used"] += used[ordinal]
+            result["total"] += total[ordinal]
+            result["error"] += error[ordinal]
+            count += 1
+        result["stations"] = count
+        return result
+
+    def _group_totals(self, key: str, group_of) -> Dict[Any, Dict[str, int]]:
+        cached = self._aggregates.get(key)
+        if cached is None:
+            groups: Dict[Any, List[int]] = {}
+            for ordinal in self.ordinals():
+                group = group_of(ordinal)
+                if group is not None:
+                    groups.setdefault(group, []).append(ordinal)
+            cached = self._aggregates[key] = {
+                group: self._sum(ordinals) for group, ordinals in groups.items()
+            }
+        return cached
+
+    def campus_totals(self) -> Dict[int, Dict[str, int]]:
+        """按校区合计（每个表只计算一次）"""
+        campus_ids = self.catalog.campus_ids
+        return self._group_totals(
+            "campus",
+            lambda ordinal: None if campus_ids[ordinal] == _NO_CAMPUS else campus_ids[ordinal],
+        )
+
+    def provider_totals(self) -> Dict[str, Dict[str, int]]:
+        """按服务商合计（每个表只计算一次）"""
+        providers = self.catalog.providers
+        return self._group_totals("provider", lambda ordinal: providers[ordinal])
+
+    # --- 差异 ---
+
+    def diff(self, previous: Optional[StatusTable]) -> List[int]:
+        """返回相对上一张表计数发生变化（或新出现）的站点序号"""
+        if previous is None or previous.catalog is not self.catalog:
+            return list(self.ordinals())
+
+        size = len(self.present)
+        previous._grow(size)
+        if (
+            self.present == previous.present[:size]
+            and self.free == previous.free[:size]
+            and self.used == previous.used[:size]
+            and self.total == previous.total[:size]
+            and self.error == previous.error[:size]
+        ):
+            return []
+
+        prev_present = previous.present
+        return [
+            ordinal
+            for ordinal in self.ordinals()
+            if not prev_present[ordinal] or self.counts(ordinal) != previous.counts(ordinal)
+        ]
+
+    # --- 物化 ---
+
+    def station(self, ordinal: int, fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """物化单个站点为 /api/status 的站点结构"""
+        catalog = self.catalog
+        station_id = catalog.hash_ids[ordinal]
+        campus_id = catalog.campus_ids[ordinal]
+        lat, lon = catalog.lats[ordinal], catalog.lons[ordinal]
+        station = {
+            "hash_id": station_id,
+            "id": station_id,
+            "name": catalog.names[ordinal] or station_id,
+            "provider": catalog.providers[ordinal],
+            "campus_id": None if campus_id == _NO_CAMPUS else campus_id,
+            "campus_name": catalog.campus_names[ordinal],
+            "lat": None if math.isnan(lat) else lat,
+            "lon": None if math.isnan(lon) else lon,
+            "devids": list(catalog.device_ids[ordinal]),
+            "free": self.free[ordinal],
+            "used": self.used[ordinal],
+            "total": self.total[ordinal],
+            "error": self.error[ordinal],
+        }
+        if fields is not None:
+            return {name: station[name] for name in fields}
+        return station
+
+    def rows(
+        self,
+        ordinals: Optional[Iterable[int]] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        if ordinals is None:
+            ordinals = self.ordinals()
+        return [self.station(ordinal, fields) for ordinal in ordinals]
+
+    def count_rows(self, ordinals: Optional[Iterable[int]] = None) -> List[Dict[str, Any]]:
+        """只含 hash_id 与计数的行（写入共享状态表等场景使用）"""
+        if ordinals is None:
+            ordinals = self.ordinals()
+        hash_ids = self.catalog.hash_ids
+        return [
+            {
+                "hash_id": hash_ids[ordinal],
+                "free": self.free[ordinal],
+                "used": self.used[ordinal],
+                "total": self.total[ordinal],
+                "error": self.error[ordinal],
+            }
+            for ordinal in ordinals
+        ]
+
+    def to_payload(self) -> Dict[str, Any]:
+        """物化为 /api/status 响应体"""
+        return {"updated_at": self.updated_at, "stations": self.rows()}
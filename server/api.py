@@ -3,19 +3,17 @@
 import logfire
 from fastapi import FastAPI, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, Field, StringConstraints
 from datetime import datetime, timezone, timedelta
-from typing import List, Optional, Dict, Any, Tuple
+from typing import Annotated, List, Optional, Dict, Any, Tuple
+import hmac
 import json
 import sys
+from threading import Lock
 from pathlib import Path
 from contextlib import asynccontextmanager
 from time import perf_counter
 
-# 导入 slowapi 限流相关模块
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-
 from server.logfire_setup import ensure_logfire_configured
 
 ensure_logfire_configured()
@@ -25,17 +23,75 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 
 from server.config import Config
+from fetcher.device_health import load_health_state
+from fetcher.port_state import STATE_NAMES, decode_station_ports, states_to_string
+from fetcher.status_table import StationCatalog, StatusTable
+from server.profiling import get_profiling_controller
+from server.status_snapshot import load_status_snapshot
+from server.shared_status import SharedStatusReader
+from server.fetch_coordination import (
+    FETCHER_MODE_LEADER,
+    CycleWatcher,
+    get_cycle_notify_path,
+    start_leader_election,
+)
+from server.rate_limit import (
+    ClientIdentifier,
+    RateLimitExceeded,
+    TokenBucketLimiter,
+    create_bucket_store,
+    parse_networks,
+    rate_limit_exceeded_handler,
+)
+from server.response_cache import (
+    CachedBody,
+    ResponseCache,
+    build_encoded_response,
+    encode_json,
+)
+from server.response_formats import (
+    UnsupportedFormatError,
+    negotiate_format,
+    serialize_payload,
+)
 from db import (
     initialize_db_config,
     load_latest as load_latest_cache,
+    load_latest_port_states,
+    fetch_latest_version,
     fetch_station_metadata,
     fetch_all_stations_data,
     fetch_distinct_providers,
+    fetch_stations_version,
 )
 
 PROVIDER_PATTERN = r"^[A-Za-z0-9_-]+$"
 HASH_ID_PATTERN = r"^[0-9a-fA-F]{8}$"
 DEVID_PATTERN = r"^[A-Za-z0-9_, -]+$"
+FORMAT_PATTERN = r"^(json|msgpack)$"
+LAYOUT_PATTERN = r"^(rows|columnar)$"
+FIELDS_PATTERN = r"^[a-z_]+(,[a-z_]+)*$"
+# 批量查询单次最多的站点数
+STATUS_BATCH_MAX_IDS = 50
+
+# /api/status 站点字段（规范顺序），fields 参数只能从中选择
+STATUS_FIELDS = (
+    "hash_id",
+    "id",
+    "name",
+    "provider",
+    "campus_id",
+    "campus_name",
+    "lat",
+    "lon",
+    "devids",
+    "free",
+    "used",
+    "total",
+    "error",
+)
+# /api/status 响应随 Accept（格式）与 Accept-Encoding（压缩）变化
+STATUS_VARY_HEADERS = {"Vary": "Accept, Accept-Encoding"}
 
 
 @asynccontextmanager
@@ -67,7 +123,19 @@ async def lifespan(app: FastAPI):
         else:
             logfire.info("  - 接口限流: 已禁用")
 
-        logfire.info("后台抓取任务由 run_server 启动并独立运行")
+        if Config.FETCHER_MODE == FETCHER_MODE_LEADER:
+            # 多 worker 部署：各 worker 竞选 leader，只有当选者运行后台抓取
+            from server.background_fetcher import BackgroundFetcher
+
+            app.state.fetcher_leader_lock = start_leader_election(
+                lambda: BackgroundFetcher().start()
+            )
+            logfire.info("后台抓取任务由当选 leader 的 worker 运行")
+        else:
+            logfire.info(
+                "后台抓取任务由 run_server 启动并独立运行（模式: {mode}）",
+                mode=Config.FETCHER_MODE,
+            )
 
     yield
 
@@ -80,6 +148,13 @@ app = FastAPI(title="ZJU Charger API", version="1.0.0", lifespan=lifespan)
 _last_status_snapshot: Optional[Dict[str, Any]] = None
 _last_status_filter_mode: Optional[str] = None
 
+# 已序列化响应体缓存：同一数据版本 + 查询变体只序列化/压缩一次
+status_response_cache = ResponseCache()
+# 感知后台抓取（可能位于其他进程）完成的新周期
+fetch_cycle_watcher = CycleWatcher(get_cycle_notify_path())
+# 抓取进程发布的共享内存状态表，命中时站点计数与数据版本都无需查询 SQLite
+shared_status_reader = SharedStatusReader() if Config.SHARED_STATUS_ENABLED else None
+
 
 def now_utc8_iso() -> str:
     tz_utc_8 = timezone(timedelta(hours=8))
@@ -103,6 +178,9 @@ api_latency_histogram = logfire.metric_histogram(
 )
 
 
+profiling_controller = get_profiling_controller()
+
+
 class ApiCallTelemetry:
     """Context manager that wraps API handlers with a span and metrics."""
 
@@ -128,6 +206,7 @@ class ApiCallTelemetry:
 
     def __enter__(self) -> "ApiCallTelemetry":
         self._span_cm.__enter__()
+        self._sampler = profiling_controller.start_request()
         self._start = perf_counter()
         return self
 
@@ -141,6 +220,7 @@ class ApiCallTelemetry:
                 status_code = 500
 
         self._record_metrics(status_code, duration_ms)
+        profiling_controller.finish_request(self._sampler, self.endpoint)
         self._span_cm.__exit__(exc_type, exc, tb)
 
     def add_metric_attributes(self, **attrs: Any) -> None:
@@ -162,6 +242,97 @@ class ApiCallTelemetry:
         api_latency_histogram.record(duration_ms, attributes)
 
 
+def _warm_start_from_snapshot_file() -> None:
+    """在打开数据库之前加载状态快照文件，作为冷启动与数据库故障时的兜底数据"""
+    global _last_status_snapshot, _last_status_filter_mode
+    with logfire.span("加载状态快照文件"):
+        snapshot = load_status_snapshot()
+        if snapshot is None:
+            logfire.info("未找到可用的状态快照文件，等待 latest 表或首次抓取")
+            return
+
+        _last_status_snapshot = {
+            "payload": snapshot["payload"],
+            "recorded_at": snapshot.get("written_at") or now_utc8_iso(),
+        }
+        _last_status_filter_mode = "all"
+        logfire.info(
+            "已从状态快照文件预加载 {station_count} 个站点（版本 {version}）",
+            station_count=len(snapshot["payload"].get("stations", [])),
+            version=snapshot.get("version"),
+        )
+
+
+_warm_start_from_snapshot_file()
+
+
+def _current_status_version() -> Optional[str]:
+    """当前 latest 数据版本；收到新周期通知时清空响应缓存并重新加载兜底快照"""
+    if fetch_cycle_watcher.poll():
+        status_response_cache.clear()
+        _warm_start_from_snapshot_file()
+    if shared_status_reader is not None:
+        version = shared_status_reader.version()
+        if version is not None:
+            return version
+    return fetch_cycle_watcher.version(fetch_latest_version)
+
+
+def _load_latest_rows(station_ids: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """读取站点计数：优先共享内存状态表，不可用时回退到 latest 表"""
+    if shared_status_reader is not None:
+        shared = shared_status_reader.load(station_ids)
+        if shared is not None:
+            return shared
+    return load_latest_cache(station_ids)
+
+
+# 列式状态表：每个数据版本只构建一次，所有过滤 / 投影 / 聚合变体共用
+_status_table_lock = Lock()
+_status_table: Optional[StatusTable] = None
+_status_table_version: Optional[str] = None
+_station_catalog: Optional[StationCatalog] = None
+_station_catalog_version: Optional[str] = None
+
+
+def _get_station_catalog() -> StationCatalog:
+    """stations 表版本变化时重建站点目录，否则复用"""
+    global _station_catalog, _station_catalog_version
+    stations_version = fetch_stations_version()
+    if (
+        _station_catalog is None
+        or stations_version is None
+        or stations_version != _station_catalog_version
+    ):
+        with logfire.span("构建站点目录"):
+            catalog = StationCatalog()
+            for station_id, metadata in fetch_station_metadata().items():
+                catalog.update(station_id, metadata)
+        _station_catalog, _station_catalog_version = catalog, stations_version
+    return _station_catalog
+
+
+def _get_status_table(version: Optional[str]) -> Optional[StatusTable]:
+    """返回当前数据版本的列式状态表，latest 无数据时返回 None"""
+    global _status_table, _status_table_version
+    with _status_table_lock:
+        if version is not None and version == _status_table_version and _status_table:
+            return _status_table
+
+        with logfire.span("构建列式状态表", version=version):
+            cached_data = _load_latest_rows()
+            if not cached_data or not cached_data.get("rows"):
+                return None
+            table = StatusTable.from_latest_rows(
+                cached_data["rows"],
+                _get_station_catalog(),
+                cached_data.get("updated_at"),
+            )
+        if version is not None:
+            _status_table, _status_table_version = table, version
+        return table
+
+
 # 初始化 SQLite 数据库
 db_path = Config.SQLITE_DB_PATH if Config.SQLITE_DB_PATH else None
 if initialize_db_config(db_path):
@@ -169,25 +340,19 @@ if initialize_db_config(db_path):
 else:
     logfire.warn("SQLite 数据库初始化失败，部分功能可能不可用")
 
-# 初始化 slowapi 限流器（如果启用限流）
-# 默认使用内存存储，如需使用 Redis，可修改为：
-# limiter = Limiter(key_func=get_remote_address, storage_uri="redis://localhost:6379/0")
+# 初始化令牌桶限流器（如果启用限流）
+# 存储由 RATE_LIMIT_STORAGE_URI 决定，默认使用 SQLite 文件在多个 worker 间共享令牌桶
 if Config.RATE_LIMIT_ENABLED:
-    limiter = Limiter(key_func=get_remote_address)
-    # 注册限流异常处理器
+    limiter = TokenBucketLimiter(
+        store=create_bucket_store(Config.RATE_LIMIT_STORAGE_URI),
+        key_func=ClientIdentifier(parse_networks(Config.RATE_LIMIT_TRUSTED_PROXIES)),
+        whitelist=parse_networks(Config.RATE_LIMIT_WHITELIST),
+    )
     app.state.limiter = limiter
-
-    # 创建类型兼容的异常处理器包装器
-    from starlette.responses import Response
-
-    async def rate_limit_handler(request: Request, exc: Exception) -> Response:
-        if isinstance(exc, RateLimitExceeded):
-            return _rate_limit_exceeded_handler(request, exc)
-        raise exc
-
-    app.add_exception_handler(RateLimitExceeded, rate_limit_handler)
+    app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
     logfire.info(
-        "slowapi 限流器已初始化（使用内存存储），默认规则: {default_rule}，/api/status 规则: {status_rule}",
+        "限流器已初始化（存储: {storage}），默认规则: {default_rule}，/api/status 规则: {status_rule}",
+        storage=Config.RATE_LIMIT_STORAGE_URI,
         default_rule=Config.RATE_LIMIT_DEFAULT,
         status_rule=Config.RATE_LIMIT_STATUS,
     )
@@ -244,57 +409,17 @@ logfire.info("CORS 中间件已配置")
 logfire.info("FastAPI 仅提供 API 路由；静态前端由独立托管服务提供")
 
 
-def _build_stations_from_latest_rows(
-    rows: List[Dict[str, Any]],
-    *,
-    provider: Optional[str] = None,
-    devid: Optional[str] = None,
-) -> List[Dict[str, Any]]:
-    """将 latest 行数据与站点信息整合为 API 需要的结构"""
-
-    if not rows:
-        return []
-
-    station_ids = [row.get("hash_id") for row in rows if row.get("hash_id")]
-    metadata_map = fetch_station_metadata(station_ids, provider=provider)
-
-    seen_ids: Dict[str, Dict[str, Any]] = {}
-    for row in rows:
-        station_id = row.get("hash_id")
-        if not station_id:
-            continue
-
-        metadata = metadata_map.get(station_id, {})
-        if provider and not metadata:
-            # provider 被过滤掉了
-            continue
-        if not metadata:
-            logfire.debug("站点 {station_id} 缺少 metadata，将返回最小字段", station_id=station_id)
-
-        device_ids = metadata.get("device_ids") or []
-        normalized_ids = _normalize_device_ids(device_ids)
-        if devid and str(devid) not in normalized_ids:
-            continue
-
-        station = {
-            "hash_id": station_id,
-            "id": station_id,
-            "name": metadata.get("name") or station_id,
-            "provider": metadata.get("provider"),
-            "campus_id": metadata.get("campus_id"),
-            "campus_name": metadata.get("campus_name"),
-            "lat": metadata.get("lat"),
-            "lon": metadata.get("lon"),
-            "devids": metadata.get("device_ids") or [],
-            "free": int(row.get("free", 0) or 0),
-            "used": int(row.get("used", 0) or 0),
-            "total": int(row.get("total", 0) or 0),
-            "error": int(row.get("error", 0) or 0),
-        }
-        if station_id not in seen_ids:
-            seen_ids[station_id] = station
+def _parse_status_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """解析 fields 参数，返回按规范顺序排列的字段元组（总是包含 hash_id）"""
+    if not fields:
+        return None
 
-    return list(seen_ids.values())
+    requested = {item.strip() for item in fields.split(",") if item.strip()}
+    unknown = requested - set(STATUS_FIELDS)
+    if unknown:
+        raise ValueError(f"未知字段: {', '.join(sorted(unknown))}")
+    requested.add("hash_id")
+    return tuple(name for name in STATUS_FIELDS if name in requested)
 
 
 def _format_station_definition(row: Dict[str, Any]) -> Dict[str, Any]:
@@ -307,7 +432,7 @@ def _format_station_definition(row: Dict[str, Any]) -> Dict[str, Any]:
         "campus_name": row.get("campus_name"),
         "latitude": row.get("lat"),
         "longitude": row.get("lon"),
-        "devids": row.get("device_ids") or [],
+        "devids": _normalize_device_ids(row.get("device_ids")),
     }
 
 
@@ -347,13 +472,106 @@ def _remember_status_response(
     _last_status_filter_mode = filter_mode
 
 
-def _get_fallback_status_response() -> Optional[Tuple[Dict[str, Any], str]]:
+def _get_fallback_status_response(
+    *,
+    provider: Optional[str] = None,
+    station_id: Optional[str] = None,
+    devid: Optional[str] = None,
+    campus_id: Optional[int] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+) -> Optional[Tuple[Dict[str, Any], str]]:
     if not _last_status_snapshot:
         return None
 
     payload = dict(_last_status_snapshot["payload"])
+    filter_mode = _last_status_filter_mode or "all"
+    if any([provider, station_id, devid, campus_id is not None]):
+        stations = []
+        for station in payload.get("stations", []):
+            if station_id and station.get("hash_id") != station_id:
+                continue
+            if provider and station.get("provider") != provider:
+                continue
+            if campus_id is not None and station.get("campus_id") != campus_id:
+                continue
+            if devid and str(devid) not in _normalize_device_ids(station.get("devids")):
+                continue
+            stations.append(station)
+        if not stations:
+            return None
+        payload["stations"] = stations
+        filter_mode = _resolve_filter_mode(
+            provider=provider, station_id=station_id, devid=devid, campus_id=campus_id
+        )
+
+    if fields is not None:
+        payload["stations"] = [
+            {name: station.get(name) for name in fields} for station in payload["stations"]
+        ]
+
     payload["stale"] = True
-    return payload, (_last_status_filter_mode or "all")
+    return payload, filter_mode
+
+
+def _resolve_filter_mode(
+    *,
+    provider: Optional[str] = None,
+    station_id: Optional[str] = None,
+    devid: Optional[str] = None,
+    campus_id: Optional[int] = None,
+) -> str:
+    if station_id:
+        return "hash_id"
+    if provider and devid:
+        return "provider+devid"
+    if provider:
+        return "provider" if campus_id is None else "provider+campus"
+    if devid:
+        return "devid"
+    if campus_id is not None:
+        return "campus"
+    return "all"
+
+
+def _build_batch_response(
+    station_ids: List[str],
+    fields: Optional[Tuple[str, ...]] = None,
+    *,
+    version: Optional[str] = None,
+) -> Dict[str, Any]:
+    """从列式状态表中按 hash_id 批量取出站点，返回按 hash_id 组织的结果
+
+    数据库不可用时回退到本地快照；未命中的 id 在 stations 中为 null 并列入 not_found。
+    """
+    with logfire.span("构建批量状态响应", station_count=len(station_ids)):
+        found: Dict[str, Dict[str, Any]] = {}
+        updated_at: Optional[str] = None
+        stale = False
+
+        table = _get_status_table(version)
+        if table is not None:
+            for station in table.rows(table.select(station_ids=station_ids), fields):
+                found[station["hash_id"]] = station
+            updated_at = table.updated_at
+        elif _last_status_snapshot:
+            wanted = set(station_ids)
+            payload = _last_status_snapshot["payload"]
+            for station in payload.get("stations", []):
+                if station.get("hash_id") in wanted:
+                    found[station["hash_id"]] = (
+                        {name: station.get(name) for name in fields} if fields else station
+                    )
+            updated_at = payload.get("updated_at")
+            stale = True
+
+        response: Dict[str, Any] = {
+            "updated_at": updated_at or now_utc8_iso(),
+            "stations": {station_id: found.get(station_id) for station_id in station_ids},
+            "not_found": [station_id for station_id in station_ids if station_id not in found],
+        }
+        if stale:
+            response["stale"] = True
+        return response
 
 
 def _build_cached_response(
@@ -361,52 +579,47 @@ def _build_cached_response(
     provider: Optional[str] = None,
     station_id: Optional[str] = None,
     devid: Optional[str] = None,
+    campus_id: Optional[int] = None,
+    fields: Optional[Tuple[str, ...]] = None,
+    version: Optional[str] = None,
 ) -> Optional[Tuple[Dict[str, Any], str]]:
-    """尝试从 latest 表构建 API 响应并返回过滤模式"""
+    """尝试从列式状态表构建 API 响应并返回过滤模式"""
     with logfire.span(
         "构建 latest 缓存响应",
         provider=provider or "all",
         station_id=station_id,
         devid=devid,
+        campus_id=campus_id,
+        fields=",".join(fields) if fields else "all",
     ):
-        cached_data = load_latest_cache()
-        if not cached_data:
-            return None
-
-        rows = cached_data.get("rows")
-        if not rows:
+        table = _get_status_table(version)
+        if table is None:
             return None
 
-        if station_id:
-            rows = [row for row in rows if row.get("hash_id") == station_id]
-            if not rows:
-                return None
-
-        stations = _build_stations_from_latest_rows(
-            rows,
+        ordinals = table.select(
             provider=provider,
+            campus_id=campus_id,
             devid=devid,
+            station_ids=[station_id] if station_id else None,
         )
+        stations = table.rows(ordinals, fields)
         if not stations:
             return None
 
         response = {
-            "updated_at": cached_data.get("updated_at") or now_utc8_iso(),
+            "updated_at": table.updated_at or now_utc8_iso(),
             "stations": stations,
         }
 
-        if station_id:
-            filter_mode = "hash_id"
-        elif provider and devid:
-            filter_mode = "provider+devid"
-        elif provider:
-            filter_mode = "provider"
-        elif devid:
-            filter_mode = "devid"
-        else:
-            filter_mode = "all"
+        filter_mode = _resolve_filter_mode(
+            provider=provider, station_id=station_id, devid=devid, campus_id=campus_id
+        )
 
-        _remember_status_response(response, filter_mode, allow_stale=(filter_mode == "all"))
+        _remember_status_response(
+            response,
+            filter_mode,
+            allow_stale=(filter_mode == "all" and fields is None),
+        )
         return response, filter_mode
 
 
@@ -422,6 +635,10 @@ async def api_info(request: Request):
                 "GET /api/status": "实时查询所有站点（支持 ?provider=neptune 参数筛选，支持 ?id=xxx 查询指定站点）",
                 "GET /api/providers": "返回可用服务商列表",
                 "GET /api/stations": "返回站点基础信息（id、名称、坐标、服务商）",
+                "GET /api/status/summary": "返回全局、各校区、各服务商的空闲与总数合计",
+                "GET /api/status/ports": "返回指定站点各设备的端口级状态（?hash_id=a&hash_id=b）",
+                "GET /api/admin/devices/quarantine": "返回隔离中的设备与降级站点（需 ADMIN_TOKEN）",
+                "POST /api/admin/profile": "剖析接下来 N 轮抓取或 N 个请求（需 ADMIN_TOKEN）",
             },
         }
 
@@ -452,16 +669,27 @@ async def get_station_catalog(request: Request):
         logfire.info("收到 /api/stations 请求")
 
         try:
-            with logfire.span("查询站点基础信息表"):
-                rows = fetch_all_stations_data()
-            if not rows:
-                telemetry.set_status_code(503)
-                raise HTTPException(status_code=503, detail="站点信息不可用")
-
-            station_defs = [_format_station_definition(row) for row in rows]
-            telemetry.add_metric_attributes(station_count=len(station_defs))
-            updated_at = _max_updated_at(rows)
-            return {"updated_at": updated_at, "stations": station_defs}
+            version = fetch_stations_version()
+            entry = status_response_cache.get(version, ("stations",)) if version else None
+            telemetry.add_metric_attributes(response_cache_hit=entry is not None)
+            if entry is None:
+                with logfire.span("查询站点基础信息表"):
+                    rows = fetch_all_stations_data()
+                if not rows:
+                    telemetry.set_status_code(503)
+                    raise HTTPException(status_code=503, detail="站点信息不可用")
+
+                station_defs = [_format_station_definition(row) for row in rows]
+                updated_at = _max_updated_at(rows)
+                entry = CachedBody(
+                    encode_json({"updated_at": updated_at, "stations": station_defs}),
+                    meta={"station_count": len(station_defs)},
+                )
+                if version:
+                    status_response_cache.put(version, ("stations",), entry)
+
+            telemetry.add_metric_attributes(station_count=entry.meta["station_count"])
+            return build_encoded_response(request, entry)
         except HTTPException:
             raise
         except Exception as exc:
@@ -496,15 +724,41 @@ async def get_status(
         regex=DEVID_PATTERN,
         description="设备 ID，可为数字或包含逗号分隔的多个 ID",
     ),
+    campus_id: Optional[int] = Query(
+        None,
+        ge=0,
+        le=99,
+        description="校区 ID，只返回该校区的站点",
+    ),
+    fields: Optional[str] = Query(
+        None,
+        max_length=128,
+        pattern=FIELDS_PATTERN,
+        description="逗号分隔的返回字段（如 hash_id,free,total），hash_id 总会返回",
+    ),
+    response_format: Optional[str] = Query(
+        None,
+        alias="format",
+        pattern=FORMAT_PATTERN,
+        description="响应编码：json（默认）或 msgpack；缺省时按 Accept 头协商",
+    ),
+    layout: Optional[str] = Query(
+        None,
+        pattern=LAYOUT_PATTERN,
+        description="响应布局：rows（默认，逐站点对象）或 columnar（列式数组 + 索引）",
+    ),
 ):
     """查询所有站点状态（优先从缓存读取）
 
     Args:
         provider: 可选，服务商标识（如 'neptune'），如果指定则只返回该服务商的数据
         id: 可选，站点唯一标识，如果指定则只返回匹配的站点
+        campus_id: 可选，校区 ID，只返回该校区的站点
+        fields: 可选，逗号分隔的字段投影
+        format/layout: 可选，响应编码与布局，缺省时按 Accept 头协商
     """
     station_id = hash_id
-    has_filter = any([station_id, provider, devid])
+    has_filter = any([station_id, provider, devid, campus_id is not None])
     with ApiCallTelemetry(request, "/api/status") as telemetry:
         telemetry.add_metric_attributes(
             provider=provider or "all",
@@ -523,6 +777,47 @@ async def get_status(
             raise HTTPException(status_code=400, detail="查询 devid 时必须同时提供 provider 参数")
 
         try:
+            projected_fields = _parse_status_fields(fields)
+        except ValueError as exc:
+            telemetry.set_status_code(400)
+            raise HTTPException(status_code=400, detail=str(exc))
+        telemetry.add_metric_attributes(
+            has_campus_id=campus_id is not None,
+            has_fields=projected_fields is not None,
+        )
+
+        try:
+            fmt, resolved_layout = negotiate_format(
+                request.headers.get("accept"), response_format, layout
+            )
+        except UnsupportedFormatError as exc:
+            telemetry.set_status_code(406)
+            raise HTTPException(status_code=406, detail=str(exc))
+        telemetry.add_metric_attributes(response_format=fmt, layout=resolved_layout)
+
+        try:
+            version = _current_status_version()
+            variant = (
+                "status",
+                provider,
+                station_id,
+                devid,
+                campus_id,
+                projected_fields,
+                fmt,
+                resolved_layout,
+            )
+            entry = status_response_cache.get(version, variant) if version else None
+            if entry is not None:
+                telemetry.add_metric_attributes(
+                    cache_hit=True,
+                    response_cache_hit=True,
+                    data_source="cache",
+                    response_station_count=entry.meta["station_count"],
+                    filter_mode=entry.meta["filter_mode"],
+                )
+                return build_encoded_response(request, entry, headers=STATUS_VARY_HEADERS)
+
             with logfire.span(
                 "读取站点状态缓存",
                 provider=provider or "all",
@@ -533,21 +828,31 @@ async def get_status(
                     provider=provider,
                     station_id=station_id,
                     devid=devid,
+                    campus_id=campus_id,
+                    fields=projected_fields,
+                    version=version,
                 )
 
             if cache_result is None:
                 telemetry.add_metric_attributes(cache_hit=False)
-                if has_filter:
+                fallback = _get_fallback_status_response(
+                    provider=provider,
+                    station_id=station_id,
+                    devid=devid,
+                    campus_id=campus_id,
+                    fields=projected_fields,
+                )
+                if fallback is None and has_filter:
                     telemetry.set_status_code(404)
                     logfire.info(
-                        "过滤条件 provider={provider}, hash_id={hash_id}, devid={devid} 未命中",
+                        "过滤条件 provider={provider}, hash_id={hash_id}, devid={devid}, campus_id={campus_id} 未命中",
                         provider=provider,
                         hash_id=station_id,
                         devid=devid,
+                        campus_id=campus_id,
                     )
                     raise HTTPException(status_code=404, detail="未找到匹配站点或设备")
 
-                fallback = _get_fallback_status_response()
                 if fallback is None:
                     telemetry.set_status_code(503)
                     logfire.warn("latest 缓存无可用数据且无本地快照，返回 503")
@@ -561,15 +866,21 @@ async def get_status(
                     filter_mode=filter_mode,
                 )
                 logfire.warn(
-                    "latest 缓存缺失，使用内存快照返回 {station_count} 个站点",
+                    "latest 缓存缺失，使用本地快照返回 {station_count} 个站点",
                     station_count=station_count,
                 )
-                return response
+                body, media_type = serialize_payload(response, fmt, resolved_layout)
+                return build_encoded_response(
+                    request,
+                    CachedBody(body, media_type=media_type),
+                    headers=STATUS_VARY_HEADERS,
+                )
 
             response, filter_mode = cache_result
             station_count = len(response.get("stations", []))
             telemetry.add_metric_attributes(
                 cache_hit=True,
+                response_cache_hit=False,
                 data_source="cache",
                 response_station_count=station_count,
                 filter_mode=filter_mode,
@@ -578,7 +889,15 @@ async def get_status(
                 "使用 latest 缓存返回 {station_count} 个站点",
                 station_count=station_count,
             )
-            return response
+            body, media_type = serialize_payload(response, fmt, resolved_layout)
+            entry = CachedBody(
+                body,
+                media_type=media_type,
+                meta={"station_count": station_count, "filter_mode": filter_mode},
+            )
+            if version:
+                status_response_cache.put(version, variant, entry)
+            return build_encoded_response(request, entry, headers=STATUS_VARY_HEADERS)
         except HTTPException:
             raise
         except Exception as e:
@@ -587,6 +906,300 @@ async def get_status(
             raise HTTPException(status_code=500, detail="查询站点失败")
 
 
+HashId = Annotated[str, StringConstraints(pattern=HASH_ID_PATTERN, min_length=8, max_length=8)]
+
+
+class StatusBatchRequest(BaseModel):
+    """POST /api/status/batch 请求体"""
+
+    hash_ids: List[HashId] = Field(..., min_length=1, max_length=STATUS_BATCH_MAX_IDS)
+    fields: Optional[str] = Field(None, max_length=128, pattern=FIELDS_PATTERN)
+
+
+async def _serve_status_batch(
+    request: Request,
+    hash_ids: List[str],
+    fields: Optional[str],
+):
+    with ApiCallTelemetry(request, "/api/status/batch") as telemetry:
+        # 去重并保持请求顺序
+        station_ids = list(dict.fromkeys(station_id.lower() for station_id in hash_ids))
+        telemetry.add_metric_attributes(requested_station_count=len(station_ids))
+        logfire.info(
+            "收到 /api/status/batch 请求，共 {count} 个站点",
+            count=len(station_ids),
+        )
+
+        try:
+            projected_fields = _parse_status_fields(fields)
+        except ValueError as exc:
+            telemetry.set_status_code(400)
+            raise HTTPException(status_code=400, detail=str(exc))
+
+        try:
+            version = _current_status_version()
+            variant = ("batch", tuple(sorted(station_ids)), projected_fields)
+            entry = status_response_cache.get(version, variant) if version else None
+            telemetry.add_metric_attributes(response_cache_hit=entry is not None)
+            if entry is None:
+                response = _build_batch_response(station_ids, projected_fields, version=version)
+                entry = CachedBody(
+                    encode_json(response),
+                    meta={"not_found_count": len(response["not_found"])},
+                )
+                if version and not response.get("stale"):
+                    status_response_cache.put(version, variant, entry)
+
+            telemetry.add_metric_attributes(not_found_count=entry.meta["not_found_count"])
+            return build_encoded_response(request, entry)
+        except HTTPException:
+            raise
+        except Exception as e:
+            telemetry.set_status_code(500)
+            logfire.error("批量查询失败: {error}", error=str(e))
+            raise HTTPException(status_code=500, detail="批量查询站点失败")
+
+
+@app.get("/api/status/batch")
+@apply_rate_limit(Config.RATE_LIMIT_STATUS)
+async def get_status_batch(
+    request: Request,
+    hash_id: Annotated[
+        List[HashId],
+        Query(
+            min_length=1,
+            max_length=STATUS_BATCH_MAX_IDS,
+            description="站点唯一标识，可重复传入多个（如 ?hash_id=a&hash_id=b）",
+        ),
+    ],
+    fields: Optional[str] = Query(
+        None,
+        max_length=128,
+        pattern=FIELDS_PATTERN,
+        description="逗号分隔的返回字段（如 hash_id,free,total），hash_id 总会返回",
+    ),
+):
+    """批量查询多个站点状态：一次请求、一次索引查询、一次限流计数"""
+    return await _serve_status_batch(request, hash_id, fields)
+
+
+@app.post("/api/status/batch")
+@apply_rate_limit(Config.RATE_LIMIT_STATUS)
+async def post_status_batch(request: Request, body: StatusBatchRequest):
+    """批量查询多个站点状态（请求体形式，适合较长的关注列表）"""
+    return await _serve_status_batch(request, body.hash_ids, body.fields)
+
+
+def _build_port_states_response(station_ids: List[str]) -> Dict[str, Any]:
+    """按设备展开 latest.port_states，端口状态以字符串表示（每个端口一个数字）"""
+    with logfire.span("查询端口级状态", station_count=len(station_ids)):
+        port_rows = load_latest_port_states(station_ids)
+        metadata = fetch_station_metadata(station_ids=station_ids, columns=["device_ids"])
+
+    stations: List[Dict[str, Any]] = []
+    not_found: List[str] = []
+    for station_id in station_ids:
+        row = port_rows.get(station_id)
+        if row is None:
+            not_found.append(station_id)
+            continue
+        device_ids = _normalize_device_ids((metadata.get(station_id) or {}).get("device_ids"))
+        devices = decode_station_ports(row.get("port_states"))
+        stations.append(
+            {
+                "hash_id": station_id,
+                "snapshot_time": row.get("snapshot_time"),
+                # 未采集端口数据的站点（服务商不提供明细或功能关闭）返回 null
+                "devices": (
+                    [
+                        {
+                            "device_id": device_ids[index] if index < len(device_ids) else None,
+                            "ports": states_to_string(states),
+                        }
+                        for index, states in enumerate(devices)
+                    ]
+                    if row.get("port_states") is not None
+                    else None
+                ),
+            }
+        )
+
+    timestamps = [station["snapshot_time"] for station in stations if station["snapshot_time"]]
+    return {
+        "updated_at": max(timestamps) if timestamps else now_utc8_iso(),
+        "legend": {str(state): name for state, name in STATE_NAMES.items()},
+        "stations": stations,
+        "not_found": not_found,
+    }
+
+
+@app.get("/api/status/ports")
+@apply_rate_limit(Config.RATE_LIMIT_STATUS)
+async def get_status_ports(
+    request: Request,
+    hash_id: Annotated[
+        List[HashId],
+        Query(
+            min_length=1,
+            max_length=STATUS_BATCH_MAX_IDS,
+            description="站点唯一标识，可重复传入多个（如 ?hash_id=a&hash_id=b）",
+        ),
+    ],
+):
+    """查询站点下各设备的端口级状态（0 空闲、1 占用、2 故障、3 未知）"""
+    with ApiCallTelemetry(request, "/api/status/ports") as telemetry:
+        station_ids = list(dict.fromkeys(station_id.lower() for station_id in hash_id))
+        telemetry.add_metric_attributes(requested_station_count=len(station_ids))
+        logfire.info(
+            "收到 /api/status/ports 请求，共 {count} 个站点",
+            count=len(station_ids),
+        )
+
+        if not Config.PORT_STATES_ENABLED:
+            telemetry.set_status_code(404)
+            raise HTTPException(status_code=404, detail="端口级状态未启用")
+
+        try:
+            version = _current_status_version()
+            variant = ("ports", tuple(sorted(station_ids)))
+            entry = status_response_cache.get(version, variant) if version else None
+            telemetry.add_metric_attributes(response_cache_hit=entry is not None)
+            if entry is None:
+                response = _build_port_states_response(station_ids)
+                entry = CachedBody(
+                    encode_json(response),
+                    meta={"not_found_count": len(response["not_found"])},
+                )
+                if version:
+                    status_response_cache.put(version, variant, entry)
+
+            telemetry.add_metric_attributes(not_found_count=entry.meta["not_found_count"])
+            return build_encoded_response(request, entry)
+        except HTTPException:
+            raise
+        except Exception as e:
+            telemetry.set_status_code(500)
+            logfire.error("查询端口级状态失败: {error}", error=str(e))
+            raise HTTPException(status_code=500, detail="查询端口级状态失败")
+
+
+@app.get("/api/status/summary")
+@apply_rate_limit(Config.RATE_LIMIT_STATUS)
+async def get_status_summary(request: Request):
+    """全局、各校区、各服务商的空闲 / 占用 / 总数 / 故障合计"""
+    with ApiCallTelemetry(request, "/api/status/summary") as telemetry:
+        logfire.info("收到 /api/status/summary 请求")
+        try:
+            version = _current_status_version()
+            entry = status_response_cache.get(version, ("summary",)) if version else None
+            telemetry.add_metric_attributes(response_cache_hit=entry is not None)
+            if entry is None:
+                table = _get_status_table(version)
+                if table is None:
+                    telemetry.set_status_code(503)
+                    raise HTTPException(status_code=503, detail="站点状态暂不可用")
+
+                campus_names = {
+                    campus_id: name
+                    for campus_id, name in zip(table.catalog.campus_ids, table.catalog.campus_names)
+                    if name
+                }
+                response = {
+                    "updated_at": table.updated_at or now_utc8_iso(),
+                    "totals": table.totals(),
+                    "campuses": [
+                        {
+                            "campus_id": campus_id,
+                            "campus_name": campus_names.get(campus_id),
+                            **totals,
+                        }
+                        for campus_id, totals in sorted(table.campus_totals().items())
+                    ],
+                    "providers": [
+                        {"provider": provider, **totals}
+                        for provider, totals in sorted(table.provider_totals().items())
+                    ],
+                }
+                entry = CachedBody(encode_json(response))
+                if version:
+                    status_response_cache.put(version, ("summary",), entry)
+            return build_encoded_response(request, entry)
+        except HTTPException:
+            raise
+        except Exception as e:
+            telemetry.set_status_code(500)
+            logfire.error("查询站点汇总失败: {error}", error=str(e))
+            raise HTTPException(status_code=500, detail="查询站点汇总失败")
+
+
+def _require_admin(request: Request, telemetry: ApiCallTelemetry) -> None:
+    """校验管理令牌：未配置 ADMIN_TOKEN 时管理接口视为不存在"""
+    if not Config.ADMIN_TOKEN:
+        telemetry.set_status_code(404)
+        raise HTTPException(status_code=404, detail="Not Found")
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(
+        token.strip().encode(), Config.ADMIN_TOKEN.encode()
+    ):
+        telemetry.set_status_code(401)
+        raise HTTPException(
+            status_code=401,
+            detail="管理令牌无效",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@app.get("/api/admin/devices/quarantine")
+@apply_rate_limit(Config.RATE_LIMIT_DEFAULT)
+async def get_device_quarantine(request: Request):
+    """隔离中的设备、重新探测时间与降级站点（由抓取进程每轮写入状态文件）"""
+    with ApiCallTelemetry(request, "/api/admin/devices/quarantine") as telemetry:
+        _require_admin(request, telemetry)
+        document = load_health_state()
+        if document is None:
+            telemetry.set_status_code(503)
+            raise HTTPException(status_code=503, detail="设备健康状态暂不可用")
+        snapshot = document.get("snapshot", {})
+        telemetry.add_metric_attributes(quarantined_count=snapshot.get("quarantined_count", 0))
+        return {"updated_at": document.get("written_at"), **snapshot}
+
+
+class ProfileRequest(BaseModel):
+    """POST /api/admin/profile 请求体"""
+
+    target: str = Field(..., pattern=r"^(fetch|requests)$")
+    count: int = Field(1, ge=1, le=100)
+    tracemalloc: bool = False
+
+
+@app.get("/api/admin/profile")
+@apply_rate_limit(Config.RATE_LIMIT_DEFAULT)
+async def get_profile_status(request: Request):
+    """剖析状态与输出目录中最近的剖析文件"""
+    with ApiCallTelemetry(request, "/api/admin/profile") as telemetry:
+        _require_admin(request, telemetry)
+        return profiling_controller.status()
+
+
+@app.post("/api/admin/profile")
+@apply_rate_limit(Config.RATE_LIMIT_DEFAULT)
+async def start_profile(request: Request, body: ProfileRequest):
+    """剖析接下来 N 轮抓取（tracemalloc 可选）或本 worker 接下来的 N 个 API 请求"""
+    with ApiCallTelemetry(request, "/api/admin/profile") as telemetry:
+        _require_admin(request, telemetry)
+        if body.target == "requests":
+            profiling_controller.arm_requests(body.count)
+        else:
+            profiling_controller.request_fetch_profile(body.count, body.tracemalloc)
+        logfire.info(
+            "已请求剖析 {target}，次数 {count}",
+            target=body.target,
+            count=body.count,
+        )
+        return {"target": body.target, "count": body.count, **profiling_controller.status()}
+
+
 if __name__ == "__main__":
     import uvicorn
 
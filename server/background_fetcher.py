@@ -4,15 +4,23 @@ import asyncio
 import json
 import threading
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 import logfire
 
+from fetcher.device_health import get_device_health_tracker
+from fetcher.metrics import get_fetch_metrics
 from fetcher.provider_manager import ProviderManager
-from fetcher.station import Station, StationUsage
+from fetcher.station import Station, StationRegistry
+from fetcher.status_table import StationCatalog, StatusTable
 from server.config import Config
 from server.logfire_setup import ensure_logfire_configured
-from db import batch_upsert_stations, record_usage_data
+from server.profiling import get_profiling_controller
+from server.status_snapshot import write_status_snapshot
+from server.static_publisher import publish_static_snapshots
+from server.fetch_coordination import notify_cycle_complete
+from server.shared_status import SharedStatusWriter
+from db import batch_upsert_stations, delete_stations, record_usage_data
 
 ensure_logfire_configured()
 
@@ -28,6 +36,14 @@ class BackgroundFetcher:
     def __init__(self) -> None:
         self._manager = ProviderManager()
         self._thread: Optional[threading.Thread] = None
+        self._shared_status = SharedStatusWriter() if Config.SHARED_STATUS_ENABLED else None
+        # 跨轮复用的站点实例，元数据未变化时只更新计数
+        self._registry = StationRegistry()
+        # 跨轮复用的站点目录与上一轮状态表，用于计算每轮的计数变化
+        self._catalog = StationCatalog()
+        self._last_table: Optional[StatusTable] = None
+        # 本轮站点数据新鲜度汇总，写入抓取指标
+        self._cycle_freshness: Optional[Dict[str, float]] = None
 
     def start(self) -> None:
         if self._thread and self._thread.is_alive():
@@ -42,6 +58,10 @@ class BackgroundFetcher:
         self._thread.start()
         logfire.info("后台抓取线程启动成功")
 
+    def run_forever(self) -> None:
+        """在当前线程阻塞运行抓取循环（独立抓取进程使用）"""
+        self._run()
+
     def _run(self) -> None:
         asyncio.run(self._loop())
 
@@ -108,19 +128,39 @@ class BackgroundFetcher:
                 await asyncio.sleep(60)
 
     async def _run_fetch_cycle(self, reason_label: str) -> None:
+        """执行一轮抓取，并记录整轮耗时等抓取指标（失败的轮次同样计入）"""
+        metrics = get_fetch_metrics()
+        metrics.begin_cycle()
+        self._cycle_freshness = None
+        try:
+            with get_profiling_controller().profile_fetch_cycle(reason_label):
+                await self._fetch_and_record(reason_label)
+        finally:
+            summary = metrics.end_cycle(reason_label, self._cycle_freshness)
+            if Config.FETCH_METRICS_EXPORT:
+                metrics.export(summary)
+
+    async def _fetch_and_record(self, reason_label: str) -> None:
         history_enabled = Config.HISTORY_ENABLED
         with logfire.span(
             "执行抓取与写入流程",
             reason=reason_label,
             history_enabled=history_enabled,
         ):
+            if Config.STATION_CATALOG_HOT_RELOAD:
+                self._apply_catalog_reload(reason_label)
+
+            health = get_device_health_tracker()
+            health.begin_cycle()
             result = await self._manager.fetch_and_format()
+            self._persist_device_health(reason_label)
 
             if result is None:
                 logfire.error("{reason_label}数据失败：返回 None", reason_label=reason_label)
                 return
 
             stations = result.get("stations", [])
+            self._cycle_freshness = get_fetch_metrics().record_station_freshness(stations)
             logfire.info(
                 "{reason_label}实时抓取成功，共 {station_count} 个站点",
                 reason_label=reason_label,
@@ -137,7 +177,7 @@ class BackgroundFetcher:
                     ):
                         if batch_upsert_stations(station_models):
                             logfire.info(
-                                "{reason_label}数据已同步站点基础信息，共 {count} 条",
+                                "{reason_label}数据已同步变化的站点基础信息，共 {count} 条",
                                 reason_label=reason_label,
                                 count=len(station_models),
                             )
@@ -146,12 +186,14 @@ class BackgroundFetcher:
                                 "{reason_label}数据同步站点基础信息失败",
                                 reason_label=reason_label,
                             )
+                            self._forget_stations(station_models)
                 except Exception as exc:  # pragma: no cover - defensive logging
                     logfire.error(
                         "{reason_label}同步站点信息发生异常: {error}",
                         reason_label=reason_label,
                         error=str(exc),
                     )
+                    self._forget_stations(station_models)
 
             snapshot_time = result.get("updated_at", _now_utc8_iso())
             if not snapshot_time:
@@ -164,7 +206,11 @@ class BackgroundFetcher:
                 station_count=len(stations),
                 history_enabled=history_enabled,
             ):
-                if record_usage_data(result, history_mode_enabled=history_enabled):
+                if record_usage_data(
+                    result,
+                    history_mode_enabled=history_enabled,
+                    port_states_enabled=Config.PORT_STATES_ENABLED,
+                ):
                     logfire.info(
                         "{reason_label}数据成功写入数据库（history={history_enabled}），共 {station_count} 个站点",
                         reason_label=reason_label,
@@ -177,7 +223,111 @@ class BackgroundFetcher:
                         reason_label=reason_label,
                     )
 
-    def _station_dict_to_model(self, station: Dict[str, Any]) -> Optional[Station]:
+            table = StatusTable.from_stations(stations, self._catalog, snapshot_time)
+            changed = table.diff(self._last_table)
+            self._last_table = table
+            logfire.info(
+                "{reason_label}共 {changed_count}/{station_count} 个站点计数发生变化",
+                reason_label=reason_label,
+                changed_count=len(changed),
+                station_count=len(table),
+            )
+
+            # 无论数据库写入是否成功都刷新快照文件，数据库不可用时 API 仍可兜底
+            self._persist_status_snapshot(table, reason_label)
+
+            if self._shared_status is not None and len(table):
+                with logfire.span("写入共享状态表", reason=reason_label):
+                    self._shared_status.publish(table.count_rows(), snapshot_time)
+
+            # 通知各 API worker 新周期已完成
+            notify_cycle_complete(
+                {
+                    "reason": reason_label,
+                    "updated_at": snapshot_time,
+                    "station_count": len(stations),
+                }
+            )
+
+    def _persist_device_health(self, reason_label: str) -> None:
+        """记录本轮隔离情况并写入设备健康状态文件（供管理接口读取）"""
+        health = get_device_health_tracker()
+        stations = [
+            station for provider in self._manager.providers for station in provider.station_list
+        ]
+        health.save(stations)
+        quarantined_devices = health.quarantined_devices()
+        per_provider: Dict[str, int] = {}
+        for provider, _device_id in quarantined_devices:
+            per_provider[provider] = per_provider.get(provider, 0) + 1
+        get_fetch_metrics().record_quarantined(per_provider)
+        quarantined = len(quarantined_devices)
+        if quarantined or health.skipped:
+            logfire.info(
+                "{reason_label}设备隔离：{quarantined} 个设备隔离中，本轮跳过 {skipped} 次请求",
+                reason_label=reason_label,
+                quarantined=quarantined,
+                skipped=health.skipped,
+            )
+
+    def _apply_catalog_reload(self, reason_label: str) -> None:
+        """站点 CSV 变化时热重载目录，并把新增 / 变化 / 删除的站点同步到 stations 表"""
+        try:
+            diff = self._manager.reload_catalog()
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logfire.error("热重载站点目录失败: {error}", error=str(exc))
+            return
+        if not diff:
+            return
+
+        with logfire.span("同步热重载的站点目录", reason=reason_label, **diff.counts()):
+            upserts = [
+                station
+                for stations in (*diff.added.values(), *diff.changed.values())
+                for station in stations
+            ]
+            if upserts and not batch_upsert_stations(upserts):
+                logfire.error("热重载后写入新增或变化的站点失败")
+
+            # 站点在 CSV 文件之间移动时会同时出现在新增与删除中，不应删除
+            kept = {station.hash_id for station in upserts}
+            removed = [
+                hash_id for ids in diff.removed.values() for hash_id in ids if hash_id not in kept
+            ]
+            if removed:
+                for hash_id in removed:
+                    self._registry.remove(hash_id)
+                if not delete_stations(removed):
+                    logfire.error("热重载后删除站点失败")
+                if self._shared_status is not None:
+                    self._shared_status.remove(removed)
+
+    def _persist_status_snapshot(self, table: StatusTable, reason_label: str) -> None:
+        if not len(table):
+            return
+
+        payload = table.to_payload()
+        with logfire.span("写入状态快照文件", reason=reason_label):
+            version = write_status_snapshot(payload)
+            if version is not None:
+                logfire.info(
+                    "{reason_label}状态快照文件已更新，版本 {version}",
+                    reason_label=reason_label,
+                    version=version,
+                )
+
+        if Config.STATIC_SNAPSHOT_ENABLED:
+            with logfire.span("发布静态快照文件", reason=reason_label):
+                release_dir = publish_static_snapshots(payload, version=version)
+                if release_dir is not None:
+                    logfire.info(
+                        "{reason_label}静态快照已发布: {release_dir}",
+                        reason_label=reason_label,
+                        release_dir=str(release_dir),
+                    )
+
+    def _station_dict_to_model(self, station: Dict[str, Any]) -> Optional[Tuple[Station, bool]]:
+        """把站点字典登记到常驻 registry，返回 (站点实例, 元数据是否变化)"""
         provider = station.get("provider")
         if not provider:
             logfire.debug("站点数据缺少 provider，跳过: {station}", station=station)
@@ -191,47 +341,62 @@ class BackgroundFetcher:
             or "未知站点"
         )
 
-        campus_id = self._coerce_int(station.get("campus_id"))
-        device_ids = self._normalize_device_ids(station.get("device_ids") or station.get("devids"))
-        updated_at = (
-            station.get("updated_at")
-            or station.get("snapshot_time")
-            or station.get("updatedAt")
-            or _now_utc8_iso()
-        )
-
         try:
-            station_model = Station(
+            hash_id = station.get("hash_id") or station.get("id")
+            if not hash_id:
+                hash_id = Station(name=name, provider=provider, campus_id=0).hash_id
+
+            campus_id = self._coerce_int(station.get("campus_id"))
+            raw_device_ids = station.get("device_ids") or station.get("devids")
+            existing = self._registry.get(hash_id)
+            if existing is not None and raw_device_ids == existing.device_ids:
+                # 设备列表未变化（常见情况）时跳过规范化，直接复用已有列表
+                device_ids = existing.device_ids
+            else:
+                device_ids = self._normalize_device_ids(raw_device_ids)
+            updated_at = (
+                station.get("updated_at")
+                or station.get("snapshot_time")
+                or station.get("updatedAt")
+                or _now_utc8_iso()
+            )
+
+            station_model, changed = self._registry.upsert(
+                hash_id,
                 name=name,
                 provider=provider,
                 campus_id=campus_id,
+                campus_name=station.get("campus_name", ""),
                 lat=self._coerce_float(station.get("lat")),
                 lon=self._coerce_float(station.get("lon")),
                 device_ids=device_ids,
-                campus_name=station.get("campus_name", ""),
                 updated_at=updated_at,
             )
-            station_model.usage = StationUsage(
+            StationRegistry.set_usage(
+                station_model,
                 free=self._coerce_int(station.get("free")),
                 used=self._coerce_int(station.get("used")),
                 total=self._coerce_int(station.get("total")),
                 error=self._coerce_int(station.get("error")),
             )
-            provided_hash_id = station.get("hash_id") or station.get("id")
-            if provided_hash_id:
-                station_model.hash_id = provided_hash_id
-            return station_model
+            return station_model, changed
         except Exception as exc:  # pragma: no cover - defensive logging
             logfire.debug("构建 Station 模型失败: {error}", error=str(exc))
             return None
 
     def _station_models_from_result(self, stations: List[Dict[str, Any]]) -> List[Station]:
-        models = []
+        """返回元数据新增或变化的站点；未变化的站点只在 registry 中更新计数"""
+        changed_models = []
+        for station in stations:
+            entry = self._station_dict_to_model(station)
+            if entry is not None and entry[1]:
+                changed_models.append(entry[0])
+        return changed_models
+
+    def _forget_stations(self, stations: List[Station]) -> None:
+        """写库失败时移出 registry，下一轮会重新视为变化站点再次同步"""
         for station in stations:
-            model = self._station_dict_to_model(station)
-            if model:
-                models.append(model)
-        return models
+            self._registry.remove(station.hash_id)
 
     @staticmethod
     def _coerce_int(value: Any, default: int = 0) -> int:
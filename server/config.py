@@ -19,6 +19,61 @@ class Config:
         os.getenv("BACKEND_FETCH_INTERVAL", "300")
     )  # 后端定时抓取间隔（秒），默认300秒（5分钟）
 
+    # 后台抓取运行方式
+    # - thread：在 run_server 进程内以线程运行（默认，单 worker 部署）
+    # - process：由 run_server 启动独立的抓取子进程并在异常退出后自动重启
+    # - leader：每个 API worker 通过文件锁竞选，只有 leader 运行抓取
+    # - none：API 不运行抓取，由 python -m server.fetch_coordination 单独部署
+    FETCHER_MODE = os.getenv("FETCHER_MODE", "thread").lower()
+    # uvicorn worker 数量，大于 1 时建议配合 FETCHER_MODE=process 或 leader
+    API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+    # leader 选举锁文件，留空则使用默认路径：项目根目录/data/fetcher.lock
+    FETCHER_LOCK_PATH = os.getenv("FETCHER_LOCK_PATH", "")
+    # 抓取周期通知文件，留空则使用默认路径：项目根目录/data/fetch_cycle.json
+    FETCH_NOTIFY_PATH = os.getenv("FETCH_NOTIFY_PATH", "")
+
+    # 启用的服务商（逗号分隔的服务商键，如 neptune,dlmm），留空或 * 表示全部启用
+    # 内置：neptune、neptune_junior、dlmm、else；第三方服务商通过 entry point 组 zju_charger.providers 注册
+    ENABLED_PROVIDERS = os.getenv("ENABLED_PROVIDERS", "")
+
+    # 站点目录编译缓存，留空则使用默认路径：项目根目录/data/station_catalog.bin
+    STATION_CATALOG_CACHE_PATH = os.getenv("STATION_CATALOG_CACHE_PATH", "")
+    # 每轮抓取前检查 fetcher/providers/data/*.csv 是否变化，变化时热重载站点目录
+    STATION_CATALOG_HOT_RELOAD = os.getenv("STATION_CATALOG_HOT_RELOAD", "true").lower() == "true"
+
+    # 设备隔离：连续失败的设备跳过抓取，按指数增长的间隔重新探测
+    DEVICE_QUARANTINE_ENABLED = os.getenv("DEVICE_QUARANTINE_ENABLED", "true").lower() == "true"
+    # 连续失败多少次后进入隔离
+    DEVICE_QUARANTINE_FAILURES = int(os.getenv("DEVICE_QUARANTINE_FAILURES", "3"))
+    # 首次重新探测间隔（秒），之后每次探测失败翻倍，直到上限
+    DEVICE_QUARANTINE_BASE_SECONDS = int(os.getenv("DEVICE_QUARANTINE_BASE_SECONDS", "900"))
+    DEVICE_QUARANTINE_MAX_SECONDS = int(os.getenv("DEVICE_QUARANTINE_MAX_SECONDS", "86400"))
+    # 设备健康状态文件，留空则使用默认路径：项目根目录/data/device_health.json
+    DEVICE_HEALTH_STATE_PATH = os.getenv("DEVICE_HEALTH_STATE_PATH", "")
+
+    # 抓取指标本地导出：每轮把各上游主机 / 服务商 / 设备耗时汇总写入 JSON 文件
+    FETCH_METRICS_EXPORT = os.getenv("FETCH_METRICS_EXPORT", "true").lower() == "true"
+    # 留空则使用默认路径：项目根目录/data/fetch_metrics.json
+    FETCH_METRICS_PATH = os.getenv("FETCH_METRICS_PATH", "")
+
+    # 按需性能剖析：启动后对接下来 N 轮抓取 / N 个 API 请求采样（0 表示不剖析，也可通过管理接口触发）
+    PROFILE_FETCH_CYCLES = int(os.getenv("PROFILE_FETCH_CYCLES", "0"))
+    PROFILE_REQUESTS = int(os.getenv("PROFILE_REQUESTS", "0"))
+    # 采样间隔（毫秒）
+    PROFILE_SAMPLE_INTERVAL_MS = int(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+    # 剖析抓取时是否同时记录 tracemalloc 快照
+    PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "false").lower() == "true"
+    # 剖析输出目录，留空则使用默认路径：项目根目录/data/profiles
+    PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+
+    # 上游录制：设置目录后把每个上游请求 / 响应对写入夹具（按上游主机分子目录），用于离线重放
+    UPSTREAM_RECORD_DIR = os.getenv("UPSTREAM_RECORD_DIR", "")
+    # 上游重定向：设置后所有服务商请求改发到该地址（如 python -m fetcher.mock_upstream 启动的模拟服务）
+    UPSTREAM_OVERRIDE_URL = os.getenv("UPSTREAM_OVERRIDE_URL", "")
+
+    # 管理接口令牌（请求头 Authorization: Bearer <token>），留空则关闭 /api/admin/* 接口
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
     # 限流配置
     RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
     RATE_LIMIT_DEFAULT = os.getenv(
@@ -27,6 +82,13 @@ class Config:
     RATE_LIMIT_STATUS = os.getenv(
         "RATE_LIMIT_STATUS", "3/minute"
     )  # /api/status 端点限流规则，允许前端60秒刷新+容错
+    # 令牌桶存储：memory://（单进程）、sqlite://[path]（多 worker 共享，默认 data/rate_limit.db）、
+    # redis://host:port/db（需安装 redis）
+    RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "sqlite://")
+    # 可信反向代理（逗号分隔 IP/CIDR），仅信任其转发的 X-Forwarded-For / X-Real-IP
+    RATE_LIMIT_TRUSTED_PROXIES = os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.1,::1")
+    # 不受限流的客户端（逗号分隔 IP/CIDR），例如校内监控或前端 SSR 服务器
+    RATE_LIMIT_WHITELIST = os.getenv("RATE_LIMIT_WHITELIST", "")
 
     # SQLite 数据库配置
     # 留空则使用默认路径：项目根目录/data/charger.db
@@ -34,6 +96,28 @@ class Config:
     # 是否启用历史记录模式（usage 表记录）
     # 关闭后只维护 latest 缓存表，可减少数据库大小
     HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "true").lower() == "true"
+    # 是否记录端口级状态（latest / usage 表的 port_states 列，每设备每次采样几个字节）
+    PORT_STATES_ENABLED = os.getenv("PORT_STATES_ENABLED", "true").lower() == "true"
+    # 慢查询阈值（毫秒）：超过时记录规范化 SQL、参数个数、行数与 EXPLAIN QUERY PLAN，0 关闭慢查询日志
+    # 每条语句的耗时总会写入 db.query.duration 直方图
+    DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "100"))
+
+    # 状态快照文件配置
+    # 后台抓取成功后原子写入，API 启动时优先加载，用于冷启动与数据库故障兜底
+    # 留空则使用默认路径：项目根目录/data/status_snapshot.json
+    STATUS_SNAPSHOT_PATH = os.getenv("STATUS_SNAPSHOT_PATH", "")
+
+    # 共享内存状态表配置：抓取进程每轮写入，各 API worker 通过 mmap 读取站点计数
+    SHARED_STATUS_ENABLED = os.getenv("SHARED_STATUS_ENABLED", "true").lower() == "true"
+    # 留空则使用默认路径：项目根目录/data/status_table.bin；可设为 /dev/shm 下的路径以完全避免磁盘回写
+    SHARED_STATUS_PATH = os.getenv("SHARED_STATUS_PATH", "")
+
+    # 静态快照发布配置（供 Caddy 直接托管预压缩 JSON）
+    STATIC_SNAPSHOT_ENABLED = os.getenv("STATIC_SNAPSHOT_ENABLED", "true").lower() == "true"
+    # 留空则使用默认路径：项目根目录/data/static
+    STATIC_SNAPSHOT_DIR = os.getenv("STATIC_SNAPSHOT_DIR", "")
+    # 保留的历史 release 目录数量（含当前版本）
+    STATIC_SNAPSHOT_KEEP = int(os.getenv("STATIC_SNAPSHOT_KEEP", "3"))
 
     # 服务商配置
     # 格式：PROVIDER_<PROVIDER_ID>_<CONFIG_KEY>=<value>
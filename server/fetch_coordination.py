@@ -0,0 +1,319 @@
+"""后台抓取与 API worker 之间的协调
+
+- 抓取进程：FetcherSupervisor 在独立子进程中运行 BackgroundFetcher，异常退出后按指数退避重启；
+- leader 选举：多个 API worker 通过 flock 竞争 FETCHER_LOCK_PATH，只有持锁者运行抓取，
+  持锁 worker 退出后由内核释放锁，其余 worker 自动接替；
+- 周期通知：抓取每轮结束后原子改写 FETCH_NOTIFY_PATH，API worker 通过 stat 感知新周期，
+  据此失效响应缓存，无需在每个请求上查询数据库版本。
+"""
+
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import logfire
+
+from server.config import Config
+from server.logfire_setup import ensure_logfire_configured
+
+try:  # flock 仅在 POSIX 平台可用
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+ensure_logfire_configured()
+
+FETCHER_MODE_THREAD = "thread"
+FETCHER_MODE_PROCESS = "process"
+FETCHER_MODE_LEADER = "leader"
+FETCHER_MODE_NONE = "none"
+FETCHER_MODES = (
+    FETCHER_MODE_THREAD,
+    FETCHER_MODE_PROCESS,
+    FETCHER_MODE_LEADER,
+    FETCHER_MODE_NONE,
+)
+
+# 通知文件存在时，数据库版本最多缓存这么久（兜底外部写库等未发通知的情况）
+VERSION_MAX_AGE_SECONDS = 30.0
+
+
+def _data_dir() -> Path:
+    return Path(__file__).parent.parent / "data"
+
+
+def get_cycle_notify_path() -> Path:
+    """获取抓取周期通知文件路径（默认位于项目根目录/data 下）"""
+    if Config.FETCH_NOTIFY_PATH:
+        return Path(Config.FETCH_NOTIFY_PATH)
+    return _data_dir() / "fetch_cycle.json"
+
+
+def get_fetcher_lock_path() -> Path:
+    """获取 leader 选举锁文件路径（默认位于项目根目录/data 下）"""
+    if Config.FETCHER_LOCK_PATH:
+        return Path(Config.FETCHER_LOCK_PATH)
+    return _data_dir() / "fetcher.lock"
+
+
+# --- 周期通知 ---
+
+
+def notify_cycle_complete(info: Dict[str, Any], path: Optional[Path] = None) -> bool:
+    """抓取周期结束后原子改写通知文件，API worker 据此感知新数据"""
+    target = path or get_cycle_notify_path()
+    document = dict(info)
+    document.setdefault("finished_at", time.time())
+    document.setdefault("pid", os.getpid())
+
+    tmp_name: Optional[str] = None
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=target.parent,
+            prefix=f".{target.name}.",
+            suffix=".tmp",
+            delete=False,
+        ) as fp:
+            tmp_name = fp.name
+            json.dump(document, fp, ensure_ascii=False)
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, target)
+        tmp_name = None
+        return True
+    except Exception as exc:
+        logfire.error("写入抓取周期通知文件失败: {error}", error=str(exc), path=str(target))
+        return False
+    finally:
+        if tmp_name:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+
+
+class CycleWatcher:
+    """通过 stat 轮询通知文件感知新的抓取周期
+
+    每个 worker 至多每 poll_interval 秒 stat 一次通知文件；文件被替换（inode/mtime 变化）
+    即视为新周期。数据版本在两次通知之间缓存，通知文件不存在时退化为每次查询。
+    """
+
+    def __init__(self, path: Path, poll_interval: float = 1.0) -> None:
+        self._path = path
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._initialized = False
+        self._checked_at = 0.0
+        self._version: Optional[str] = None
+        self._version_loaded_at = 0.0
+
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self._path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def poll(self) -> bool:
+        """检查通知文件，发现新周期时返回 True（同一周期只返回一次）"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self._poll_interval:
+                return False
+            self._checked_at = now
+            signature = self._stat()
+            if self._initialized and signature == self._signature:
+                return False
+            first_check = not self._initialized
+            self._initialized = True
+            self._signature = signature
+            self._version = None
+            return signature is not None and not first_check
+
+    def version(self, loader: Callable[[], Optional[str]]) -> Optional[str]:
+        """返回当前数据版本，仅在新周期或缓存过期时调用 loader 重新查询"""
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._signature is not None
+                and self._version is not None
+                and now - self._version_loaded_at < VERSION_MAX_AGE_SECONDS
+            ):
+                return self._version
+
+        version = loader()
+        with self._lock:
+            if self._signature is not None:
+                self._version = version
+                self._version_loaded_at = now
+        return version
+
+
+# --- leader 选举 ---
+
+
+class LeaderLock:
+    """基于 flock 的进程间互斥锁，持锁进程退出时由内核自动释放"""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self._path = path or get_fetcher_lock_path()
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            logfire.warn("当前平台不支持 flock，leader 选举退化为始终成功")
+            self._fd = -1
+            return True
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self._path, os.O_RDWR | os.O_CREAT, 0o644)
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, flags)
+        except OSError:
+            os.close(fd)
+            return False
+
+        # 写入持锁进程号，便于排查
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        if self._fd >= 0 and fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self._fd = None
+
+
+def start_leader_election(on_elected: Callable[[], None]) -> LeaderLock:
+    """在后台线程中阻塞等待 leader 锁，当选后调用 on_elected
+
+    当前 leader 退出后锁被释放，某个等待中的 worker 会立即接替。
+    """
+    lock = LeaderLock()
+
+    def _campaign() -> None:
+        if not lock.acquire(blocking=False):
+            logfire.info("已有其他 worker 负责后台抓取，当前 worker 等待接替")
+            lock.acquire(blocking=True)
+        logfire.info("当前 worker 当选抓取 leader（pid={pid}）", pid=os.getpid())
+        on_elected()
+
+    threading.Thread(target=_campaign, name="fetcher-leader-election", daemon=True).start()
+    return lock
+
+
+# --- 独立抓取进程 ---
+
+
+def _watch_parent(parent_pid: int) -> None:
+    """父进程被强制结束时（无法执行清理）子进程自行退出，避免孤儿抓取进程"""
+    while True:
+        time.sleep(5)
+        if os.getppid() != parent_pid:
+            os._exit(0)
+
+
+def run_fetcher_process(parent_pid: Optional[int] = None) -> int:
+    """抓取进程入口：初始化数据库后阻塞运行 BackgroundFetcher"""
+    from db import initialize_db_config
+    from server.background_fetcher import BackgroundFetcher
+
+    if parent_pid is not None:
+        threading.Thread(target=_watch_parent, args=(parent_pid,), daemon=True).start()
+
+    db_path = Config.SQLITE_DB_PATH if Config.SQLITE_DB_PATH else None
+    if not initialize_db_config(db_path):
+        logfire.error("抓取进程初始化数据库失败")
+        return 1
+
+    logfire.info("抓取进程已启动（pid={pid}）", pid=os.getpid())
+    BackgroundFetcher().run_forever()
+    return 0
+
+
+class FetcherSupervisor:
+    """在独立子进程中运行抓取任务，异常退出后按指数退避重启"""
+
+    def __init__(self, max_backoff: float = 60.0) -> None:
+        self._ctx = multiprocessing.get_context("spawn")
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._monitor: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._max_backoff = max_backoff
+
+    def _spawn(self) -> None:
+        self._process = self._ctx.Process(
+            target=run_fetcher_process,
+            args=(os.getpid(),),
+            name="zju-charger-fetcher",
+            daemon=True,
+        )
+        self._process.start()
+        logfire.info("抓取子进程已启动（pid={pid}）", pid=self._process.pid)
+
+    def start(self) -> None:
+        if self._monitor and self._monitor.is_alive():
+            logfire.info("抓取子进程已在运行，跳过重复启动")
+            return
+        self._stopping.clear()
+        self._spawn()
+        self._monitor = threading.Thread(
+            target=self._supervise, name="fetcher-supervisor", daemon=True
+        )
+        self._monitor.start()
+
+    def _supervise(self) -> None:
+        backoff = 1.0
+        while not self._stopping.is_set():
+            started_at = time.monotonic()
+            assert self._process is not None
+            self._process.join()
+            if self._stopping.is_set():
+                break
+
+            # 稳定运行一段时间后再退出视为偶发故障，重置退避
+            if time.monotonic() - started_at > self._max_backoff:
+                backoff = 1.0
+            logfire.error(
+                "抓取子进程异常退出（exitcode={exitcode}），{delay:.0f} 秒后重启",
+                exitcode=self._process.exitcode,
+                delay=backoff,
+            )
+            if self._stopping.wait(backoff):
+                break
+            backoff = min(backoff * 2, self._max_backoff)
+            self._spawn()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        process = self._process
+        if process is not None and process.is_alive():
+            process.terminate()
+            process.join(timeout)
+            if process.is_alive():
+                process.kill()
+
+
+if __name__ == "__main__":
+    # 单独部署抓取服务：python -m server.fetch_coordination（API 侧设置 FETCHER_MODE=none）
+    raise SystemExit(run_fetcher_process())
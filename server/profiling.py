@@ -0,0 +1,299 @@
+"""按需性能剖析：对接下来 N 轮抓取或 N 个 API 请求做采样剖析
+
+- 采样：后台线程按 PROFILE_SAMPLE_INTERVAL_MS 读取目标线程的调用栈（sys._current_frames），
+  输出 collapsed stacks 文本（每行 "帧;帧;帧 次数"），可直接用 speedscope 或 flamegraph.pl 打开；
+- 内存：抓取剖析可同时开启 tracemalloc，每轮结束写入快照（tracemalloc.Snapshot.load 可读）
+  与按行汇总的 Top 分配；
+- 触发：启动时通过 PROFILE_FETCH_CYCLES / PROFILE_REQUESTS 预置次数，或调用管理接口
+  POST /api/admin/profile。抓取可能运行在独立进程中，因此抓取剖析通过 PROFILE_DIR 下的
+  请求文件传递，抓取进程每轮开始时检查一次；请求剖析只作用于收到管理请求的 worker。
+
+请求剖析采样的是事件循环线程，无法区分同时处理的请求，因此只在该 worker 没有其他
+在途请求时才开始采样；采样期间仍有新请求进入时，其调用栈会混入结果，日志中的
+overlapping_requests 记录了混入的请求数，结果应视为该 worker 的近似剖析。
+
+未启用时抓取每轮只多一次 stat，请求路径只多一次在途请求计数。
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import logfire
+
+from server.config import Config
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+PROJECT_ROOT = Path(__file__).parent.parent
+# 抓取剖析请求文件（管理接口写入，抓取进程消费）
+FETCH_REQUEST_FILENAME = "fetch_request.json"
+# tracemalloc 汇总保留的行数
+TRACEMALLOC_TOP_LINES = 50
+# tracemalloc 记录的调用栈深度
+TRACEMALLOC_FRAMES = 10
+
+
+def get_profile_dir() -> Path:
+    """获取剖析输出目录（默认位于项目根目录/data/profiles）"""
+    if Config.PROFILE_DIR:
+        return Path(Config.PROFILE_DIR)
+    return PROJECT_ROOT / "data" / "profiles"
+
+
+def _timestamp() -> str:
+    return datetime.now(timezone(timedelta(hours=8))).strftime("%Y%m%d-%H%M%S-%f")
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    try:
+        filename = str(Path(filename).relative_to(PROJECT_ROOT))
+    except ValueError:
+        filename = Path(filename).name
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """定时采样指定线程的调用栈，按 collapsed stacks 格式累计"""
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self.duration = 0.0
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "StackSampler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def write_collapsed(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as fp:
+            for stack, count in self.samples.most_common():
+                fp.write(f"{stack} {count}\n")
+
+
+class ProfilingController:
+    """记录剩余的剖析次数，并把结果写入剖析目录"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.fetch_remaining = max(0, Config.PROFILE_FETCH_CYCLES)
+        self.request_remaining = max(0, Config.PROFILE_REQUESTS)
+        self.tracemalloc_enabled = Config.PROFILE_TRACEMALLOC
+        self._started_tracemalloc = False
+        # 当前 worker 的在途请求数，以及请求采样期间新进入的请求数
+        self._in_flight = 0
+        self._sampling_request = False
+        self._overlapping = 0
+
+    @property
+    def interval(self) -> float:
+        return max(1, Config.PROFILE_SAMPLE_INTERVAL_MS) / 1000
+
+    def _output_dir(self) -> Path:
+        directory = get_profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    # --- 触发 ---
+
+    def arm_requests(self, count: int) -> None:
+        with self._lock:
+            self.request_remaining = max(0, count)
+
+    def request_fetch_profile(self, count: int, with_tracemalloc: bool) -> Path:
+        """写入抓取剖析请求文件，抓取进程在下一轮开始时读取"""
+        path = self._output_dir() / FETCH_REQUEST_FILENAME
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"cycles": count, "tracemalloc": with_tracemalloc}), encoding="utf-8"
+        )
+        os.replace(tmp_path, path)
+        return path
+
+    def _consume_fetch_request(self) -> None:
+        path = get_profile_dir() / FETCH_REQUEST_FILENAME
+        if not path.exists():
+            return
+        try:
+            document = json.loads(path.read_text(encoding="utf-8"))
+            path.unlink()
+        except (OSError, ValueError) as exc:
+            logfire.warn("读取抓取剖析请求失败: {error}", error=str(exc))
+            return
+        with self._lock:
+            self.fetch_remaining = max(0, int(document.get("cycles", 0)))
+            self.tracemalloc_enabled = bool(document.get("tracemalloc", False))
+        logfire.info(
+            "收到抓取剖析请求：接下来 {cycles} 轮（tracemalloc={tracemalloc}）",
+            cycles=self.fetch_remaining,
+            tracemalloc=self.tracemalloc_enabled,
+        )
+
+    def _take(self, attribute: str) -> Optional[int]:
+        """剩余次数减一并返回本次序号，未启用时返回 None"""
+        with self._lock:
+            remaining = getattr(self, attribute)
+            if remaining <= 0:
+                return None
+            setattr(self, attribute, remaining - 1)
+            return remaining - 1
+
+    # --- 抓取 ---
+
+    @contextmanager
+    def profile_fetch_cycle(self, reason: str) -> Iterator[None]:
+        """包裹一轮抓取：有剩余次数时采样调用栈，并按需记录 tracemalloc 快照"""
+        self._consume_fetch_request()
+        if self.fetch_remaining <= 0 or self._take("fetch_remaining") is None:
+            yield
+            return
+
+        with_tracemalloc = self.tracemalloc_enabled
+        if with_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        sampler = StackSampler(threading.get_ident(), self.interval).start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            self._write_fetch_outputs(sampler, reason, with_tracemalloc)
+            if self._started_tracemalloc and self.fetch_remaining <= 0:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+    def _write_fetch_outputs(self, sampler: StackSampler, reason: str, with_tracemalloc: bool):
+        try:
+            base = self._output_dir() / f"fetch-{_timestamp()}"
+            sampler.write_collapsed(base.with_suffix(".collapsed"))
+            written = [base.with_suffix(".collapsed").name]
+            if with_tracemalloc and tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                snapshot.dump(str(base.with_suffix(".tracemalloc")))
+                current, peak = tracemalloc.get_traced_memory()
+                with base.with_suffix(".alloc.txt").open("w", encoding="utf-8") as fp:
+                    fp.write(f"# current={current} peak={peak}\n")
+                    for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP_LINES]:
+                        fp.write(f"{stat}\n")
+                tracemalloc.reset_peak()
+                written += [
+                    base.with_suffix(".tracemalloc").name,
+                    base.with_suffix(".alloc.txt").name,
+                ]
+            logfire.info(
+                "{reason}剖析已写入 {files}（{samples} 个样本，{duration:.1f}s）",
+                reason=reason,
+                files=written,
+                samples=sum(sampler.samples.values()),
+                duration=sampler.duration,
+            )
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logfire.warn("写入抓取剖析结果失败: {error}", error=str(exc))
+
+    # --- API 请求 ---
+
+    def start_request(self) -> Optional[StackSampler]:
+        """请求开始：有剩余次数且没有其他在途请求时，对当前线程（事件循环）开始采样
+
+        每个请求结束时都必须调用 finish_request（未采样时传入 None）。
+        """
+        with self._lock:
+            self._in_flight += 1
+            if self._sampling_request:
+                self._overlapping += 1
+                return None
+            if self.request_remaining <= 0 or self._in_flight > 1:
+                return None
+            self.request_remaining -= 1
+            self._sampling_request = True
+            self._overlapping = 0
+        return StackSampler(threading.get_ident(), self.interval).start()
+
+    def finish_request(self, sampler: Optional[StackSampler], endpoint: str) -> None:
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if sampler is None:
+                return
+            self._sampling_request = False
+            overlapping = self._overlapping
+        sampler.stop()
+        try:
+            slug = endpoint.strip("/").replace("/", "_") or "root"
+            path = self._output_dir() / f"request-{slug}-{_timestamp()}.collapsed"
+            sampler.write_collapsed(path)
+            logfire.info(
+                "{endpoint} 请求剖析已写入 {file}（{samples} 个样本，期间另有 {overlapping_requests} 个请求，"
+                "结果为该 worker 的近似剖析）",
+                endpoint=endpoint,
+                file=path.name,
+                samples=sum(sampler.samples.values()),
+                overlapping_requests=overlapping,
+            )
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logfire.warn("写入请求剖析结果失败: {error}", error=str(exc))
+
+    # --- 查询 ---
+
+    def status(self) -> Dict[str, Any]:
+        directory = get_profile_dir()
+        files = (
+            sorted(
+                (path for path in directory.iterdir() if path.name != FETCH_REQUEST_FILENAME),
+                key=lambda path: path.stat().st_mtime,
+                reverse=True,
+            )
+            if directory.is_dir()
+            else []
+        )
+        return {
+            "profile_dir": str(directory),
+            "request_remaining": self.request_remaining,
+            "fetch_request_pending": (directory / FETCH_REQUEST_FILENAME).exists(),
+            "files": [{"name": path.name, "size": path.stat().st_size} for path in files[:100]],
+        }
+
+
+_controller: Optional[ProfilingController] = None
+_controller_lock = threading.Lock()
+
+
+def get_profiling_controller() -> ProfilingController:
+    """进程内共享的剖析控制器"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = ProfilingController()
+        return _controller
@@ -0,0 +1,424 @@
+"""接口限流：基于令牌桶、可跨 worker 共享状态的限流器
+
+- 客户端识别：只信任来自 RATE_LIMIT_TRUSTED_PROXIES 的 X-Forwarded-For / X-Real-IP，
+  其余情况使用 socket 对端地址，避免 Caddy 反代后所有用户共用 127.0.0.1 一个桶；
+- 存储后端：memory://（单进程）、sqlite://[path]（默认，多 worker 共享）、
+  redis://host:port/db（可选依赖 redis，也可替换为任何兼容的本地替身）；
+- 白名单：RATE_LIMIT_WHITELIST 中的地址直接放行，不访问存储；
+- 清理：空闲超过规则周期的桶必然已补满，限流器每 PURGE_INTERVAL 秒删除一次，
+  避免桶数量随客户端地址无限增长。
+"""
+
+import functools
+import inspect
+from abc import ABC, abstractmethod
+import ipaddress
+import math
+import re
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import logfire
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+IPNetwork = ipaddress.IPv4Network | ipaddress.IPv6Network
+
+_UNIT_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+_RULE_PATTERN = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$")
+# 清理空闲桶的间隔（秒）
+PURGE_INTERVAL = 300.0
+
+
+@dataclass(frozen=True)
+class RateRule:
+    """一条令牌桶规则：容量为 limit，每 period 秒匀速补满"""
+
+    limit: int
+    period: float
+    text: str
+
+    @property
+    def refill_rate(self) -> float:
+        return self.limit / self.period
+
+
+def parse_rate_rules(rule: str) -> List[RateRule]:
+    """解析限流规则，兼容 slowapi 写法，如 "3/minute"、"60/hour;1000/day"、"10 per 2 second" """
+    rules = []
+    for part in rule.split(";"):
+        if not part.strip():
+            continue
+        match = _RULE_PATTERN.match(part.lower())
+        if not match:
+            raise ValueError(f"无法解析限流规则: {part!r}")
+        limit, multiples, unit = match.groups()
+        period = _UNIT_SECONDS[unit] * int(multiples or 1)
+        rules.append(RateRule(limit=int(limit), period=float(period), text=part.strip()))
+    return rules
+
+
+def parse_networks(value: str) -> List[IPNetwork]:
+    """解析逗号分隔的 IP / CIDR 列表"""
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logfire.warn("忽略无法解析的地址配置: {item}", item=item)
+    return networks
+
+
+def _in_networks(address: str, networks: Iterable[IPNetwork]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+class ClientIdentifier:
+    """根据可信代理配置识别真实客户端地址"""
+
+    def __init__(self, trusted_proxies: Iterable[IPNetwork]) -> None:
+        self._trusted = list(trusted_proxies)
+
+    def is_trusted_proxy(self, address: str) -> bool:
+        return _in_networks(address, self._trusted)
+
+    def __call__(self, request: Request) -> str:
+        peer = request.client.host if request.client else "unknown"
+        if not self.is_trusted_proxy(peer):
+            return peer
+
+        # 从右向左跳过可信代理，第一个不可信地址即为真实客户端
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+            for hop in reversed(hops):
+                if not self.is_trusted_proxy(hop):
+                    return hop
+            if hops:
+                return hops[0]
+
+        real_ip = request.headers.get("x-real-ip")
+        if real_ip and real_ip.strip():
+            return real_ip.strip()
+        return peer
+
+
+# --- 存储后端 ---
+
+
+class BucketStore(ABC):
+    """令牌桶存储接口：原子地补充并消耗令牌"""
+
+    # 访问存储是否可能阻塞（文件锁、网络），为 True 时限流检查放到线程池执行
+    blocking = False
+
+    @abstractmethod
+    def consume(
+        self, key: str, rule: RateRule, now: float, cost: float = 1.0
+    ) -> Tuple[bool, float, float]:
+        """返回 (是否放行, 剩余令牌, 需等待秒数)"""
+
+    @abstractmethod
+    def purge_idle(self, older_than: float) -> None:
+        """清理 older_than 之前最后访问的桶"""
+
+    @abstractmethod
+    def reset(self) -> None:
+        """清空全部桶"""
+
+
+def _refill(
+    tokens: float, updated: float, rule: RateRule, now: float, cost: float
+) -> Tuple[bool, float, float]:
+    tokens = min(float(rule.limit), tokens + max(0.0, now - updated) * rule.refill_rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rule.refill_rate
+
+
+class MemoryBucketStore(BucketStore):
+    """进程内存储，仅适用于单 worker"""
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = Lock()
+
+    def consume(self, key, rule, now, cost=1.0):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(rule.limit), now))
+            allowed, tokens, retry_after = _refill(tokens, updated, rule, now, cost)
+            self._buckets[key] = (tokens, now)
+            return allowed, tokens, retry_after
+
+    def purge_idle(self, older_than: float) -> None:
+        with self._lock:
+            idle = [key for key, (_, updated) in self._buckets.items() if updated < older_than]
+            for key in idle:
+                del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore(BucketStore):
+    """基于 SQLite 文件的共享存储，同一台机器上的多个 worker 共用一份令牌桶"""
+
+    blocking = True
+
+    def __init__(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._path = path
+        self._lock = Lock()
+        self._conn = sqlite3.connect(
+            path,
+            # 其他 worker 持有写锁时最多等待 1 秒，超时后限流器放行请求
+            timeout=1.0,
+            isolation_level=None,  # 手动控制事务
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # 令牌桶状态丢失只会导致短暂放宽限流，无需强制落盘
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                bucket_key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+
+    def consume(self, key, rule, now, cost=1.0):
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                row = cursor.execute(
+                    "SELECT tokens, updated_at FROM rate_limit_buckets WHERE bucket_key = ?",
+                    (key,),
+                ).fetchone()
+                tokens, updated = row if row else (float(rule.limit), now)
+                allowed, tokens, retry_after = _refill(tokens, updated, rule, now, cost)
+                cursor.execute(
+                    """
+                    INSERT INTO rate_limit_buckets (bucket_key, tokens, updated_at)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(bucket_key) DO UPDATE SET
+                        tokens = excluded.tokens, updated_at = excluded.updated_at
+                    """,
+                    (key, tokens, now),
+                )
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+            return allowed, tokens, retry_after
+
+    def purge_idle(self, older_than: float) -> None:
+        """清理长时间未访问的桶（空闲超过一个周期的桶必然已补满）"""
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limit_buckets WHERE updated_at < ?", (older_than,))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM rate_limit_buckets")
+
+
+class RedisBucketStore(BucketStore):
+    """Redis 存储（可选依赖 redis），通过 Lua 脚本保证补充与消耗的原子性"""
+
+    blocking = True
+
+    _SCRIPT = """
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local limit = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local cost = tonumber(ARGV[4])
+    local tokens = tonumber(state[1]) or limit
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(limit, tokens + math.max(0, now - updated) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(limit / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: Optional[str] = None, client: Any = None) -> None:
+        if client is None:
+            import redis  # 可选依赖，仅在配置 redis:// 时导入
+
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self._script = client.register_script(self._SCRIPT)
+
+    def consume(self, key, rule, now, cost=1.0):
+        allowed, tokens = self._script(
+            keys=[f"zju-charger:rate-limit:{key}"],
+            args=[rule.limit, rule.refill_rate, now, cost],
+        )
+        tokens = float(tokens)
+        if int(allowed):
+            return True, tokens, 0.0
+        return False, tokens, (cost - tokens) / rule.refill_rate
+
+    def purge_idle(self, older_than: float) -> None:
+        # 每个桶都带有 EXPIRE，由 Redis 自行过期
+        return None
+
+    def reset(self) -> None:
+        for key in self._client.scan_iter("zju-charger:rate-limit:*"):
+            self._client.delete(key)
+
+
+def get_default_rate_limit_db_path() -> str:
+    project_root = Path(__file__).parent.parent
+    return str(project_root / "data" / "rate_limit.db")
+
+
+def create_bucket_store(uri: str) -> BucketStore:
+    """根据 URI 创建存储后端：memory://、sqlite://[path]、redis://..."""
+    if uri.startswith("memory://"):
+        return MemoryBucketStore()
+    if uri.startswith("sqlite://"):
+        path = uri[len("sqlite://") :].lstrip("/")
+        if uri.startswith("sqlite:///"):
+            path = "/" + path
+        return SQLiteBucketStore(path or get_default_rate_limit_db_path())
+    if uri.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBucketStore(uri)
+    raise ValueError(f"不支持的限流存储: {uri}")
+
+
+# --- 限流器 ---
+
+
+class RateLimitExceeded(Exception):
+    """请求超出限流规则"""
+
+    def __init__(self, rule: RateRule, retry_after: float) -> None:
+        super().__init__(f"Rate limit exceeded: {rule.text}")
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+async def rate_limit_exceeded_handler(request: Request, exc: Exception) -> JSONResponse:
+    assert isinstance(exc, RateLimitExceeded)
+    retry_after = max(1, math.ceil(exc.retry_after))
+    return JSONResponse(
+        {"error": f"Rate limit exceeded: {exc.rule.text}"},
+        status_code=429,
+        headers={
+            "Retry-After": str(retry_after),
+            "X-RateLimit-Limit": str(exc.rule.limit),
+        },
+    )
+
+
+class TokenBucketLimiter:
+    """令牌桶限流器，提供与 slowapi 相同的 @limiter.limit("3/minute") 装饰器用法"""
+
+    def __init__(
+        self,
+        store: BucketStore,
+        key_func: Callable[[Request], str],
+        whitelist: Iterable[IPNetwork] = (),
+    ) -> None:
+        self.store = store
+        self.key_func = key_func
+        self._whitelist = list(whitelist)
+        self._failed_open_logged = False
+        # 已注册规则的最长周期：空闲超过它的桶已补满，可以删除
+        self._max_period = 0.0
+        self._last_purge = time.time()
+
+    def is_whitelisted(self, client: str) -> bool:
+        return bool(self._whitelist) and _in_networks(client, self._whitelist)
+
+    def check(self, request: Request, scope: str, rules: List[RateRule]) -> None:
+        client = self.key_func(request)
+        if self.is_whitelisted(client):
+            return
+
+        now = time.time()
+        self._maybe_purge(now, rules)
+        for rule in rules:
+            key = f"{scope}:{rule.limit}/{int(rule.period)}:{client}"
+            try:
+                allowed, _, retry_after = self.store.consume(key, rule, now)
+            except Exception as exc:
+                # 存储故障时放行，避免限流组件拖垮整个 API
+                if not self._failed_open_logged:
+                    logfire.error("限流存储不可用，暂时放行请求: {error}", error=str(exc))
+                    self._failed_open_logged = True
+                return
+            if not allowed:
+                raise RateLimitExceeded(rule, retry_after)
+
+    def _maybe_purge(self, now: float, rules: List[RateRule]) -> None:
+        self._max_period = max([self._max_period, *(rule.period for rule in rules)])
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        try:
+            self.store.purge_idle(now - self._max_period)
+        except Exception as exc:
+            logfire.warn("清理空闲令牌桶失败: {error}", error=str(exc))
+
+    async def check_async(self, request: Request, scope: str, rules: List[RateRule]) -> None:
+        """存储可能阻塞时在线程池中执行 check，避免占用事件循环"""
+        if self.store.blocking:
+            await run_in_threadpool(self.check, request, scope, rules)
+        else:
+            self.check(request, scope, rules)
+
+    def limit(self, limit_str: str):
+        rules = parse_rate_rules(limit_str)
+        self._max_period = max([self._max_period, *(rule.period for rule in rules)])
+
+        def decorator(func):
+            scope = f"{func.__module__}.{func.__name__}"
+            if "request" not in inspect.signature(func).parameters:
+                raise ValueError(f"限流端点 {scope} 必须声明 request: Request 参数")
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs.get("request")
+                if request is None:
+                    request = next(arg for arg in args if isinstance(arg, Request))
+                await self.check_async(request, scope, rules)
+                return await func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
@@ -0,0 +1,181 @@
+"""响应体缓存与压缩协商
+
+每个数据版本 + 查询变体只序列化一次，各编码（gzip/br/zstd）在首次被请求时压缩一次并缓存，
+之后同一版本的请求直接复用字节串，不再有逐请求的序列化和压缩开销。
+"""
+
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:  # 可选依赖：brotli
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:  # 可选依赖：zstandard
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# 小于该字节数的响应体不压缩（压缩收益不足以抵消头部开销）
+MIN_COMPRESS_SIZE = 512
+
+_ENCODERS: Dict[str, Callable[[bytes], bytes]] = {
+    "gzip": lambda body: gzip.compress(body, compresslevel=6, mtime=0),
+}
+if brotli is not None:
+    _ENCODERS["br"] = lambda body: brotli.compress(body, quality=5)
+if zstandard is not None:
+    _ENCODERS["zstd"] = lambda body: zstandard.ZstdCompressor(level=10).compress(body)
+
+# q 值相同时服务端的偏好顺序
+_ENCODING_PREFERENCE = ["br", "zstd", "gzip"]
+
+
+def supported_encodings() -> List[str]:
+    return [name for name in _ENCODING_PREFERENCE if name in _ENCODERS]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> str:
+    """根据 Accept-Encoding 选择编码，无法协商时返回 identity"""
+    if not accept_encoding:
+        return "identity"
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[token] = quality
+
+    wildcard = weights.get("*")
+    best, best_quality = "identity", 0.0
+    for name in supported_encodings():
+        quality = weights.get(name, wildcard if wildcard is not None else 0.0)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def _opaque_tag(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中 etag：支持逗号分隔的多个标签与 *，按弱比较（忽略 W/ 前缀）"""
+    if not if_none_match:
+        return False
+    target = _opaque_tag(etag)
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate and _opaque_tag(candidate) == target):
+            return True
+    return False
+
+
+def encode_json(document: Any) -> bytes:
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_body(body: bytes, encoding: str) -> Tuple[bytes, str]:
+    """压缩响应体；过小或不支持的编码返回原文与 identity"""
+    encoder = _ENCODERS.get(encoding)
+    if encoder is None or len(body) < MIN_COMPRESS_SIZE:
+        return body, "identity"
+    return encoder(body), encoding
+
+
+@dataclass
+class CachedBody:
+    """一个数据版本 + 查询变体对应的序列化结果"""
+
+    body: bytes
+    media_type: str = "application/json"
+    meta: Dict[str, Any] = field(default_factory=dict)
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+    etag: str = ""
+
+    def __post_init__(self) -> None:
+        if not self.etag:
+            self.etag = 'W/"' + hashlib.blake2b(self.body, digest_size=8).hexdigest() + '"'
+
+    def for_encoding(self, encoding: str) -> Tuple[bytes, str]:
+        if encoding == "identity" or len(self.body) < MIN_COMPRESS_SIZE:
+            return self.body, "identity"
+        cached = self.encoded.get(encoding)
+        if cached is None:
+            cached, encoding = encode_body(self.body, encoding)
+            if encoding == "identity":
+                return cached, encoding
+            self.encoded[encoding] = cached
+        return cached, encoding
+
+
+class ResponseCache:
+    """按 (version, variant) 缓存已序列化响应体的 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self._entries: OrderedDict[Tuple[Hashable, Hashable], CachedBody] = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = Lock()
+
+    def get(self, version: Hashable, variant: Hashable) -> Optional[CachedBody]:
+        key = (version, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, version: Hashable, variant: Hashable, entry: CachedBody) -> CachedBody:
+        key = (version, variant)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def build_encoded_response(
+    request: Request,
+    entry: CachedBody,
+    *,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """根据请求头为缓存条目挑选编码并生成响应（支持 If-None-Match 304）"""
+    response_headers = {"Vary": "Accept-Encoding", "ETag": entry.etag}
+    if headers:
+        response_headers.update(headers)
+
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=response_headers)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    body, encoding = entry.for_encoding(encoding)
+    if encoding != "identity":
+        response_headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=entry.media_type, headers=response_headers)
@@ -0,0 +1,121 @@
+"""/api/status 的紧凑响应格式
+
+除默认的逐站点 JSON 外，支持：
+
+- 列式布局（layout=columnar）：每个字段一个数组，外加 hash_id -> 下标的索引字典，
+  不再为每个站点重复键名，也不再重复输出与 hash_id 相同的 id 字段；
+- MessagePack 编码（format=msgpack，需安装可选依赖 msgpack），行式与列式布局均可使用。
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.response_cache import encode_json
+
+try:  # 可选依赖：msgpack
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+FORMAT_JSON = "json"
+FORMAT_MSGPACK = "msgpack"
+LAYOUT_ROWS = "rows"
+LAYOUT_COLUMNAR = "columnar"
+
+MEDIA_TYPE_JSON = "application/json"
+MEDIA_TYPE_MSGPACK = "application/msgpack"
+MEDIA_TYPE_COLUMNAR_JSON = "application/vnd.zju-charger.columnar+json"
+MEDIA_TYPE_COLUMNAR_MSGPACK = "application/vnd.zju-charger.columnar+msgpack"
+
+_MEDIA_TYPES = {
+    (FORMAT_JSON, LAYOUT_ROWS): MEDIA_TYPE_JSON,
+    (FORMAT_JSON, LAYOUT_COLUMNAR): MEDIA_TYPE_COLUMNAR_JSON,
+    (FORMAT_MSGPACK, LAYOUT_ROWS): MEDIA_TYPE_MSGPACK,
+    (FORMAT_MSGPACK, LAYOUT_COLUMNAR): MEDIA_TYPE_COLUMNAR_MSGPACK,
+}
+_ACCEPT_ALIASES = {
+    MEDIA_TYPE_COLUMNAR_MSGPACK: (FORMAT_MSGPACK, LAYOUT_COLUMNAR),
+    MEDIA_TYPE_COLUMNAR_JSON: (FORMAT_JSON, LAYOUT_COLUMNAR),
+    MEDIA_TYPE_MSGPACK: (FORMAT_MSGPACK, LAYOUT_ROWS),
+    "application/x-msgpack": (FORMAT_MSGPACK, LAYOUT_ROWS),
+}
+
+# 列式布局中站点字段的输出顺序（hash_id 由索引字典承载，id 与之重复故省略）
+COLUMNAR_FIELDS = [
+    "name",
+    "provider",
+    "campus_id",
+    "campus_name",
+    "lat",
+    "lon",
+    "devids",
+    "free",
+    "used",
+    "total",
+    "error",
+]
+
+
+class UnsupportedFormatError(ValueError):
+    """请求的响应格式不可用（例如未安装 msgpack）"""
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def negotiate_format(
+    accept: Optional[str],
+    format_param: Optional[str] = None,
+    layout_param: Optional[str] = None,
+) -> Tuple[str, str]:
+    """确定响应的 (format, layout)
+
+    查询参数优先；否则按 Accept 头中出现的自定义媒体类型协商，
+    Accept 协商到不可用的格式时静默回退为 JSON，显式参数则抛出 UnsupportedFormatError。
+    """
+    fmt, layout = FORMAT_JSON, LAYOUT_ROWS
+    if accept:
+        for part in accept.split(","):
+            media_type = part.split(";", 1)[0].strip().lower()
+            negotiated = _ACCEPT_ALIASES.get(media_type)
+            if negotiated is None:
+                continue
+            if negotiated[0] == FORMAT_MSGPACK and not msgpack_available():
+                continue
+            fmt, layout = negotiated
+            break
+
+    if format_param:
+        fmt = format_param
+    if layout_param:
+        layout = layout_param
+
+    if fmt == FORMAT_MSGPACK and not msgpack_available():
+        raise UnsupportedFormatError("服务器未安装 msgpack，无法返回 MessagePack 格式")
+    return fmt, layout
+
+
+def to_columnar(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """将逐站点响应体转换为列式布局"""
+    stations: List[Dict[str, Any]] = payload.get("stations", [])
+    present_fields = [name for name in COLUMNAR_FIELDS if any(name in s for s in stations)]
+
+    columnar: Dict[str, Any] = {key: value for key, value in payload.items() if key != "stations"}
+    columnar["layout"] = LAYOUT_COLUMNAR
+    columnar["index"] = {station.get("hash_id"): idx for idx, station in enumerate(stations)}
+    columnar["columns"] = {
+        name: [station.get(name) for station in stations] for name in present_fields
+    }
+    return columnar
+
+
+def serialize_payload(payload: Dict[str, Any], fmt: str, layout: str) -> Tuple[bytes, str]:
+    """按格式与布局序列化响应体，返回 (body, media_type)"""
+    document = to_columnar(payload) if layout == LAYOUT_COLUMNAR else payload
+    if fmt == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise UnsupportedFormatError("服务器未安装 msgpack，无法返回 MessagePack 格式")
+        body = msgpack.packb(document, use_bin_type=True)
+    else:
+        body = encode_json(document)
+    return body, _MEDIA_TYPES[(fmt, layout)]
@@ -6,15 +6,24 @@
     python -m server.run_server
     python -m server.run_server --host 0.0.0.0 --port 8000
     python -m server.run_server --log-file logs/server.log  # 保存日志到文件
+    python -m server.run_server --workers 4 --fetcher-mode process  # 多 worker + 独立抓取进程
 """
 
 import argparse
+import os
 import sys
 
 import logfire
 import uvicorn
 
 from server.background_fetcher import BackgroundFetcher
+from server.fetch_coordination import (
+    FETCHER_MODE_LEADER,
+    FETCHER_MODE_PROCESS,
+    FETCHER_MODE_THREAD,
+    FETCHER_MODES,
+    FetcherSupervisor,
+)
 from server.logfire_setup import ensure_logfire_configured
 from server.config import Config
 from db import initialize_db_config, get_db_client
@@ -64,6 +73,18 @@ if __name__ == "__main__":
         choices=["DEBUG", "INFO", "WARNING", "ERROR"],
         help="日志级别",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=Config.API_WORKERS,
+        help="uvicorn worker 数量",
+    )
+    parser.add_argument(
+        "--fetcher-mode",
+        default=Config.FETCHER_MODE,
+        choices=FETCHER_MODES,
+        help="后台抓取运行方式：thread/process/leader/none",
+    )
     parser.add_argument(
         "--skip-db-check",
         action="store_true",
@@ -101,12 +122,41 @@ if __name__ == "__main__":
     logfire.info("前端页面: http://{host}:{port}/web/", host=args.host, port=args.port)
     logfire.info("{separator}", separator=separator)
 
-    BackgroundFetcher().start()
-
-    uvicorn.run(
-        "server.api:app",
-        host=args.host,
-        port=args.port,
-        reload=args.reload,
-        log_config=None,  # 使用我们自己的日志配置
+    workers = max(1, args.workers)
+    if args.reload and workers > 1:
+        logfire.warn("开发模式（--reload）不支持多 worker，已改为单 worker")
+        workers = 1
+
+    # 多 worker 时 worker 进程通过环境变量获取抓取模式（leader 模式下由 worker 自行竞选）；
+    # 单 worker 时 uvicorn 在本进程导入 server.api，Config 早已按旧环境变量读取，需同步修改
+    os.environ["FETCHER_MODE"] = args.fetcher_mode
+    Config.FETCHER_MODE = args.fetcher_mode
+    logfire.info(
+        "uvicorn worker 数量: {workers}，后台抓取模式: {mode}",
+        workers=workers,
+        mode=args.fetcher_mode,
     )
+
+    supervisor = None
+    if args.fetcher_mode == FETCHER_MODE_THREAD:
+        if workers > 1:
+            logfire.info("多 worker 部署下抓取线程运行在 uvicorn 主进程中，不占用 worker")
+        BackgroundFetcher().start()
+    elif args.fetcher_mode == FETCHER_MODE_PROCESS:
+        supervisor = FetcherSupervisor()
+        supervisor.start()
+    elif args.fetcher_mode != FETCHER_MODE_LEADER:
+        logfire.info("后台抓取已禁用，请单独运行 python -m server.fetch_coordination")
+
+    try:
+        uvicorn.run(
+            "server.api:app",
+            host=args.host,
+            port=args.port,
+            reload=args.reload,
+            workers=workers,
+            log_config=None,  # 使用我们自己的日志配置
+        )
+    finally:
+        if supervisor is not None:
+            supervisor.stop()
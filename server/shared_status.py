@@ -0,0 +1,407 @@
+"""共享内存状态表：抓取进程每轮写入，各 API worker 通过 mmap 零拷贝读取
+
+文件布局（小端序）：
+
+- 头部（128 字节）：magic、布局版本、标志位、seqlock 序号、数据代数、站点目录代数、
+  容量、记录数、最近一次 updated_at；
+- 记录区：容量 × 40 字节定长记录（hash_id、free、used、total、error、snapshot 微秒时间戳）。
+
+写入方遵循 seqlock 协议：先将序号加一（奇数表示写入中），写完记录与头部后再加一；
+读取方在读取前后比较序号，不一致或为奇数时重试，因此无需任何锁即可读到一致的快照。
+文件映射到页缓存后由所有 worker 共享，增加 worker 不会增加数据副本。
+"""
+
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import logfire
+
+from server.config import Config
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+MAGIC = b"ZJUCSHM\x00"
+LAYOUT_VERSION = 1
+
+# magic, layout_version, flags, seq, generation, catalog_generation, capacity, count, updated_at
+HEADER_STRUCT = struct.Struct("<8sIIQQQII64s")
+HEADER_SIZE = 128
+FLAGS_OFFSET = 12
+SEQ_OFFSET = 16
+# hash_id, free, used, total, error, snapshot_time（微秒）
+RECORD_STRUCT = struct.Struct("<16siiiiq")
+RECORD_SIZE = RECORD_STRUCT.size
+
+FLAG_RETIRED = 0x1  # 文件已被更大容量的新文件替换，读取方需重新打开
+MIN_CAPACITY = 1024
+MAX_READ_RETRIES = 100
+
+_TZ_UTC_8 = timezone(timedelta(hours=8))
+
+
+def get_shared_status_path() -> Path:
+    """获取共享状态表路径（默认位于项目根目录/data 下）"""
+    if Config.SHARED_STATUS_PATH:
+        return Path(Config.SHARED_STATUS_PATH)
+    project_root = Path(__file__).parent.parent
+    return project_root / "data" / "status_table.bin"
+
+
+def _to_micros(value: Optional[str]) -> int:
+    if value:
+        try:
+            return int(datetime.fromisoformat(value).timestamp() * 1_000_000)
+        except ValueError:
+            pass
+    return time.time_ns() // 1000
+
+
+def _from_micros(value: int) -> str:
+    return datetime.fromtimestamp(value / 1_000_000, _TZ_UTC_8).isoformat()
+
+
+def _coerce_count(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class SharedStatusWriter:
+    """由抓取进程持有，每轮将站点计数写入共享状态表"""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self._path = path or get_shared_status_path()
+        self._fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+        self._capacity = 0
+        self._slots: Dict[str, int] = {}
+        self._seq = 0
+        self._generation = 0
+        self._catalog_generation = 0
+
+    # --- 文件管理 ---
+
+    def _open_existing(self) -> bool:
+        """接管已有文件（例如抓取进程重启），保留其中的站点槽位与计数"""
+        try:
+            fd = os.open(self._path, os.O_RDWR)
+        except OSError:
+            return False
+        try:
+            size = os.fstat(fd).st_size
+            if size < HEADER_SIZE:
+                raise ValueError("文件过小")
+            mm = mmap.mmap(fd, size)
+            magic, version, flags, seq, generation, catalog_gen, capacity, count, _ = (
+                HEADER_STRUCT.unpack_from(mm, 0)
+            )
+            if magic != MAGIC or version != LAYOUT_VERSION or flags & FLAG_RETIRED:
+                mm.close()
+                raise ValueError("布局不兼容")
+            if size < HEADER_SIZE + capacity * RECORD_SIZE or count > capacity:
+                mm.close()
+                raise ValueError("记录区不完整")
+        except ValueError as exc:
+            os.close(fd)
+            logfire.info("忽略已有共享状态表（{reason}），将重新创建", reason=str(exc))
+            return False
+
+        self._fd, self._mm = fd, mm
+        self._capacity = capacity
+        self._seq = seq + (seq & 1)  # 上次写入中途退出时序号为奇数，补齐为偶数
+        self._generation = generation
+        self._catalog_generation = catalog_gen
+        self._slots = {}
+        for index in range(count):
+            raw_id = RECORD_STRUCT.unpack_from(mm, HEADER_SIZE + index * RECORD_SIZE)[0]
+            self._slots[raw_id.rstrip(b"\0").decode("ascii")] = index
+        return True
+
+    def _create(self, capacity: int, records: List[bytes], updated_at: str = "") -> None:
+        """以新容量创建文件并原子替换旧文件，旧文件标记为 retired"""
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_name(f".{self._path.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, HEADER_SIZE + capacity * RECORD_SIZE)
+            mm = mmap.mmap(fd, HEADER_SIZE + capacity * RECORD_SIZE)
+            for index, record in enumerate(records):
+                mm[HEADER_SIZE + index * RECORD_SIZE : HEADER_SIZE + (index + 1) * RECORD_SIZE] = (
+                    record
+                )
+            self._catalog_generation += 1
+            self._write_header(mm, seq=self._seq, count=len(records), updated_at=updated_at)
+            os.replace(tmp_path, self._path)
+        except Exception:
+            os.close(fd)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        old_mm, old_fd = self._mm, self._fd
+        self._fd, self._mm, self._capacity = fd, mm, capacity
+        if old_mm is not None:
+            struct.pack_into("<I", old_mm, FLAGS_OFFSET, FLAG_RETIRED)
+            old_mm.close()
+        if old_fd is not None:
+            os.close(old_fd)
+
+    def _write_header(self, mm: mmap.mmap, *, seq: int, count: int, updated_at: str) -> None:
+        HEADER_STRUCT.pack_into(
+            mm,
+            0,
+            MAGIC,
+            LAYOUT_VERSION,
+            0,
+            seq,
+            self._generation,
+            self._catalog_generation,
+            self._capacity if mm is self._mm else (len(mm) - HEADER_SIZE) // RECORD_SIZE,
+            count,
+            updated_at.encode("utf-8")[:64],
+        )
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # --- 发布 ---
+
+    def publish(
+        self, stations: Iterable[Dict[str, Any]], updated_at: Optional[str]
+    ) -> Optional[int]:
+        """写入一轮抓取结果，未出现在本轮的站点保留上一次的计数（与 latest 表语义一致）
+
+        Returns:
+            新的数据代数，写入失败返回 None
+        """
+        try:
+            if self._mm is None and not self._open_existing():
+                self._create(MIN_CAPACITY, [])
+
+            snapshot_us = _to_micros(updated_at)
+            updates: Dict[int, bytes] = {}
+            appended: List[str] = []
+            for station in stations:
+                station_id = station.get("hash_id") or station.get("id")
+                if not station_id:
+                    continue
+                encoded_id = str(station_id).encode("ascii", "ignore")
+                if len(encoded_id) > 16:
+                    logfire.debug(
+                        "站点 id 过长，跳过共享状态表: {station_id}", station_id=station_id
+                    )
+                    continue
+                slot = self._slots.get(station_id)
+                if slot is None:
+                    slot = len(self._slots)
+                    self._slots[station_id] = slot
+                    appended.append(station_id)
+                updates[slot] = RECORD_STRUCT.pack(
+                    encoded_id,
+                    _coerce_count(station.get("free")),
+                    _coerce_count(station.get("used")),
+                    _coerce_count(station.get("total")),
+                    _coerce_count(station.get("error")),
+                    snapshot_us,
+                )
+
+            count = len(self._slots)
+            assert self._mm is not None
+            if count > self._capacity:
+                # 容量不足：连同已有记录一起迁移到更大的新文件
+                existing = [
+                    bytes(
+                        self._mm[
+                            HEADER_SIZE + i * RECORD_SIZE : HEADER_SIZE + (i + 1) * RECORD_SIZE
+                        ]
+                    )
+                    for i in range(count - len(appended))
+                ]
+                records = existing + [b"\0" * RECORD_SIZE] * len(appended)
+                for slot, record in updates.items():
+                    records[slot] = record
+                self._create(max(MIN_CAPACITY, count * 2), records)
+                updates = {}
+
+            mm = self._mm
+            self._seq += 1  # 奇数：写入中
+            struct.pack_into("<Q", mm, SEQ_OFFSET, self._seq)
+            for slot, record in updates.items():
+                offset = HEADER_SIZE + slot * RECORD_SIZE
+                mm[offset : offset + RECORD_SIZE] = record
+            self._generation += 1
+            if appended:
+                self._catalog_generation += 1
+            self._write_header(mm, seq=self._seq, count=count, updated_at=updated_at or "")
+            # 其余字段写完后最后写入偶数序号，读取方据此确认整份头部与记录一致
+            self._seq += 1
+            struct.pack_into("<Q", mm, SEQ_OFFSET, self._seq)
+            return self._generation
+        except Exception as exc:
+            logfire.error("写入共享状态表失败: {error}", error=str(exc), path=str(self._path))
+            self.close()
+            return None
+
+    def remove(self, station_ids: Iterable[str]) -> Optional[int]:
+        """删除站点槽位（站点目录热重载删除站点后调用），以压缩后的记录重建文件
+
+        publish 会保留本轮未出现的站点，被删除的站点只能在这里清理，
+        否则 API 仍会从共享状态表读到它们。
+
+        Returns:
+            新的数据代数；没有需要删除的站点时返回当前代数，失败返回 None
+        """
+        try:
+            if self._mm is None and not self._open_existing():
+                return None
+            removed = {station_id for station_id in station_ids if station_id in self._slots}
+            if not removed:
+                return self._generation
+
+            mm = self._mm
+            assert mm is not None
+            updated_at = HEADER_STRUCT.unpack_from(mm, 0)[8].rstrip(b"\0").decode("utf-8")
+            kept = sorted(
+                (slot, station_id)
+                for station_id, slot in self._slots.items()
+                if station_id not in removed
+            )
+            records = [
+                bytes(mm[HEADER_SIZE + slot * RECORD_SIZE : HEADER_SIZE + (slot + 1) * RECORD_SIZE])
+                for slot, _ in kept
+            ]
+            self._slots = {station_id: index for index, (_, station_id) in enumerate(kept)}
+            self._generation += 1
+            self._create(self._capacity, records, updated_at)
+            logfire.info("共享状态表已删除 {count} 个站点", count=len(removed))
+            return self._generation
+        except Exception as exc:
+            logfire.error("压缩共享状态表失败: {error}", error=str(exc), path=str(self._path))
+            self.close()
+            return None
+
+
+class SharedStatusReader:
+    """API worker 侧的只读视图，按需打开映射并在文件被替换后自动重新打开"""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self._path = path or get_shared_status_path()
+        self._mm: Optional[mmap.mmap] = None
+        self._index: Dict[str, int] = {}
+        self._catalog_generation: Optional[int] = None
+
+    def _ensure_open(self) -> Optional[mmap.mmap]:
+        mm = self._mm
+        if mm is not None:
+            flags = struct.unpack_from("<I", mm, FLAGS_OFFSET)[0]
+            if not flags & FLAG_RETIRED:
+                return mm
+            mm.close()
+            self._mm = None
+
+        try:
+            with open(self._path, "rb") as fp:
+                mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(mm) < HEADER_SIZE or HEADER_STRUCT.unpack_from(mm, 0)[:2] != (
+            MAGIC,
+            LAYOUT_VERSION,
+        ):
+            mm.close()
+            return None
+        self._mm = mm
+        self._catalog_generation = None
+        return mm
+
+    def _read_consistent(self, reader):
+        """按 seqlock 协议读取，返回 reader(mm, header) 的结果；持续冲突时返回 None"""
+        mm = self._ensure_open()
+        if mm is None:
+            return None
+        for _ in range(MAX_READ_RETRIES):
+            header = HEADER_STRUCT.unpack_from(mm, 0)
+            seq = header[3]
+            if seq & 1:
+                time.sleep(0)
+                continue
+            result = reader(mm, header)
+            if struct.unpack_from("<Q", mm, SEQ_OFFSET)[0] == seq:
+                return result
+        logfire.warn("共享状态表读取持续冲突，放弃本次读取")
+        return None
+
+    def version(self) -> Optional[str]:
+        """当前数据版本（写入代数），文件不可用或尚无数据时返回 None"""
+        header = self._read_consistent(lambda mm, header: header)
+        if header is None or header[7] == 0:
+            return None
+        return f"shm:{header[4]}"
+
+    def _rebuild_index(self, mm: mmap.mmap, count: int) -> Dict[str, int]:
+        view = memoryview(mm)[HEADER_SIZE : HEADER_SIZE + count * RECORD_SIZE]
+        try:
+            return {
+                record[0].rstrip(b"\0").decode("ascii"): index
+                for index, record in enumerate(RECORD_STRUCT.iter_unpack(view))
+            }
+        finally:
+            view.release()
+
+    def load(self, station_ids: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """读取站点计数，返回与 db.load_latest 相同的结构：{"updated_at", "rows"}"""
+
+        def _read(mm: mmap.mmap, header: Tuple[Any, ...]):
+            catalog_generation, count, updated_at = header[5], header[7], header[8]
+            index = self._index
+            if catalog_generation != self._catalog_generation:
+                index = self._rebuild_index(mm, count)
+
+            if station_ids is None:
+                slots: Iterable[int] = range(count)
+            else:
+                slots = [index[sid] for sid in station_ids if sid in index]
+
+            records = [
+                RECORD_STRUCT.unpack_from(mm, HEADER_SIZE + slot * RECORD_SIZE) for slot in slots
+            ]
+            return catalog_generation, index, updated_at, records
+
+        result = self._read_consistent(_read)
+        if result is None:
+            return None
+        catalog_generation, index, updated_at, records = result
+        self._index, self._catalog_generation = index, catalog_generation
+        if not records:
+            return None
+
+        rows = [
+            {
+                "hash_id": raw_id.rstrip(b"\0").decode("ascii"),
+                "snapshot_time": _from_micros(snapshot_us),
+                "free": free,
+                "used": used,
+                "total": total,
+                "error": error,
+            }
+            for raw_id, free, used, total, error, snapshot_us in records
+        ]
+        return {
+            "updated_at": updated_at.rstrip(b"\0").decode("utf-8")
+            or max(row["snapshot_time"] for row in rows),
+            "rows": rows,
+        }
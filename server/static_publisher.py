@@ -0,0 +1,164 @@
+"""静态快照发布：每轮抓取后生成可由 Caddy 直接托管的预压缩 JSON 文件
+
+目录结构（STATIC_SNAPSHOT_DIR 下）::
+
+    releases/<version>/status.json(.gz/.br)            全部站点状态
+    releases/<version>/provider/<provider>.json(...)   按服务商拆分
+    releases/<version>/campus/<campus_id>.json(...)    按校区拆分
+    releases/<version>/stations.json(...)              站点基础信息
+    current -> releases/<version>                      原子切换的符号链接
+
+一轮发布的所有文件先写入新的 release 目录，再通过替换 current 符号链接
+整体生效，Caddy 永远只会看到完整的一组文件。
+"""
+
+import gzip
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import logfire
+
+from server.config import Config
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+try:  # brotli 为可选依赖，缺失时只生成 gzip 版本
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# 与 /api/status 的 provider 参数校验保持一致，避免生成无法通过 API 访问的文件名
+SAFE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+CURRENT_LINK_NAME = "current"
+RELEASES_DIR_NAME = "releases"
+
+
+def get_static_snapshot_dir() -> Path:
+    """获取静态快照根目录（默认位于项目根目录/data/static）"""
+    if Config.STATIC_SNAPSHOT_DIR:
+        return Path(Config.STATIC_SNAPSHOT_DIR)
+    project_root = Path(__file__).parent.parent
+    return project_root / "data" / "static"
+
+
+def _encode_json(document: Dict[str, Any]) -> bytes:
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _write_precompressed(path: Path, body: bytes) -> None:
+    """写入原始文件及其 gzip/brotli 预压缩版本（供 Caddy precompressed 使用）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(body)
+    path.with_name(path.name + ".gz").write_bytes(gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        path.with_name(path.name + ".br").write_bytes(brotli.compress(body, quality=11))
+
+
+def _format_catalog_entry(station: Dict[str, Any]) -> Dict[str, Any]:
+    """与 /api/stations 的站点结构保持一致"""
+    return {
+        "id": station.get("hash_id"),
+        "name": station.get("name"),
+        "devdescript": station.get("name"),
+        "provider": station.get("provider"),
+        "campus_id": station.get("campus_id"),
+        "campus_name": station.get("campus_name"),
+        "latitude": station.get("lat"),
+        "longitude": station.get("lon"),
+        "devids": station.get("devids") or [],
+    }
+
+
+def _group_by(stations: Iterable[Dict[str, Any]], key: str) -> Dict[str, List[Dict[str, Any]]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for station in stations:
+        value = station.get(key)
+        if value is None:
+            continue
+        name = str(value)
+        if not SAFE_NAME_PATTERN.match(name):
+            continue
+        groups.setdefault(name, []).append(station)
+    return groups
+
+
+def _prune_releases(releases_dir: Path, keep: int, current_name: str) -> None:
+    releases = sorted(
+        (entry for entry in releases_dir.iterdir() if entry.is_dir()),
+        key=lambda entry: entry.name,
+    )
+    for entry in releases[:-keep] if keep > 0 else releases:
+        if entry.name == current_name:
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+
+
+def publish_static_snapshots(
+    payload: Dict[str, Any],
+    version: Optional[int] = None,
+    base_dir: Optional[Path] = None,
+) -> Optional[Path]:
+    """发布一轮静态快照文件
+
+    Args:
+        payload: /api/status 响应体（包含 updated_at 与 stations）
+        version: 快照版本号，缺省使用当前纳秒时间戳
+        base_dir: 静态文件根目录，缺省读取配置
+
+    Returns:
+        本轮 release 目录；失败返回 None
+    """
+    root = base_dir or get_static_snapshot_dir()
+    version = version or time.time_ns()
+    releases_dir = root / RELEASES_DIR_NAME
+    release_dir = releases_dir / str(version)
+    updated_at = payload.get("updated_at")
+    stations: List[Dict[str, Any]] = payload.get("stations", [])
+
+    try:
+        if release_dir.exists():
+            shutil.rmtree(release_dir)
+        release_dir.mkdir(parents=True)
+
+        _write_precompressed(release_dir / "status.json", _encode_json(payload))
+
+        for provider, group in _group_by(stations, "provider").items():
+            _write_precompressed(
+                release_dir / "provider" / f"{provider}.json",
+                _encode_json({"updated_at": updated_at, "stations": group}),
+            )
+
+        for campus_id, group in _group_by(stations, "campus_id").items():
+            _write_precompressed(
+                release_dir / "campus" / f"{campus_id}.json",
+                _encode_json({"updated_at": updated_at, "stations": group}),
+            )
+
+        catalog = [_format_catalog_entry(station) for station in stations]
+        _write_precompressed(
+            release_dir / "stations.json",
+            _encode_json({"updated_at": updated_at, "stations": catalog}),
+        )
+
+        # 原子切换 current 符号链接（使用相对路径，便于整体迁移目录）
+        tmp_link = root / f".{CURRENT_LINK_NAME}.{version}.tmp"
+        if tmp_link.is_symlink() or tmp_link.exists():
+            tmp_link.unlink()
+        os.symlink(Path(RELEASES_DIR_NAME) / str(version), tmp_link)
+        os.replace(tmp_link, root / CURRENT_LINK_NAME)
+
+        _prune_releases(releases_dir, Config.STATIC_SNAPSHOT_KEEP, release_dir.name)
+        return release_dir
+    except Exception as exc:
+        logfire.error(
+            "发布静态快照失败: {error}",
+            error=str(exc),
+            release_dir=str(release_dir),
+        )
+        return None
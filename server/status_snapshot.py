@@ -0,0 +1,122 @@
+"""状态快照文件：抓取成功后原子写入，API 启动时预加载
+
+快照文件与数据库相互独立，API 进程可以在打开数据库之前就加载它，
+从而在冷启动后立即响应 /api/status，并在 latest 表不可用时作为兜底数据源。
+"""
+
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import logfire
+
+from server.config import Config
+from server.logfire_setup import ensure_logfire_configured
+
+ensure_logfire_configured()
+
+# 文件格式版本，结构不兼容变更时递增
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+def _now_utc8_iso() -> str:
+    tz_utc_8 = timezone(timedelta(hours=8))
+    return datetime.now(tz_utc_8).isoformat()
+
+
+def get_snapshot_path() -> Path:
+    """获取状态快照文件路径（默认位于项目根目录/data 下）"""
+    if Config.STATUS_SNAPSHOT_PATH:
+        return Path(Config.STATUS_SNAPSHOT_PATH)
+    project_root = Path(__file__).parent.parent
+    return project_root / "data" / "status_snapshot.json"
+
+
+def write_status_snapshot(payload: Dict[str, Any], path: Optional[Path] = None) -> Optional[int]:
+    """原子写入状态快照文件
+
+    先写入同目录下的临时文件并 fsync，再通过 os.replace 替换目标文件，
+    读取方不会看到写了一半的内容。
+
+    Returns:
+        快照版本号（纳秒时间戳），写入失败返回 None
+    """
+    target = path or get_snapshot_path()
+    version = time.time_ns()
+    document = {
+        "format": SNAPSHOT_FORMAT_VERSION,
+        "version": version,
+        "written_at": _now_utc8_iso(),
+        "payload": payload,
+    }
+
+    tmp_name: Optional[str] = None
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=target.parent,
+            prefix=f".{target.name}.",
+            suffix=".tmp",
+            delete=False,
+        ) as fp:
+            tmp_name = fp.name
+            json.dump(document, fp, ensure_ascii=False, separators=(",", ":"))
+            fp.flush()
+            os.fsync(fp.fileno())
+        # NamedTemporaryFile 默认权限为 0600，这里放宽为常规文件权限
+        os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, target)
+        tmp_name = None
+        return version
+    except Exception as exc:
+        logfire.error("写入状态快照文件失败: {error}", error=str(exc), path=str(target))
+        return None
+    finally:
+        if tmp_name:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+
+
+def load_status_snapshot(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """读取状态快照文件
+
+    Returns:
+        {"version": int, "written_at": str, "payload": Dict}，文件缺失或损坏时返回 None
+    """
+    target = path or get_snapshot_path()
+    if not target.exists():
+        return None
+
+    try:
+        with target.open("r", encoding="utf-8") as fp:
+            document = json.load(fp)
+    except (OSError, json.JSONDecodeError) as exc:
+        logfire.warn("读取状态快照文件失败: {error}", error=str(exc), path=str(target))
+        return None
+
+    if not isinstance(document, dict) or document.get("format") != SNAPSHOT_FORMAT_VERSION:
+        logfire.warn(
+            "状态快照文件格式不兼容，忽略: {path}",
+            path=str(target),
+        )
+        return None
+
+    payload = document.get("payload")
+    stations: Optional[List[Any]] = payload.get("stations") if isinstance(payload, dict) else None
+    if not isinstance(stations, list):
+        logfire.warn("状态快照文件缺少站点数据，忽略: {path}", path=str(target))
+        return None
+
+    return {
+        "version": document.get("version"),
+        "written_at": document.get("written_at"),
+        "payload": payload,
+    }
@@ -0,0 +1,15 @@
+"""测试公共配置：在导入 server / fetcher 模块前关闭 logfire 上报，并把数据文件重定向到临时目录"""
+
+import os
+import tempfile
+from pathlib import Path
+
+_DATA_DIR = Path(tempfile.mkdtemp(prefix="zju-charger-tests-"))
+
+os.environ["LOGFIRE_SEND_TO_LOGFIRE"] = "false"
+os.environ["LOGFIRE_CONSOLE"] = "false"
+os.environ["RATE_LIMIT_STORAGE_URI"] = "memory://"
+os.environ["SQLITE_DB_PATH"] = str(_DATA_DIR / "zju_charger.db")
+os.environ["STATION_CATALOG_CACHE_PATH"] = str(_DATA_DIR / "station_catalog.bin")
+os.environ["DEVICE_HEALTH_STATE_PATH"] = str(_DATA_DIR / "device_health.json")
+os.environ["SHARED_STATUS_PATH"] = str(_DATA_DIR / "status_table.bin")
@@ -0,0 +1,148 @@
+import os
+
+import pytest
+
+from fetcher import catalog as catalog_module
+from fetcher.catalog import CatalogDiff, StationCatalogStore
+
+HEADER = "name,provider,campus,lon,lat,device_ids\n"
+
+
+def write_csv(path, rows, bump_ns=0):
+    path.write_text(HEADER + "".join(rows), encoding="utf-8")
+    if bump_ns:
+        # 保证签名变化，不依赖文件系统的 mtime 精度
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + bump_ns))
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    directory = tmp_path / "data"
+    directory.mkdir()
+    write_csv(
+        directory / "neptune_stations.csv",
+        [
+            '教三北侧,neptune,1,120.1,30.2,"[8120]"\n',
+            '图书馆东侧,neptune,2,120.2,30.3,"[8121,8122]"\n',
+        ],
+    )
+    write_csv(directory / "dlmm_stations.csv", ['菜鸟驿站北侧,dlmm,4,120.1,30.2,"[32101149]"\n'])
+    return directory
+
+
+def make_store(data_dir):
+    return StationCatalogStore(data_dir=data_dir, cache_path=data_dir.parent / "catalog.bin")
+
+
+def names(stations):
+    return sorted(station.name for station in stations)
+
+
+def test_load_compiles_and_skips_invalid_rows(data_dir):
+    write_csv(
+        data_dir / "else_stations.csv",
+        [
+            '无设备站点,万充科技,4,120.1,30.2,"[]"\n',
+            '正常站点,万充科技,4,120.1,30.2,"[1]"\n',
+            '正常站点,万充科技,4,120.1,30.2,"[2]"\n',
+        ],
+    )
+    store = make_store(data_dir)
+
+    assert names(store.stations_for("neptune_stations.csv")) == ["图书馆东侧", "教三北侧"]
+    assert [s.device_ids for s in store.stations_for("else_stations.csv")] == [["1"]]
+    assert store.stations_for("missing.csv") == []
+
+
+def test_cached_catalog_is_reused_without_recompiling(data_dir, monkeypatch):
+    make_store(data_dir).load()
+
+    def fail(path):
+        raise AssertionError(f"unexpected recompile of {path}")
+
+    monkeypatch.setattr(catalog_module, "compile_csv", fail)
+    store = make_store(data_dir)
+    assert len(store.stations_for("dlmm_stations.csv")) == 1
+
+
+def test_check_reload_without_changes_returns_empty_diff(data_dir):
+    store = make_store(data_dir)
+    store.load()
+
+    diff = store.check_reload()
+
+    assert not diff
+    assert diff.counts() == {"added": 0, "changed": 0, "removed": 0}
+
+
+def test_touch_only_reload_keeps_station_instances(data_dir):
+    store = make_store(data_dir)
+    before = store.stations_for("neptune_stations.csv")
+    path = data_dir / "neptune_stations.csv"
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    assert not store.check_reload()
+    after = store.stations_for("neptune_stations.csv")
+    assert all(a is b for a, b in zip(before, after))
+
+
+def test_check_reload_reports_added_changed_and_removed(data_dir):
+    store = make_store(data_dir)
+    before = {s.name: s for s in store.stations_for("neptune_stations.csv")}
+    write_csv(
+        data_dir / "neptune_stations.csv",
+        [
+            # 设备变化
+            '教三北侧,neptune,1,120.1,30.2,"[8120,8123]"\n',
+            # 图书馆东侧被删除，新增一个站点
+            '体育馆南侧,neptune,2,120.3,30.4,"[8130]"\n',
+        ],
+        bump_ns=10**9,
+    )
+
+    diff = store.check_reload()
+
+    assert diff
+    assert diff.files == ["neptune_stations.csv"]
+    assert diff.counts() == {"added": 1, "changed": 1, "removed": 1}
+    assert names(diff.added["neptune_stations.csv"]) == ["体育馆南侧"]
+    assert [s.device_ids for s in diff.changed["neptune_stations.csv"]] == [["8120", "8123"]]
+    assert diff.removed["neptune_stations.csv"] == [before["图书馆东侧"].hash_id]
+    assert names(store.stations_for("neptune_stations.csv")) == ["体育馆南侧", "教三北侧"]
+    # 未改动的文件不出现在差异中，站点实例沿用
+    assert store.stations_for("dlmm_stations.csv")[0].name == "菜鸟驿站北侧"
+
+
+def test_check_reload_handles_added_and_deleted_files(data_dir):
+    store = make_store(data_dir)
+    dlmm_ids = [s.hash_id for s in store.stations_for("dlmm_stations.csv")]
+    (data_dir / "dlmm_stations.csv").unlink()
+    write_csv(data_dir / "else_stations.csv", ['西六南侧,万充科技,4,120.1,30.2,"[18481746]"\n'])
+
+    diff = store.check_reload()
+
+    assert diff.removed == {"dlmm_stations.csv": dlmm_ids}
+    assert names(diff.added["else_stations.csv"]) == ["西六南侧"]
+    assert diff.files == ["dlmm_stations.csv", "else_stations.csv"]
+    assert not store.has_source("dlmm_stations.csv")
+    assert store.has_source("else_stations.csv")
+
+
+def test_reloaded_catalog_is_persisted(data_dir):
+    store = make_store(data_dir)
+    store.load()
+    write_csv(
+        data_dir / "dlmm_stations.csv",
+        ['菜鸟驿站南侧,dlmm,4,120.1,30.2,"[32101150]"\n'],
+        bump_ns=10**9,
+    )
+    store.check_reload()
+
+    assert names(make_store(data_dir).stations_for("dlmm_stations.csv")) == ["菜鸟驿站南侧"]
+
+
+def test_empty_diff_is_falsy():
+    assert not CatalogDiff()
+    assert CatalogDiff(removed={"a.csv": ["deadbeef"]})
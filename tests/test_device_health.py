@@ -0,0 +1,120 @@
+from fetcher.device_health import DeviceHealthTracker, DeviceQuarantinedError
+from fetcher.station import Station
+
+
+def make_tracker(**kwargs):
+    options = {"failure_threshold": 3, "base_interval": 100, "max_interval": 350, "enabled": True}
+    options.update(kwargs)
+    return DeviceHealthTracker(**options)
+
+
+def fail(tracker, times, now, device_id="1001"):
+    for _ in range(times):
+        tracker.record("dlmm", device_id, ok=False, error="timeout", now=now)
+
+
+def test_quarantine_after_consecutive_failures():
+    tracker = make_tracker()
+    fail(tracker, 2, now=0.0)
+    assert not tracker.is_quarantined("dlmm", "1001")
+    assert tracker.should_fetch("dlmm", "1001", now=1.0)
+
+    fail(tracker, 1, now=10.0)
+
+    assert tracker.quarantined_devices() == [("dlmm", "1001")]
+    assert not tracker.should_fetch("dlmm", "1001", now=50.0)
+    assert tracker.skipped == 1
+    # 到达重新探测时间后放行一次
+    assert tracker.should_fetch("dlmm", "1001", now=110.0)
+
+
+def test_success_resets_failure_count():
+    tracker = make_tracker()
+    fail(tracker, 2, now=0.0)
+    tracker.record("dlmm", "1001", ok=True)
+    fail(tracker, 2, now=1.0)
+
+    assert not tracker.is_quarantined("dlmm", "1001")
+
+
+def test_probe_interval_doubles_up_to_max():
+    tracker = make_tracker()
+    fail(tracker, 3, now=0.0)
+    intervals = [tracker._devices[("dlmm", "1001")].probe_interval]
+    now = 0.0
+    for _ in range(3):
+        now = tracker._devices[("dlmm", "1001")].next_probe_at
+        assert tracker.should_fetch("dlmm", "1001", now=now)
+        fail(tracker, 1, now=now)
+        intervals.append(tracker._devices[("dlmm", "1001")].probe_interval)
+
+    assert intervals == [100.0, 200.0, 350.0, 350.0]
+    assert tracker._devices[("dlmm", "1001")].next_probe_at == now + 350.0
+
+
+def test_successful_probe_lifts_quarantine():
+    tracker = make_tracker()
+    fail(tracker, 3, now=0.0)
+    assert tracker.should_fetch("dlmm", "1001", now=100.0)
+
+    tracker.record("dlmm", "1001", ok=True)
+
+    assert tracker.quarantined_devices() == []
+    assert tracker.should_fetch("dlmm", "1001", now=101.0)
+    assert tracker.snapshot()["failing_count"] == 0
+
+
+def test_disabled_tracker_never_skips():
+    tracker = make_tracker(enabled=False)
+    fail(tracker, 10, now=0.0)
+
+    assert tracker.should_fetch("dlmm", "1001", now=1.0)
+    assert tracker.quarantined_devices() == []
+
+
+def test_quarantined_error_mentions_device():
+    tracker = make_tracker()
+    fail(tracker, 3, now=0.0)
+
+    error = tracker.quarantined_error("dlmm", "1001")
+
+    assert isinstance(error, DeviceQuarantinedError)
+    assert "1001" in str(error) and "dlmm" in str(error)
+
+
+def test_degraded_stations_and_state_round_trip(tmp_path):
+    tracker = make_tracker()
+    fail(tracker, 3, now=0.0, device_id="1001")
+    fail(tracker, 1, now=0.0, device_id="1002")
+    station = Station(
+        name="菜鸟驿站北侧", provider="dlmm", campus_id=4, device_ids=["1001", "1002"]
+    )
+
+    degraded = tracker.degraded_stations([station])
+    assert degraded == [
+        {
+            "hash_id": station.hash_id,
+            "name": "菜鸟驿站北侧",
+            "provider": "dlmm",
+            "quarantined_devices": ["1001"],
+            "device_count": 2,
+            "all_quarantined": False,
+        }
+    ]
+
+    path = tmp_path / "device_health.json"
+    tracker.save([station], path)
+    restored = make_tracker()
+    restored.load(path)
+
+    assert restored.quarantined_devices() == [("dlmm", "1001")]
+    assert not restored.should_fetch("dlmm", "1001", now=50.0)
+    snapshot = restored.snapshot()
+    assert snapshot["quarantined_count"] == 1
+    assert snapshot["failing_count"] == 2
+
+
+def test_load_ignores_missing_state(tmp_path):
+    tracker = make_tracker()
+    tracker.load(tmp_path / "missing.json")
+    assert tracker.snapshot()["devices"] == []
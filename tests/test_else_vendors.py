@@ -0,0 +1,145 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from fetcher.device_health import DeviceHealthTracker
+from fetcher.providers import else_vendors
+from fetcher.providers.else_provider import ElseProvider
+from fetcher.providers.else_vendors import SubVendorAdapter, VendorPolicy
+from fetcher.station import Station
+
+ENV_PREFIX = "PROVIDER_ELSE_PROVIDER_TESTVENDOR_"
+
+
+class StubAdapter(SubVendorAdapter):
+    """按设备号决定行为的测试子厂商：slow-* 永不返回，flaky-* 首次网络错误"""
+
+    name = "测试厂商"
+    key = "testvendor"
+    default_policy = VendorPolicy(concurrency=4, timeout=1.0, retries=1, backoff=0.0, deadline=0.2)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def request_device(self, device_id, session, timeout):
+        self.calls.append(device_id)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if device_id.startswith("slow"):
+                await asyncio.sleep(10)
+            if device_id.startswith("flaky") and self.calls.count(device_id) == 1:
+                raise aiohttp.ClientConnectionError("reset")
+            await asyncio.sleep(0.01)
+            return {"total": 2, "free": 1, "used": 1, "error": 0}
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture(autouse=True)
+def fresh_tracker(monkeypatch):
+    tracker = DeviceHealthTracker(failure_threshold=3, base_interval=60, enabled=True)
+    monkeypatch.setattr(else_vendors, "get_device_health_tracker", lambda: tracker)
+    return tracker
+
+
+@pytest.fixture
+def stub_vendor(monkeypatch):
+    monkeypatch.setitem(else_vendors.SUB_VENDOR_ADAPTERS, StubAdapter.name, StubAdapter)
+
+
+def station(name, *device_ids):
+    return Station(name=name, provider=StubAdapter.name, campus_id=4, device_ids=list(device_ids))
+
+
+def test_with_overrides_reads_environment(monkeypatch):
+    monkeypatch.setenv(ENV_PREFIX + "TIMEOUT", "8")
+    monkeypatch.setenv(ENV_PREFIX + "CONCURRENCY", "2")
+
+    policy = VendorPolicy().with_overrides("testvendor")
+
+    assert policy == VendorPolicy(concurrency=2, timeout=8.0)
+    assert isinstance(policy.concurrency, int)
+    assert StubAdapter().policy.concurrency == 2
+
+
+def test_invalid_override_keeps_default(monkeypatch):
+    monkeypatch.setenv(ENV_PREFIX + "DEADLINE", "soon")
+    monkeypatch.setenv(ENV_PREFIX + "RETRIES", "1.5")
+    monkeypatch.setenv(ENV_PREFIX + "BACKOFF", "0.25")
+
+    policy = VendorPolicy().with_overrides("testvendor")
+
+    assert policy.deadline == VendorPolicy().deadline
+    assert policy.retries == VendorPolicy().retries
+    assert policy.backoff == 0.25
+
+
+def test_missing_overrides_return_same_policy(monkeypatch):
+    monkeypatch.setenv(ENV_PREFIX + "TIMEOUT", "")
+    base = VendorPolicy()
+
+    assert base.with_overrides("testvendor") is base
+    assert base.with_overrides("othervendor") is base
+
+
+def test_retryable_errors_are_retried_and_counted():
+    adapter = StubAdapter()
+
+    counts, exc = asyncio.run(adapter.fetch_device_status("flaky-1", None))
+
+    assert exc is None and counts["total"] == 2
+    assert adapter.metrics.retries == 1
+    assert adapter.metrics.requests == 2 and adapter.metrics.failures == 1
+
+
+def test_concurrency_is_limited_per_vendor(monkeypatch):
+    monkeypatch.setenv(ENV_PREFIX + "CONCURRENCY", "1")
+    adapter = StubAdapter()
+
+    totals = asyncio.run(adapter.fetch_station_status(["a", "b", "c"], None))
+
+    assert totals["total"] == 6
+    assert adapter.max_in_flight == 1
+
+
+def test_deadline_marks_pending_stations_without_raising(stub_vendor):
+    provider = ElseProvider()
+    stations = [station("快站点", "fast-1", "fast-2"), station("慢站点", "fast-3", "slow-1")]
+    adapter = provider._adapter_for(stations[0])
+
+    results = asyncio.run(provider._fetch_vendor(adapter, stations, None))
+
+    assert results[0] == {"total": 4, "free": 2, "used": 2, "error": 0}
+    assert results[1] is None
+    assert adapter.metrics.timed_out_stations == 1
+    assert adapter.metrics.as_attributes()["timed_out_stations"] == 1
+
+
+def test_fetch_status_reports_timed_out_stations_as_zero(stub_vendor):
+    provider = ElseProvider()
+    provider.station_list = [station("快站点", "fast-1"), station("慢站点", "slow-1")]
+
+    rows = asyncio.run(provider.fetch_status(None))
+
+    by_name = {row["name"]: row for row in rows}
+    assert by_name["快站点"]["total"] == 2
+    assert (by_name["慢站点"]["free"], by_name["慢站点"]["total"]) == (0, 0)
+    assert by_name["慢站点"]["provider"] == StubAdapter.name
+
+
+def test_begin_cycle_resets_metrics(stub_vendor):
+    provider = ElseProvider()
+    stations = [station("慢站点", "slow-1")]
+    adapter = provider._adapter_for(stations[0])
+    asyncio.run(provider._fetch_vendor(adapter, stations, None))
+    assert adapter.metrics.timed_out_stations == 1
+
+    asyncio.run(provider._fetch_vendor(adapter, [station("快站点", "fast-1")], None))
+
+    assert adapter.metrics.timed_out_stations == 0
+    assert adapter.metrics.requests == 1
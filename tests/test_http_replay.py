@@ -0,0 +1,114 @@
+import json
+
+from fetcher.http_replay import (
+    FixtureStore,
+    canonical_body,
+    canonical_query,
+    fixture_key,
+    fixture_response_body,
+    redact_response_body,
+)
+
+HOST = "api.example.com"
+
+
+def recorded_request(path: str, query: str = "", body: str = "", method: str = "GET"):
+    return {
+        "key": fixture_key(HOST, method, path, query, body),
+        "scheme": "https",
+        "host": HOST,
+        "method": method,
+        "path": path,
+        "query": query,
+        "content_type": "",
+        "body": body,
+    }
+
+
+def test_canonical_query_sorts_and_redacts():
+    assert canonical_query("b=2&Token=abc&a=1&a=0") == "Token=%2A%2A%2A&a=0&a=1&b=2"
+    # 不同凭据得到同一个规范化结果
+    assert canonical_query("openid=x&id=1") == canonical_query("id=1&openid=y")
+
+
+def test_canonical_body_normalizes_form_and_json():
+    assert canonical_body(b"", "application/json") == ""
+    assert (
+        canonical_body(b"z=1&password=hunter2&a=2", "application/x-www-form-urlencoded")
+        == "a=2&password=%2A%2A%2A&z=1"
+    )
+    first = canonical_body(b'{"b": 1, "a": {"access_token": "t1"}}', "application/json")
+    second = canonical_body(b'{"a": {"access_token": "t2"}, "b": 1}', "application/json")
+    assert first == second == '{"a":{"access_token":"***"},"b":1}'
+    assert canonical_body(b"not json", "application/json") == "not json"
+
+
+def test_fixture_key_ignores_host_and_method_case():
+    assert fixture_key("API.example.com", "get", "/x", "", "") == fixture_key(
+        HOST, "GET", "/x", "", ""
+    )
+    assert fixture_key(HOST, "GET", "/x", "a=1", "") != fixture_key(HOST, "GET", "/x", "a=2", "")
+
+
+def test_redact_response_body():
+    body = json.dumps(
+        {"code": 0, "data": {"token": "secret", "users": [{"OpenId": "o1", "name": "n"}]}}
+    ).encode()
+    redacted = json.loads(redact_response_body(body))
+    assert redacted["data"]["token"] == "***"
+    assert redacted["data"]["users"] == [{"OpenId": "***", "name": "n"}]
+
+    untouched = b'{"code": 0, "data": [1, 2]}'
+    assert redact_response_body(untouched) is untouched
+    assert redact_response_body(b"<html></html>") == b"<html></html>"
+    assert redact_response_body(b"42") == b"42"
+
+
+def test_store_round_trip_and_exact_match(tmp_path):
+    store = FixtureStore(tmp_path)
+    store.save(recorded_request("/device", "id=1"), 200, "application/json", b'{"free": 1}')
+    store.save(recorded_request("/device", "id=2"), 200, "application/json", b'{"free": 2}')
+    store.save(recorded_request("/logo"), 200, "image/png", b"\x89PNG\xff")
+
+    loaded = FixtureStore(tmp_path)
+    assert loaded.load() == 3
+    assert len(loaded) == 3
+
+    document = loaded.match(HOST, "GET", "/device", "id=2", "")
+    assert fixture_response_body(document) == b'{"free": 2}'
+    assert document["response"]["status"] == 200
+    assert fixture_response_body(loaded.match(HOST, "GET", "/logo", "", "")) == b"\x89PNG\xff"
+
+
+def test_match_falls_back_to_same_path(tmp_path):
+    store = FixtureStore(tmp_path)
+    store.save(recorded_request("/device", "id=1"), 200, "application/json", b'{"free": 1}')
+    store.load()
+
+    fallback = store.match(HOST, "GET", "/device", "id=999", "")
+    assert fixture_response_body(fallback) == b'{"free": 1}'
+    assert store.match(HOST, "POST", "/device", "id=1", "") is None
+    assert store.match("other.example.com", "GET", "/device", "id=1", "") is None
+
+
+def test_recording_again_overwrites_fixture(tmp_path):
+    store = FixtureStore(tmp_path)
+    request = recorded_request("/device", "id=1")
+    first = store.save(request, 200, "application/json", b'{"free": 1}')
+    second = store.save(request, 200, "application/json", b'{"free": 0}')
+
+    assert first == second
+    store.load()
+    assert len(store) == 1
+    assert fixture_response_body(store.match(HOST, "GET", "/device", "id=1", "")) == (
+        b'{"free": 0}'
+    )
+
+
+def test_load_skips_unreadable_and_foreign_fixtures(tmp_path):
+    host_dir = tmp_path / "api.example.com"
+    host_dir.mkdir()
+    (host_dir / "broken.json").write_text("{", encoding="utf-8")
+    (host_dir / "old.json").write_text(json.dumps({"format": 0}), encoding="utf-8")
+
+    assert FixtureStore(tmp_path).load() == 0
@@ -0,0 +1,105 @@
+import pytest
+
+from fetcher.port_state import (
+    ERROR,
+    FREE,
+    MAX_PORTS_PER_DEVICE,
+    UNKNOWN,
+    USED,
+    decode_station_ports,
+    diff_station_ports,
+    encode_station_ports,
+    pack_states,
+    states_from_codes,
+    states_to_string,
+    unpack_states,
+)
+
+CYCLE = [FREE, USED, ERROR, UNKNOWN]
+
+
+def states(count):
+    # 按 5 取模，使每个字节内的端口状态组合都不相同
+    return [CYCLE[index % 5 % 4] for index in range(count)]
+
+
+@pytest.mark.parametrize("count", [0, 1, 3, 4, 5, 8, 9, 10, 254, 255])
+def test_single_device_round_trip(count):
+    device = states(count)
+    blob = encode_station_ports([device])
+
+    assert len(blob) == 1 + (count + 3) // 4
+    assert blob[0] == count
+    assert decode_station_ports(blob) == [device]
+
+
+def test_pack_layout_is_little_endian_within_byte():
+    # 端口 0 在最低两位
+    assert pack_states([USED]) == b"\x01"
+    assert pack_states([FREE, USED, ERROR, UNKNOWN]) == bytes([0b11_10_01_00])
+    assert pack_states([UNKNOWN] * 5) == b"\xff\x03"
+    assert unpack_states(b"\xff\x03", 5) == [UNKNOWN] * 5
+
+
+def test_ports_beyond_limit_are_truncated():
+    device = states(MAX_PORTS_PER_DEVICE + 10)
+
+    blob = encode_station_ports([device, [USED]])
+
+    decoded = decode_station_ports(blob)
+    assert decoded == [device[:MAX_PORTS_PER_DEVICE], [USED]]
+
+
+def test_failed_devices_encode_as_zero_ports():
+    blob = encode_station_ports([None, [FREE, USED], []])
+
+    assert blob == b"\x00\x02\x04\x00"
+    assert decode_station_ports(blob) == [[], [FREE, USED], []]
+
+
+def test_mixed_devices_round_trip():
+    devices = [states(4), states(5), [], states(1), states(10), states(255)]
+
+    assert decode_station_ports(encode_station_ports(devices)) == devices
+
+
+def test_empty_blob_decodes_to_no_devices():
+    assert decode_station_ports(None) == []
+    assert decode_station_ports(b"") == []
+    assert encode_station_ports([]) == b""
+
+
+def test_diff_identical_blobs_is_empty():
+    blob = encode_station_ports([states(10), [USED]])
+    assert diff_station_ports(blob, bytes(blob)) == []
+    assert diff_station_ports(None, None) == []
+
+
+def test_diff_reports_changed_ports():
+    previous = encode_station_ports([[FREE, FREE, FREE, FREE, FREE], [USED]])
+    current = encode_station_ports([[FREE, FREE, FREE, FREE, USED], [ERROR]])
+
+    assert diff_station_ports(previous, current) == [(0, 4, FREE, USED), (1, 0, USED, ERROR)]
+
+
+def test_diff_when_device_appears_or_disappears():
+    one = encode_station_ports([[FREE, USED]])
+    two = encode_station_ports([[FREE, USED], [FREE, USED, UNKNOWN]])
+
+    # 新增设备的端口与 UNKNOWN 比较，状态本就是 UNKNOWN 的端口不算变化
+    assert diff_station_ports(one, two) == [(1, 0, UNKNOWN, FREE), (1, 1, UNKNOWN, USED)]
+    assert diff_station_ports(two, one) == [(1, 0, FREE, UNKNOWN), (1, 1, USED, UNKNOWN)]
+    assert diff_station_ports(None, one) == [(0, 0, UNKNOWN, FREE), (0, 1, UNKNOWN, USED)]
+
+
+def test_diff_when_device_fails():
+    previous = encode_station_ports([[FREE, USED], [USED]])
+    current = encode_station_ports([None, [USED]])
+
+    assert diff_station_ports(previous, current) == [(0, 0, FREE, UNKNOWN), (0, 1, USED, UNKNOWN)]
+
+
+def test_provider_code_helpers():
+    mapping = {"0": FREE, "1": USED, "3": ERROR}
+    assert states_from_codes("0139", mapping, UNKNOWN) == [FREE, USED, ERROR, UNKNOWN]
+    assert states_to_string([FREE, USED, ERROR, UNKNOWN]) == "0123"
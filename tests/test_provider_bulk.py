@@ -0,0 +1,143 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+from fetcher.device_health import DeviceHealthTracker
+from fetcher.providers import provider_base
+from fetcher.providers.provider_base import ProviderBase
+from fetcher.station import Station
+
+
+class StubProvider(ProviderBase):
+    """批量接口只返回部分设备的服务商"""
+
+    supports_bulk_status = True
+
+    def __init__(self, stations, bulk_result=None, bulk_error=None):
+        super().__init__(station_list=stations)
+        self.bulk_result = bulk_result or {}
+        self.bulk_error = bulk_error
+        self.bulk_calls = []
+        self.device_calls = Counter()
+
+    @property
+    def provider(self):
+        return "stub"
+
+    async def fetch_bulk_status(self, device_ids, session):
+        self.bulk_calls.append(list(device_ids))
+        if self.bulk_error is not None:
+            raise self.bulk_error
+        return {d: data for d, data in self.bulk_result.items()}
+
+    async def fetch_device_status(self, station, device_id, session):
+        self.device_calls[device_id] += 1
+        return {"device_id": device_id, "source": "single"}, None
+
+    async def fetch_station_list(self, session):
+        return []
+
+    async def fetch_station_status(self, station, session, device_results=None):
+        return None, None
+
+    async def fetch_status(self, session):
+        return []
+
+
+@pytest.fixture(autouse=True)
+def fresh_tracker(monkeypatch):
+    tracker = DeviceHealthTracker(failure_threshold=1, base_interval=60, enabled=True)
+    monkeypatch.setattr(provider_base, "get_device_health_tracker", lambda: tracker)
+    return tracker
+
+
+def make_stations():
+    return [
+        Station(name="站点一", provider="stub", campus_id=1, device_ids=["d1", "d2", "shared"]),
+        Station(name="站点二", provider="stub", campus_id=2, device_ids=["shared", "d3"]),
+    ]
+
+
+def bulk(*device_ids):
+    return {device_id: {"device_id": device_id, "source": "bulk"} for device_id in device_ids}
+
+
+def collect(provider):
+    return asyncio.run(provider.collect_device_statuses(session=None))
+
+
+def sources(results):
+    return {device_id: data["source"] for device_id, (data, exc) in results.items()}
+
+
+def test_bulk_gaps_are_filled_per_device():
+    provider = StubProvider(make_stations(), bulk_result=bulk("d1", "shared"))
+
+    results = collect(provider)
+
+    assert provider.bulk_calls == [["d1", "d2", "shared", "d3"]]
+    assert provider.device_calls == Counter({"d2": 1, "d3": 1})
+    assert sources(results) == {"d1": "bulk", "shared": "bulk", "d2": "single", "d3": "single"}
+
+
+def test_shared_device_ids_are_requested_once():
+    provider = StubProvider(make_stations(), bulk_result=bulk("d1"))
+
+    collect(provider)
+
+    assert provider.bulk_calls[0].count("shared") == 1
+    assert provider.device_calls["shared"] == 1
+
+
+def test_bulk_results_for_unknown_or_empty_devices_are_ignored():
+    result = {**bulk("d1", "other"), "d2": None}
+    provider = StubProvider(make_stations(), bulk_result=result)
+
+    results = collect(provider)
+
+    assert "other" not in results
+    assert provider.device_calls == Counter({"d2": 1, "shared": 1, "d3": 1})
+
+
+def test_bulk_exception_falls_back_to_per_device_calls():
+    provider = StubProvider(make_stations(), bulk_error=RuntimeError("region api down"))
+
+    results = collect(provider)
+
+    assert len(provider.bulk_calls) == 1
+    assert provider.device_calls == Counter({"d1": 1, "d2": 1, "shared": 1, "d3": 1})
+    assert set(sources(results).values()) == {"single"}
+
+
+def test_bulk_is_skipped_when_not_supported():
+    provider = StubProvider(make_stations(), bulk_result=bulk("d1"))
+    provider.supports_bulk_status = False
+
+    collect(provider)
+
+    assert provider.bulk_calls == []
+    assert sum(provider.device_calls.values()) == 4
+
+
+def test_quarantined_devices_are_not_fetched_individually(fresh_tracker):
+    fresh_tracker.record("stub", "d3", ok=False, error="timeout")
+    provider = StubProvider(make_stations(), bulk_result=bulk("d1", "shared"))
+
+    results = collect(provider)
+
+    assert "d3" not in provider.device_calls
+    data, exc = results["d3"]
+    assert data is None and exc is not None
+    assert fresh_tracker.skipped == 1
+
+
+def test_device_statuses_for_reuses_prefetched_results():
+    stations = make_stations()
+    provider = StubProvider(stations, bulk_result=bulk("d1", "d2", "shared"))
+    prefetched = {d: (data, None) for d, data in bulk("d1", "shared").items()}
+
+    statuses = asyncio.run(provider.device_statuses_for(stations[0], None, prefetched))
+
+    assert [data["source"] for data, _ in statuses] == ["bulk", "single", "bulk"]
+    assert provider.device_calls == Counter({"d2": 1})
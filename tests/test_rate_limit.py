@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from server.rate_limit import (
+    BucketStore,
+    ClientIdentifier,
+    MemoryBucketStore,
+    RateLimitExceeded,
+    SQLiteBucketStore,
+    TokenBucketLimiter,
+    create_bucket_store,
+    parse_networks,
+    parse_rate_rules,
+)
+
+
+def make_request(peer: str, headers=None) -> Request:
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/status",
+            "headers": raw_headers,
+            "client": (peer, 12345),
+        }
+    )
+
+
+def test_parse_rate_rules_accepts_slowapi_syntax():
+    rules = parse_rate_rules("60/hour; 1000 per day;10 per 2 seconds")
+    assert [(rule.limit, rule.period) for rule in rules] == [
+        (60, 3600.0),
+        (1000, 86400.0),
+        (10, 2.0),
+    ]
+    assert rules[0].refill_rate == pytest.approx(60 / 3600)
+
+
+def test_parse_rate_rules_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_rate_rules("lots/minute")
+
+
+@pytest.mark.parametrize("store_factory", ["memory", "sqlite"])
+def test_bucket_consumes_and_refills(store_factory, tmp_path):
+    store = (
+        MemoryBucketStore()
+        if store_factory == "memory"
+        else SQLiteBucketStore(str(tmp_path / "rate_limit.db"))
+    )
+    rule = parse_rate_rules("2/minute")[0]
+
+    assert store.consume("k", rule, now=100.0)[0]
+    assert store.consume("k", rule, now=100.0)[0]
+    allowed, tokens, retry_after = store.consume("k", rule, now=100.0)
+    assert not allowed
+    assert tokens == pytest.approx(0.0)
+    assert retry_after == pytest.approx(30.0)
+
+    # 30 秒补充一个令牌
+    assert store.consume("k", rule, now=130.0)[0]
+    assert not store.consume("k", rule, now=130.0)[0]
+    # 其他键互不影响
+    assert store.consume("other", rule, now=130.0)[0]
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "rate_limit.db")
+    rule = parse_rate_rules("1/minute")[0]
+    assert SQLiteBucketStore(path).consume("k", rule, now=0.0)[0]
+    assert not SQLiteBucketStore(path).consume("k", rule, now=1.0)[0]
+
+
+def test_memory_store_purges_idle_buckets():
+    store = MemoryBucketStore()
+    rule = parse_rate_rules("5/minute")[0]
+    store.consume("old", rule, now=0.0)
+    store.consume("recent", rule, now=100.0)
+
+    store.purge_idle(older_than=50.0)
+
+    assert len(store) == 1
+    # 被清理的桶重新从满额开始
+    assert store.consume("old", rule, now=101.0)[1] == pytest.approx(4.0)
+
+
+def test_bucket_store_is_abstract():
+    with pytest.raises(TypeError):
+        BucketStore()
+
+
+def test_create_bucket_store_from_uri(tmp_path):
+    assert isinstance(create_bucket_store("memory://"), MemoryBucketStore)
+    assert isinstance(create_bucket_store(f"sqlite:///{tmp_path / 'limits.db'}"), SQLiteBucketStore)
+    with pytest.raises(ValueError):
+        create_bucket_store("ftp://example")
+
+
+def test_client_identifier_ignores_headers_from_untrusted_peers():
+    identify = ClientIdentifier(parse_networks("127.0.0.1"))
+    request = make_request("203.0.113.5", {"X-Forwarded-For": "198.51.100.1"})
+    assert identify(request) == "203.0.113.5"
+
+
+def test_client_identifier_skips_trusted_hops():
+    identify = ClientIdentifier(parse_networks("127.0.0.1,10.0.0.0/8"))
+    request = make_request("127.0.0.1", {"X-Forwarded-For": "1.2.3.4, 198.51.100.7, 10.0.0.2"})
+    assert identify(request) == "198.51.100.7"
+
+    real_ip_only = make_request("127.0.0.1", {"X-Real-IP": "198.51.100.8"})
+    assert identify(real_ip_only) == "198.51.100.8"
+
+
+def test_limiter_rejects_after_limit_and_separates_clients():
+    limiter = TokenBucketLimiter(MemoryBucketStore(), ClientIdentifier([]))
+    rules = parse_rate_rules("2/minute")
+
+    for _ in range(2):
+        limiter.check(make_request("198.51.100.1"), "status", rules)
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        limiter.check(make_request("198.51.100.1"), "status", rules)
+    assert excinfo.value.rule.limit == 2
+    assert excinfo.value.retry_after > 0
+
+    limiter.check(make_request("198.51.100.2"), "status", rules)
+
+
+def test_limiter_whitelist_bypasses_store():
+    store = MemoryBucketStore()
+    limiter = TokenBucketLimiter(store, ClientIdentifier([]), parse_networks("10.0.0.0/8"))
+    rules = parse_rate_rules("1/minute")
+
+    for _ in range(5):
+        limiter.check(make_request("10.1.2.3"), "status", rules)
+    assert len(store) == 0
+
+
+def test_limiter_fails_open_when_store_errors():
+    class BrokenStore(MemoryBucketStore):
+        def consume(self, key, rule, now, cost=1.0):
+            raise RuntimeError("database is locked")
+
+    limiter = TokenBucketLimiter(BrokenStore(), ClientIdentifier([]))
+    limiter.check(make_request("198.51.100.1"), "status", parse_rate_rules("1/minute"))
+
+
+def test_limiter_purges_idle_buckets_periodically(monkeypatch):
+    store = MemoryBucketStore()
+    limiter = TokenBucketLimiter(store, ClientIdentifier([]))
+    rules = parse_rate_rules("5/minute")
+    clock = [1000.0]
+    monkeypatch.setattr("server.rate_limit.time.time", lambda: clock[0])
+    limiter._last_purge = clock[0]
+
+    limiter.check(make_request("198.51.100.1"), "status", rules)
+    clock[0] += 400.0
+    limiter.check(make_request("198.51.100.2"), "status", rules)
+
+    assert len(store) == 1
+
+
+def test_limit_decorator_uses_thread_pool_for_blocking_store(tmp_path):
+    limiter = TokenBucketLimiter(
+        SQLiteBucketStore(str(tmp_path / "rate_limit.db")), ClientIdentifier([])
+    )
+
+    @limiter.limit("1/minute")
+    async def endpoint(request: Request):
+        return "ok"
+
+    request = make_request("198.51.100.1")
+    assert asyncio.run(endpoint(request=request)) == "ok"
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(endpoint(request=request))
@@ -0,0 +1,178 @@
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from server import response_cache
+from server.response_cache import (
+    MIN_COMPRESS_SIZE,
+    CachedBody,
+    ResponseCache,
+    build_encoded_response,
+    encode_json,
+    etag_matches,
+    negotiate_encoding,
+)
+
+LARGE_DOCUMENT = {"stations": [{"hash_id": f"{i:08x}", "free": i % 5} for i in range(200)]}
+
+
+@pytest.fixture
+def gzip_only(monkeypatch):
+    monkeypatch.setattr(response_cache, "_ENCODERS", {"gzip": response_cache._ENCODERS["gzip"]})
+
+
+def make_request(headers) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/status",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, "identity"),
+        ("", "identity"),
+        ("gzip", "gzip"),
+        ("GZIP, deflate", "gzip"),
+        ("deflate", "identity"),
+        ("gzip;q=0", "identity"),
+        ("gzip;q=abc", "identity"),
+        ("*", "gzip"),
+        ("*;q=0.5, gzip;q=0", "identity"),
+    ],
+)
+def test_negotiate_encoding_gzip(gzip_only, header, expected):
+    assert negotiate_encoding(header) == expected
+
+
+def test_negotiate_encoding_prefers_server_order_on_ties(monkeypatch):
+    # 不依赖可选的 brotli / zstandard，只验证协商逻辑
+    monkeypatch.setitem(response_cache._ENCODERS, "br", lambda body: body)
+    monkeypatch.setitem(response_cache._ENCODERS, "zstd", lambda body: body)
+    assert negotiate_encoding("gzip, deflate, br, zstd") == "br"
+    assert negotiate_encoding("gzip, zstd") == "zstd"
+    assert negotiate_encoding("br;q=0.5, gzip;q=0.8") == "gzip"
+    assert negotiate_encoding("*") == "br"
+
+
+def test_cached_body_compresses_once_per_encoding(gzip_only, monkeypatch):
+    entry = CachedBody(encode_json(LARGE_DOCUMENT))
+    calls = []
+    original = response_cache._ENCODERS["gzip"]
+    monkeypatch.setitem(
+        response_cache._ENCODERS, "gzip", lambda body: calls.append(1) or original(body)
+    )
+
+    first, encoding = entry.for_encoding("gzip")
+    second, _ = entry.for_encoding("gzip")
+
+    assert encoding == "gzip"
+    assert first is second
+    assert len(calls) == 1
+    assert gzip.decompress(first) == entry.body
+
+
+def test_small_or_unknown_encodings_fall_back_to_identity():
+    small = CachedBody(b'{"ok":true}')
+    assert len(small.body) < MIN_COMPRESS_SIZE
+    assert small.for_encoding("gzip") == (small.body, "identity")
+
+    large = CachedBody(encode_json(LARGE_DOCUMENT))
+    assert large.for_encoding("deflate") == (large.body, "identity")
+    assert large.encoded == {}
+
+
+def test_etag_depends_only_on_body():
+    body = encode_json(LARGE_DOCUMENT)
+    assert CachedBody(body).etag == CachedBody(body).etag
+    assert CachedBody(body).etag.startswith('W/"')
+    assert CachedBody(body).etag != CachedBody(body + b" ").etag
+
+
+def test_build_encoded_response_negotiates_and_sets_headers(gzip_only):
+    entry = CachedBody(encode_json(LARGE_DOCUMENT))
+
+    response = build_encoded_response(
+        make_request({"Accept-Encoding": "gzip"}), entry, headers={"Cache-Control": "no-cache"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == entry.etag
+    assert response.headers["cache-control"] == "no-cache"
+    assert gzip.decompress(response.body) == entry.body
+
+    plain = build_encoded_response(make_request({}), entry)
+    assert "content-encoding" not in plain.headers
+    assert plain.body == entry.body
+
+
+def test_build_encoded_response_returns_304_for_matching_etag():
+    entry = CachedBody(encode_json(LARGE_DOCUMENT))
+
+    response = build_encoded_response(
+        make_request({"If-None-Match": entry.etag, "Accept-Encoding": "gzip"}), entry
+    )
+
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["etag"] == entry.etag
+
+    stale = build_encoded_response(make_request({"If-None-Match": 'W/"stale"'}), entry)
+    assert stale.status_code == 200
+
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put(1, "all", CachedBody(b"a"))
+    cache.put(1, "neptune", CachedBody(b"b"))
+    assert cache.get(1, "all") is not None
+
+    cache.put(2, "all", CachedBody(b"c"))
+
+    assert len(cache) == 2
+    assert cache.get(1, "neptune") is None
+    assert cache.get(1, "all").body == b"a"
+    cache.clear()
+    assert cache.get(2, "all") is None
+
+
+ETAG = 'W/"0123456789abcdef"'
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ("", False),
+        (ETAG, True),
+        ('"0123456789abcdef"', True),
+        ('W/"other", W/"0123456789abcdef"', True),
+        ('  "other" ,W/"0123456789abcdef"  ', True),
+        ("*", True),
+        ('W/"other", "another"', False),
+        ('W/"0123456789abcdef0"', False),
+        (",", False),
+    ],
+)
+def test_etag_matches_lists_wildcard_and_weak_tags(header, expected):
+    assert etag_matches(header, ETAG) is expected
+
+
+def test_build_encoded_response_honours_if_none_match_list():
+    entry = CachedBody(encode_json(LARGE_DOCUMENT))
+
+    listed = build_encoded_response(
+        make_request({"If-None-Match": f'W/"stale", {entry.etag}'}), entry
+    )
+    wildcard = build_encoded_response(make_request({"If-None-Match": "*"}), entry)
+
+    assert listed.status_code == 304
+    assert wildcard.status_code == 304
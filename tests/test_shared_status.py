@@ -0,0 +1,140 @@
+import mmap
+import struct
+
+from fetcher.status_table import StationCatalog, StatusTable
+from server.shared_status import (
+    MIN_CAPACITY,
+    SEQ_OFFSET,
+    SharedStatusReader,
+    SharedStatusWriter,
+)
+
+UPDATED_AT = "2025-11-30T15:50:00+08:00"
+
+
+def station(hash_id: str, free: int = 1, total: int = 4):
+    return {"hash_id": hash_id, "free": free, "used": total - free, "total": total, "error": 0}
+
+
+def counts(document):
+    return {row["hash_id"]: row["free"] for row in document["rows"]}
+
+
+def test_reader_sees_published_counts(tmp_path):
+    path = tmp_path / "status_table.bin"
+    writer = SharedStatusWriter(path)
+    reader = SharedStatusReader(path)
+
+    assert reader.load() is None
+    assert writer.publish([station("aaaa0001", 1), station("aaaa0002", 2)], UPDATED_AT) == 1
+
+    document = reader.load()
+    assert document["updated_at"] == UPDATED_AT
+    assert counts(document) == {"aaaa0001": 1, "aaaa0002": 2}
+    assert counts(reader.load(["aaaa0002", "missing"])) == {"aaaa0002": 2}
+    assert reader.version() == "shm:1"
+
+
+def test_publish_keeps_stations_missing_from_the_round(tmp_path):
+    path = tmp_path / "status_table.bin"
+    writer = SharedStatusWriter(path)
+    reader = SharedStatusReader(path)
+    writer.publish([station("aaaa0001", 1), station("aaaa0002", 2)], UPDATED_AT)
+    reader.load()
+
+    writer.publish([station("aaaa0002", 0)], UPDATED_AT)
+
+    assert counts(reader.load()) == {"aaaa0001": 1, "aaaa0002": 0}
+    assert reader.version() == "shm:2"
+
+
+def test_reader_reopens_after_growth(tmp_path):
+    path = tmp_path / "status_table.bin"
+    writer = SharedStatusWriter(path)
+    reader = SharedStatusReader(path)
+    writer.publish([station("seed0000", 3)], UPDATED_AT)
+    assert counts(reader.load()) == {"seed0000": 3}
+
+    # 超出初始容量会迁移到新文件，旧映射被标记为 retired
+    writer.publish([station(f"s{i:07d}") for i in range(MIN_CAPACITY + 1)], UPDATED_AT)
+
+    document = reader.load()
+    assert len(document["rows"]) == MIN_CAPACITY + 2
+    assert counts(document)["seed0000"] == 3
+
+
+def test_writer_takes_over_existing_file(tmp_path):
+    path = tmp_path / "status_table.bin"
+    SharedStatusWriter(path).publish([station("aaaa0001", 1)], UPDATED_AT)
+
+    writer = SharedStatusWriter(path)
+    assert writer.publish([station("aaaa0002", 2)], UPDATED_AT) == 2
+    assert counts(SharedStatusReader(path).load()) == {"aaaa0001": 1, "aaaa0002": 2}
+
+
+def test_remove_drops_deleted_stations(tmp_path):
+    path = tmp_path / "status_table.bin"
+    writer = SharedStatusWriter(path)
+    reader = SharedStatusReader(path)
+    writer.publish([station(f"aaaa000{i}", i) for i in range(5)], UPDATED_AT)
+    reader.load()
+
+    writer.remove(["aaaa0001", "aaaa0003", "unknown"])
+
+    document = reader.load()
+    assert counts(document) == {"aaaa0000": 0, "aaaa0002": 2, "aaaa0004": 4}
+    assert document["updated_at"] == UPDATED_AT
+    # 压缩后新站点继续追加，已有站点就地更新
+    writer.publish([station("aaaa0002", 9), station("bbbb0001", 1)], UPDATED_AT)
+    assert counts(reader.load()) == {
+        "aaaa0000": 0,
+        "aaaa0002": 9,
+        "aaaa0004": 4,
+        "bbbb0001": 1,
+    }
+
+
+def test_reader_gives_up_while_write_in_progress(tmp_path, monkeypatch):
+    path = tmp_path / "status_table.bin"
+    SharedStatusWriter(path).publish([station("aaaa0001")], UPDATED_AT)
+    reader = SharedStatusReader(path)
+    monkeypatch.setattr("server.shared_status.MAX_READ_RETRIES", 3)
+
+    with open(path, "r+b") as fp, mmap.mmap(fp.fileno(), 0) as mm:
+        seq = struct.unpack_from("<Q", mm, SEQ_OFFSET)[0]
+        struct.pack_into("<Q", mm, SEQ_OFFSET, seq + 1)  # 奇数：写入中
+        assert reader.load() is None
+        struct.pack_into("<Q", mm, SEQ_OFFSET, seq + 2)
+        assert counts(reader.load()) == {"aaaa0001": 1}
+    reader._mm.close()
+
+
+def test_reader_retries_when_seq_changes_during_read(tmp_path):
+    path = tmp_path / "status_table.bin"
+    writer = SharedStatusWriter(path)
+    writer.publish([station("aaaa0001", 1)], UPDATED_AT)
+    reader = SharedStatusReader(path)
+    calls = []
+
+    def racing_read(mm, header):
+        calls.append(header[3])
+        if len(calls) == 1:
+            # 读取过程中写入方完成了一轮发布
+            writer.publish([station("aaaa0001", 2)], UPDATED_AT)
+        return header[4]
+
+    assert reader._read_consistent(racing_read) == 2
+    assert len(calls) == 2 and calls[1] == calls[0] + 2
+
+
+def test_status_table_skips_rows_missing_from_catalog():
+    catalog = StationCatalog()
+    catalog.update("aaaa0001", {"name": "站点一", "provider": "neptune", "campus_id": 2})
+
+    table = StatusTable.from_latest_rows(
+        [station("aaaa0001", 3), station("deleted1", 5)], catalog, UPDATED_AT
+    )
+
+    assert len(catalog) == 1
+    assert catalog.get("deleted1") is None
+    assert table.counts(catalog.get("aaaa0001")) == (3, 1, 4, 0)
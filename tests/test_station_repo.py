@@ -0,0 +1,194 @@
+import dataclasses
+import sqlite3
+
+import pytest
+
+from db import client as db_client
+from db import station_repo
+from db.station_repo import (
+    batch_upsert_stations,
+    compute_station_fingerprint,
+    delete_stations,
+    fetch_catalog_version,
+    upsert_station,
+)
+from fetcher.station import Station
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    path = tmp_path / "charger.db"
+    db_client.reset_db_client()
+    monkeypatch.setattr(station_repo, "_fingerprint_conn", None)
+    assert db_client.initialize_db_config(str(path))
+    yield path
+    db_client.reset_db_client()
+
+
+@pytest.fixture
+def writes(monkeypatch):
+    """记录实际传给 upsert 的站点行"""
+    written = []
+    single, batch = station_repo.execute_upsert, station_repo.execute_batch_upsert
+
+    def spy_single(table, data, conflict_column="hash_id"):
+        written.append(data["hash_id"])
+        return single(table, data, conflict_column=conflict_column)
+
+    def spy_batch(table, rows, conflict_column="hash_id"):
+        written.extend(row["hash_id"] for row in rows)
+        return batch(table, rows, conflict_column=conflict_column)
+
+    monkeypatch.setattr(station_repo, "execute_upsert", spy_single)
+    monkeypatch.setattr(station_repo, "execute_batch_upsert", spy_batch)
+    return written
+
+
+def make_stations():
+    return [
+        Station(
+            name="教三北侧",
+            provider="neptune",
+            campus_id=1,
+            lat=30.2696,
+            lon=120.1293,
+            device_ids=["8120"],
+            updated_at="2025-11-30T15:00:00+08:00",
+        ),
+        Station(
+            name="菜鸟驿站北侧",
+            provider="dlmm",
+            campus_id=4,
+            lat=30.285467,
+            lon=120.143947,
+            device_ids=["32101149", "32101207"],
+            updated_at="2025-11-30T15:00:00+08:00",
+        ),
+    ]
+
+
+def stored_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return {
+            row["hash_id"]: dict(row)
+            for row in conn.execute("SELECT hash_id, lat, device_ids, updated_at FROM stations")
+        }
+    finally:
+        conn.close()
+
+
+BASE = {
+    "name": "教三北侧",
+    "provider": "neptune",
+    "campus_id": 1,
+    "campus_name": "玉泉校区",
+    "lat": 30.2696,
+    "lon": 120.1293,
+    "device_ids": '["8120"]',
+    "updated_at": "2025-11-30T15:00:00+08:00",
+}
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("name", "教三南侧"),
+        ("provider", "dlmm"),
+        ("campus_id", 2),
+        ("campus_name", "紫金港校区"),
+        ("lat", 30.27),
+        ("lon", 120.13),
+        ("device_ids", '["8120","8121"]'),
+    ],
+)
+def test_fingerprint_covers_every_metadata_field(field, value):
+    assert compute_station_fingerprint({**BASE, field: value}) != compute_station_fingerprint(BASE)
+
+
+def test_fingerprint_ignores_updated_at_and_device_id_encoding():
+    fingerprint = compute_station_fingerprint(BASE)
+
+    assert compute_station_fingerprint({**BASE, "updated_at": "2026-01-01"}) == fingerprint
+    assert compute_station_fingerprint({**BASE, "device_ids": ["8120"]}) == fingerprint
+    assert compute_station_fingerprint({**BASE, "device_ids": [8120]}) == fingerprint
+    assert compute_station_fingerprint({**BASE, "lat": "30.2696"}) == fingerprint
+
+
+def test_unchanged_stations_are_not_rewritten(db_path, writes):
+    stations = make_stations()
+    assert batch_upsert_stations(stations)
+    assert len(writes) == 2
+    assert fetch_catalog_version() == 1
+
+    assert batch_upsert_stations(make_stations())
+    assert upsert_station(make_stations()[0])
+
+    assert len(writes) == 2
+    assert fetch_catalog_version() == 1
+
+
+def test_updated_at_only_change_is_ignored(db_path, writes):
+    batch_upsert_stations(make_stations())
+    touched = [
+        dataclasses.replace(s, updated_at="2025-12-01T08:00:00+08:00") for s in make_stations()
+    ]
+
+    assert batch_upsert_stations(touched)
+
+    assert len(writes) == 2
+    assert fetch_catalog_version() == 1
+    assert {row["updated_at"] for row in stored_rows(db_path).values()} == {
+        "2025-11-30T15:00:00+08:00"
+    }
+
+
+def test_changed_lat_rewrites_row_and_bumps_version(db_path, writes):
+    stations = make_stations()
+    batch_upsert_stations(stations)
+    moved = dataclasses.replace(stations[0], lat=30.2700)
+
+    assert batch_upsert_stations([moved, stations[1]])
+
+    assert writes[2:] == [stations[0].hash_id]
+    assert stored_rows(db_path)[stations[0].hash_id]["lat"] == pytest.approx(30.27)
+    assert fetch_catalog_version() == 2
+
+
+def test_changed_device_ids_rewrites_row_and_bumps_version(db_path, writes):
+    stations = make_stations()
+    batch_upsert_stations(stations)
+    stations[1].device_ids = ["32101149"]
+
+    assert upsert_station(stations[1])
+
+    assert writes[2:] == [stations[1].hash_id]
+    assert stored_rows(db_path)[stations[1].hash_id]["device_ids"] == '["32101149"]'
+    assert fetch_catalog_version() == 2
+
+
+def test_fingerprints_are_reloaded_from_database(db_path, writes, monkeypatch):
+    batch_upsert_stations(make_stations())
+    # 模拟进程重启：内存中的指纹缓存失效，从 stations 表重新加载
+    monkeypatch.setattr(station_repo, "_fingerprint_conn", None)
+    station_repo._fingerprint_cache.clear()
+
+    assert batch_upsert_stations(make_stations())
+
+    assert len(writes) == 2
+    assert fetch_catalog_version() == 1
+
+
+def test_delete_bumps_version_and_allows_reinsert(db_path, writes):
+    stations = make_stations()
+    batch_upsert_stations(stations)
+
+    assert delete_stations([stations[0].hash_id])
+    assert fetch_catalog_version() == 2
+    assert delete_stations(["missing0"])
+    assert fetch_catalog_version() == 2
+
+    batch_upsert_stations(make_stations())
+    assert writes[2:] == [stations[0].hash_id]
+    assert fetch_catalog_version() == 3
@@ -0,0 +1,243 @@
+import math
+
+from fetcher.status_table import StationCatalog, StatusTable
+
+UPDATED_AT = "2025-11-30T15:50:00+08:00"
+
+STATIONS = [
+    {
+        "hash_id": "aaaa0001",
+        "name": "教三北侧",
+        "provider": "neptune",
+        "campus_id": 1,
+        "campus_name": "玉泉校区",
+        "lat": 30.26,
+        "lon": 120.12,
+        "device_ids": ["8120"],
+        "free": 3,
+        "used": 5,
+        "total": 10,
+        "error": 2,
+    },
+    {
+        "hash_id": "aaaa0002",
+        "name": "图书馆东侧",
+        "provider": "neptune",
+        "campus_id": 2,
+        "campus_name": "紫金港校区",
+        "lat": 30.30,
+        "lon": 120.08,
+        "device_ids": ["8121", "8122"],
+        "free": 0,
+        "used": 8,
+        "total": 8,
+        "error": 0,
+    },
+    {
+        "hash_id": "bbbb0001",
+        "name": "菜鸟驿站北侧",
+        "provider": "dlmm",
+        "campus_id": 2,
+        "campus_name": "紫金港校区",
+        "lat": None,
+        "lon": None,
+        "device_ids": "[32101149, 8120]",
+        "free": 6,
+        "used": 1,
+        "total": 7,
+        "error": 0,
+    },
+    {
+        "hash_id": "cccc0001",
+        "name": "未分校区站点",
+        "provider": "dlmm",
+        "campus_id": None,
+        "device_ids": [],
+        "free": 1,
+        "used": 0,
+        "total": 1,
+        "error": 0,
+    },
+]
+
+
+def with_counts(station, **counts):
+    return {**station, **counts}
+
+
+def make_table(stations=STATIONS, catalog=None):
+    catalog = catalog if catalog is not None else StationCatalog()
+    return StatusTable.from_stations(stations, catalog, UPDATED_AT)
+
+
+def hash_ids(table, ordinals):
+    return [table.catalog.hash_ids[ordinal] for ordinal in ordinals]
+
+
+def test_ordinals_are_stable_across_rounds():
+    catalog = StationCatalog()
+    first = make_table(STATIONS, catalog)
+    ordinals = {station["hash_id"]: catalog.get(station["hash_id"]) for station in STATIONS}
+    assert sorted(ordinals.values()) == [0, 1, 2, 3]
+
+    # 第二轮缺少 aaaa0002，新增 dddd0001
+    second_round = [s for s in STATIONS if s["hash_id"] != "aaaa0002"] + [
+        with_counts(STATIONS[0], hash_id="dddd0001", name="新站点")
+    ]
+    second = make_table(second_round, catalog)
+
+    assert catalog.get("dddd0001") == 4
+    assert "aaaa0002" not in hash_ids(second, second.ordinals())
+    assert len(second) == 4 and len(first) == 4
+
+    # 站点重新出现时沿用原序号，目录不会增长
+    third = make_table(STATIONS, catalog)
+    assert {s["hash_id"]: catalog.get(s["hash_id"]) for s in STATIONS} == ordinals
+    assert len(catalog) == 5
+    assert third.counts(ordinals["aaaa0002"]) == (0, 8, 8, 0)
+
+
+def test_duplicate_station_in_round_keeps_first_counts():
+    table = make_table([STATIONS[0], with_counts(STATIONS[0], free=9)])
+
+    assert len(table) == 1
+    assert table.counts(0) == (3, 5, 10, 2)
+
+
+def test_catalog_generation_only_changes_with_metadata():
+    catalog = StationCatalog()
+    make_table(STATIONS, catalog)
+    generation = catalog.generation
+
+    make_table([with_counts(s, free=0) for s in STATIONS], catalog)
+    assert catalog.generation == generation
+
+    make_table([with_counts(STATIONS[0], lat=30.5)], catalog)
+    assert catalog.generation == generation + 1
+
+
+def test_select_by_provider_campus_and_devid():
+    table = make_table()
+
+    assert hash_ids(table, table.select()) == ["aaaa0001", "aaaa0002", "bbbb0001", "cccc0001"]
+    assert hash_ids(table, table.select(provider="neptune")) == ["aaaa0001", "aaaa0002"]
+    assert hash_ids(table, table.select(campus_id=2)) == ["aaaa0002", "bbbb0001"]
+    assert hash_ids(table, table.select(provider="dlmm", campus_id=2)) == ["bbbb0001"]
+    # 同一设备号在不同服务商下互不干扰
+    assert hash_ids(table, table.select(provider="neptune", devid="8120")) == ["aaaa0001"]
+    assert hash_ids(table, table.select(provider="dlmm", devid="8120")) == ["bbbb0001"]
+    assert hash_ids(table, table.select(min_free=3)) == ["aaaa0001", "bbbb0001"]
+    assert hash_ids(table, table.select(campus_id=2, min_free=1)) == ["bbbb0001"]
+
+
+def test_select_misses_return_empty():
+    table = make_table()
+
+    assert table.select(provider="unknown") == []
+    assert table.select(campus_id=99) == []
+    assert table.select(provider="neptune", devid="missing") == []
+    assert table.select(provider="neptune", campus_id=3) == []
+    assert table.select(min_free=100) == []
+    assert table.select(station_ids=["missing"]) == []
+
+
+def test_select_station_ids_keeps_request_order():
+    table = make_table()
+
+    selected = table.select(station_ids=["bbbb0001", "missing", "aaaa0001"])
+    assert hash_ids(table, selected) == ["bbbb0001", "aaaa0001"]
+    filtered = table.select(station_ids=["bbbb0001", "aaaa0001"], provider="neptune")
+    assert hash_ids(table, filtered) == ["aaaa0001"]
+
+
+def test_select_ignores_stations_absent_from_this_round():
+    catalog = StationCatalog()
+    make_table(STATIONS, catalog)
+    table = make_table(STATIONS[1:], catalog)
+
+    assert hash_ids(table, table.select(provider="neptune")) == ["aaaa0002"]
+    assert table.select(station_ids=["aaaa0001"]) == []
+
+
+def test_diff_between_rounds_with_different_station_sets():
+    catalog = StationCatalog()
+    previous = make_table(STATIONS[:3], catalog)
+    current = make_table(
+        [
+            STATIONS[0],  # 未变化
+            with_counts(STATIONS[1], free=2, used=6),  # 计数变化
+            # STATIONS[2] 本轮缺失
+            STATIONS[3],  # 新出现
+        ],
+        catalog,
+    )
+
+    assert hash_ids(current, current.diff(previous)) == ["aaaa0002", "cccc0001"]
+    assert current.diff(make_table(current.count_rows(), catalog)) == []
+    # 上一轮更短（后来才分配的序号）也能比较
+    assert hash_ids(previous, previous.diff(current)) == ["aaaa0002", "bbbb0001"]
+
+
+def test_diff_without_comparable_previous_returns_everything():
+    table = make_table()
+
+    assert table.diff(None) == list(table.ordinals())
+    assert table.diff(make_table()) == list(table.ordinals())  # 不同目录
+
+
+def test_totals_match_hand_computed_sums():
+    table = make_table()
+
+    assert table.totals() == {"free": 10, "used": 14, "total": 26, "error": 2, "stations": 4}
+    assert table.totals(table.select(provider="neptune")) == {
+        "free": 3,
+        "used": 13,
+        "total": 18,
+        "error": 2,
+        "stations": 2,
+    }
+    assert table.campus_totals() == {
+        1: {"free": 3, "used": 5, "total": 10, "error": 2, "stations": 1},
+        2: {"free": 6, "used": 9, "total": 15, "error": 0, "stations": 2},
+    }
+    assert table.provider_totals() == {
+        "neptune": {"free": 3, "used": 13, "total": 18, "error": 2, "stations": 2},
+        "dlmm": {"free": 7, "used": 1, "total": 8, "error": 0, "stations": 2},
+    }
+
+
+def test_cached_totals_are_invalidated_by_new_counts():
+    table = make_table(STATIONS[:1])
+    assert table.totals()["free"] == 3
+    table.totals()["free"] = 100  # 返回副本，不影响缓存
+
+    table.set_counts(table.catalog.ordinal("eeee0001"), 4, 0, 4, 0)
+
+    assert table.totals() == {"free": 7, "used": 5, "total": 14, "error": 2, "stations": 2}
+
+
+def test_from_latest_rows_uses_catalog_metadata():
+    catalog = StationCatalog()
+    for station in STATIONS:
+        catalog.update(station["hash_id"], station)
+    rows = [
+        {"hash_id": s["hash_id"], "free": s["free"], "used": s["used"], "total": s["total"]}
+        for s in STATIONS[:2]
+    ]
+
+    table = StatusTable.from_latest_rows(rows, catalog, UPDATED_AT)
+
+    assert hash_ids(table, table.ordinals()) == ["aaaa0001", "aaaa0002"]
+    assert table.totals()["error"] == 0
+
+
+def test_station_materializes_api_shape():
+    table = make_table()
+
+    station = table.station(table.catalog.get("bbbb0001"))
+    assert station["devids"] == ["32101149", "8120"]
+    assert station["lat"] is None and station["campus_id"] == 2
+    assert table.station(table.catalog.get("cccc0001"))["campus_id"] is None
+    assert table.station(0, ["hash_id", "free"]) == {"hash_id": "aaaa0001", "free": 3}
+    assert math.isnan(table.catalog.lats[table.catalog.get("bbbb0001")])
+    assert table.to_payload()["updated_at"] == UPDATED_AT